@@ -1,32 +1,42 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, Dict
-
-from langgraph.graph import StateGraph, END
-from langchain_core.runnables import RunnableLambda
-from bs4 import BeautifulSoup
+import threading
+from typing import Any, Dict, List, Optional, TypedDict
 
 from ..config import settings
 from ..llm import llm_client
-from ..parsing.parser import parse_any, parse_with_docling
+from ..metrics import GRAPH_NODE_SECONDS
+from ..parsing.parser import is_html, media_in_text, parse_any, parse_with_docling
 from ..schemas import ParsedBundle
 
 logger = logging.getLogger(__name__)
 
 
-class ParseState(Dict[str, Any]):
+class ParseState(TypedDict, total=False):
     """State for parsing/refinement graph.
 
-    keys:
-      - filename: str
-      - data: bytes
-      - options: dict (refine_with_llm: bool)
-      - parsed: ParsedBundle | None
-      - refined_text: str | None
-      - aligned_text: str | None
+    A TypedDict so LangGraph creates one channel per key (a plain Dict
+    subclass has no channels and the graph ran on an empty state).
     """
 
+    filename: str
+    data: bytes
+    base_url: Optional[str]
+    options: Dict[str, Any]
+    parsed: Optional[ParsedBundle]
+    refined_text: Optional[str]
+    aligned_text: Optional[str]
+    errors: List[str]
+
+
+def _node(graph: str, fn: Any) -> Any:
+    """Wrap a node function as a Runnable that records its latency."""
+    from langchain_core.runnables import RunnableLambda
+
+    name = fn.__name__.removeprefix("node_")
+    return RunnableLambda(GRAPH_NODE_SECONDS.wrap(fn, graph=graph, node=name))
+
 
 def _append_error(state: Dict[str, Any], msg: str) -> Dict[str, Any]:
     errs = list(state.get("errors") or [])
@@ -48,6 +58,9 @@ def node_try_docling(state: ParseState) -> ParseState:
     if not filename or data is None:
         # Incomplete input; skip docling and let basic parser decide
         return {"parsed": None}
+    if is_html(filename):
+        # The HTML extractor keeps only the article and is much faster than a Docling conversion
+        return {"parsed": None}
     try:
         parsed = parse_with_docling(filename, data)
         return {"parsed": parsed}
@@ -59,7 +72,7 @@ def node_basic_parse(state: ParseState) -> ParseState:
     if state.get("parsed") is None:
         filename = state.get("filename") or "content.bin"
         data = state.get("data") or b""
-        return {"parsed": parse_any(filename, data)}
+        return {"parsed": parse_any(filename, data, state.get("base_url"))}
     return {}
 
 
@@ -75,6 +88,8 @@ def node_align_media(state: ParseState) -> ParseState:
     base_text = (parsed.text or "").strip()
     if not base_text and parsed.html:
         try:
+            from bs4 import BeautifulSoup
+
             soup = BeautifulSoup(parsed.html, "html.parser")
             base_text = soup.get_text("\n", strip=True)
         except Exception:
@@ -82,7 +97,7 @@ def node_align_media(state: ParseState) -> ParseState:
     if not base_text:
         return {}
     has_media = bool((parsed.images or []) or (parsed.tables or []))
-    if not has_media:
+    if not has_media or media_in_text(parsed):
         return {}
 
     # Prepare a concise media manifest for the LLM
@@ -135,6 +150,8 @@ def node_refine_llm(state: ParseState) -> ParseState:
     text = (state.get("aligned_text") or parsed.text or "").strip()
     if not text and parsed.html:
         try:
+            from bs4 import BeautifulSoup
+
             soup = BeautifulSoup(parsed.html, "html.parser")
             text = soup.get_text("\n", strip=True)
         except Exception:
@@ -163,11 +180,13 @@ def node_refine_llm(state: ParseState) -> ParseState:
 
 
 def build_parse_graph():
+    from langgraph.graph import END, StateGraph
+
     g = StateGraph(ParseState)
-    g.add_node("try_docling", RunnableLambda(node_try_docling))
-    g.add_node("basic_parse", RunnableLambda(node_basic_parse))
-    g.add_node("align_media", RunnableLambda(node_align_media))
-    g.add_node("refine_llm", RunnableLambda(node_refine_llm))
+    g.add_node("try_docling", _node("parse", node_try_docling))
+    g.add_node("basic_parse", _node("parse", node_basic_parse))
+    g.add_node("align_media", _node("parse", node_align_media))
+    g.add_node("refine_llm", _node("parse", node_refine_llm))
 
     g.set_entry_point("try_docling")
     g.add_edge("try_docling", "basic_parse")
@@ -177,8 +196,6 @@ def build_parse_graph():
     return g.compile()
 
 
-parse_graph = build_parse_graph()
-
 
 # Section refiner: refine arbitrary markdown/plaintext
 def node_section_refiner(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -203,15 +220,15 @@ def node_section_refiner(state: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def build_refine_graph():
+    from langgraph.graph import END, StateGraph
+
     g = StateGraph(dict)
-    g.add_node("section_refiner", RunnableLambda(node_section_refiner))
+    g.add_node("section_refiner", _node("refine", node_section_refiner))
     g.set_entry_point("section_refiner")
     g.add_edge("section_refiner", END)
     return g.compile()
 
 
-refine_graph = build_refine_graph()
-
 
 # Blog summary graph
 def node_blog_summary(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -223,19 +240,60 @@ def node_blog_summary(state: Dict[str, Any]) -> Dict[str, Any]:
         " capturing the main points and takeaways. Avoid marketing fluff."
     )
     user = text
+    # Summaries run after the post is published; queue them behind interactive work.
+    # A near-duplicate post's summary is an acceptable answer, unlike a refine of edited text.
     summary = llm_client.chat([
         {"role": "system", "content": system},
         {"role": "user", "content": user},
-    ])
+    ], priority="background", semantic_ok=True)
     return {"summary": summary}
 
 
 def build_summary_graph():
+    from langgraph.graph import END, StateGraph
+
     g = StateGraph(dict)
-    g.add_node("blog_summary", RunnableLambda(node_blog_summary))
+    g.add_node("blog_summary", _node("summary", node_blog_summary))
     g.set_entry_point("blog_summary")
     g.add_edge("blog_summary", END)
     return g.compile()
 
 
-summary_graph = build_summary_graph()
+
+# Graphs are compiled on first use (LangGraph/langchain_core cost ~1s to import)
+_BUILDERS = {
+    "parse_graph": build_parse_graph,
+    "refine_graph": build_refine_graph,
+    "summary_graph": build_summary_graph,
+}
+_graphs: Dict[str, Any] = {}
+_graphs_lock = threading.Lock()
+
+
+def _get_graph(name: str) -> Any:
+    graph = _graphs.get(name)
+    if graph is None:
+        with _graphs_lock:
+            graph = _graphs.get(name)
+            if graph is None:
+                graph = _graphs[name] = _BUILDERS[name]()
+    return graph
+
+
+def get_parse_graph() -> Any:
+    return _get_graph("parse_graph")
+
+
+def get_refine_graph() -> Any:
+    return _get_graph("refine_graph")
+
+
+def get_summary_graph() -> Any:
+    return _get_graph("summary_graph")
+
+
+def __getattr__(name: str) -> Any:
+    # Keeps ``from .agent.graph import parse_graph`` working for existing callers
+    if name in _BUILDERS:
+        return _get_graph(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
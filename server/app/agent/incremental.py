@@ -0,0 +1,195 @@
+"""Diff-aware section refinement (``POST /api/refine/section`` with ``incremental``).
+
+The document is split into stable blocks: headings, paragraphs/lists/tables
+separated by blank lines, and fenced code blocks kept whole. Each block's
+refined output is cached under ``refine:block:<sha>`` (block text +
+instructions), so editing one paragraph of a long post only pays for that
+paragraph. Changed blocks are grouped into runs of adjacent blocks, capped at
+``REFINE_CHUNK_CHARS``; each run is sent in one call with
+``REFINE_CONTEXT_BLOCKS`` neighbouring blocks as read-only context, and up
+to ``REFINE_MAX_PARALLEL`` runs are in flight at once.
+"""
+from __future__ import annotations
+
+import difflib
+import hashlib
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from ..cache import cache_json_mget, cache_json_mset
+from ..config import settings
+from ..llm import llm_client
+from ..metrics import REFINE_BLOCKS
+
+logger = logging.getLogger(__name__)
+
+# Bump when the block prompt changes so cached blocks are not reused across prompt versions
+_PROMPT_VERSION = "1"
+_FENCE = re.compile(r"^\s*(`{3,}|~{3,})")
+_HEADING = re.compile(r"^\s{0,3}#{1,6}(\s|$)")
+_MARKER = re.compile(r"^@@BLOCK (\d+)@@[ \t]*$", re.MULTILINE)
+
+_SYSTEM = (
+    "You are a meticulous technical editor. Clean and structure the text into well-formed Markdown,"
+    " preserving headings, lists, code blocks, tables (as Markdown), and image references."
+    " Do not introduce new facts. You may polish tone for clarity and professionalism."
+    " The input is an excerpt of a longer document. CONTEXT sections are read-only: use them for"
+    " continuity but never return them. Return every block under EDIT, in order, each preceded by"
+    " its marker line exactly as given (for example @@BLOCK 1@@). Return ONLY the markers and Markdown."
+)
+
+
+def split_blocks(text: str) -> List[str]:
+    """Headings, blank-line separated blocks and whole fenced code blocks, in order."""
+    blocks: List[str] = []
+    cur: List[str] = []
+    fence: Optional[str] = None
+
+    def flush() -> None:
+        if cur:
+            blocks.append("\n".join(cur).strip("\n"))
+            cur.clear()
+
+    # Lines keep trailing spaces: two of them are a Markdown hard line break
+    for line in (text or "").splitlines():
+        if fence is not None:
+            cur.append(line)
+            if line.lstrip().startswith(fence):
+                fence = None
+                flush()
+            continue
+        m = _FENCE.match(line)
+        if m:
+            flush()
+            fence = m.group(1)
+            cur.append(line)
+        elif not line.strip():
+            flush()
+        elif _HEADING.match(line):
+            flush()
+            blocks.append(line.strip())
+        else:
+            cur.append(line)
+    flush()
+    return [b for b in blocks if b.strip()]
+
+
+def block_key(block: str, instructions: str) -> str:
+    h = hashlib.sha256(f"{_PROMPT_VERSION}\n{instructions}\n\n{block}".encode()).hexdigest()
+    return f"refine:block:{h}"
+
+
+def _runs(changed: Sequence[int], blocks: Sequence[str]) -> List[List[int]]:
+    """Adjacent changed block indexes, split so each run stays under ``REFINE_CHUNK_CHARS``."""
+    limit = max(1, settings.refine_chunk_chars)
+    runs: List[List[int]] = []
+    size = 0
+    for i in changed:
+        if runs and runs[-1][-1] == i - 1 and size + len(blocks[i]) <= limit:
+            runs[-1].append(i)
+            size += len(blocks[i])
+        else:
+            runs.append([i])
+            size = len(blocks[i])
+    return runs
+
+
+def _prompt(run: Sequence[int], blocks: Sequence[str]) -> str:
+    k = max(0, settings.refine_context_blocks)
+    before = blocks[max(0, run[0] - k):run[0]]
+    after = blocks[run[-1] + 1:run[-1] + 1 + k]
+    parts: List[str] = []
+    if before:
+        parts.append("CONTEXT BEFORE:\n" + "\n\n".join(before))
+    parts.append("EDIT:\n" + "\n\n".join(f"@@BLOCK {n}@@\n{blocks[i]}" for n, i in enumerate(run, start=1)))
+    if after:
+        parts.append("CONTEXT AFTER:\n" + "\n\n".join(after))
+    return "\n\n".join(parts)
+
+
+def _split_output(content: str, expected: int) -> Optional[List[str]]:
+    pieces = _MARKER.split(content or "")
+    if len(pieces) == 1:
+        # Single-block runs may come back without the marker
+        return [content.strip()] if expected == 1 and content.strip() else None
+    found: Dict[int, str] = {}
+    for n, body in zip(pieces[1::2], pieces[2::2]):
+        found[int(n)] = body.strip()
+    if sorted(found) != list(range(1, expected + 1)):
+        return None
+    return [found[n] for n in range(1, expected + 1)]
+
+
+def _refine_run(run: List[int], blocks: Sequence[str], instructions: str) -> Dict[int, str]:
+    """Refined text per block index; blocks the LLM did not return, or returned empty, are left out."""
+    system = _SYSTEM
+    if instructions:
+        system = system + " Additional user instructions (follow strictly): " + instructions
+    content = llm_client.chat([
+        {"role": "system", "content": system},
+        {"role": "user", "content": _prompt(run, blocks)},
+    ])
+    if not content:
+        return {}
+    pieces = _split_output(content, len(run))
+    if pieces is not None:
+        # An empty piece is a missing block, not a deletion: the original is kept and nothing is cached
+        return {i: piece for i, piece in zip(run, pieces) if piece}
+    if len(run) == 1:
+        logger.warning("incremental refine: unusable output for block %d", run[0])
+        return {}
+    # Markers lost or merged: retry block by block
+    out: Dict[int, str] = {}
+    for i in run:
+        out.update(_refine_run([i], blocks, instructions))
+    return out
+
+
+def _patch(original: str, refined: str) -> str:
+    return "\n".join(difflib.unified_diff(
+        original.splitlines(), refined.splitlines(), fromfile="original", tofile="refined", lineterm="",
+    ))
+
+
+def refine_incremental(text: str, instructions: str = "") -> Dict[str, Any]:
+    """Merged refined document, unified-diff patch against ``text`` and block counts."""
+    blocks = split_blocks(text)
+    keys = [block_key(b, instructions) for b in blocks]
+    refined: List[Optional[str]] = [c if isinstance(c, str) and c else None for c in cache_json_mget(keys)]
+    changed = [i for i, r in enumerate(refined) if r is None]
+    reused = len(blocks) - len(changed)
+
+    runs = _runs(changed, blocks)
+    results: List[Dict[int, str]] = []
+    if len(runs) == 1 or settings.refine_max_parallel <= 1:
+        results = [_refine_run(run, blocks, instructions) for run in runs]
+    elif runs:
+        with ThreadPoolExecutor(max_workers=min(len(runs), settings.refine_max_parallel)) as pool:
+            results = list(pool.map(lambda run: _refine_run(run, blocks, instructions), runs))
+
+    fresh: Dict[str, str] = {}
+    done: List[int] = []
+    for result in results:
+        for i, out in result.items():
+            refined[i] = out
+            fresh[keys[i]] = out
+            done.append(i)
+    cache_json_mset(fresh)
+    REFINE_BLOCKS.inc(reused, result="reused")
+    REFINE_BLOCKS.inc(len(done), result="refined")
+    if len(done) < len(changed):
+        REFINE_BLOCKS.inc(len(changed) - len(done), result="failed")
+
+    # Blocks without output (no provider, unusable reply) are kept as written
+    merged = "\n\n".join(b if r is None else r for r, b in zip(refined, blocks))
+    return {
+        "refined": merged,
+        "patch": _patch(text, merged),
+        "blocks_total": len(blocks),
+        "blocks_reused": reused,
+        "blocks_refined": len(done),
+        "changed_blocks": sorted(done),
+    }
+
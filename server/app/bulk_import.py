@@ -0,0 +1,371 @@
+"""Bulk import: many files/URLs in one request (``POST /api/posts/import``).
+
+Items come from a ZIP upload, a list of URLs or a sitemap (one level of
+sitemap index is followed). Up to ``BULK_IMPORT_CONCURRENCY`` items are in
+flight at once:
+
+- URLs go through the pooled fetcher (per-host limits, 304 revalidation).
+- Parse results are shared with ``/posts/parse`` via the parse cache.
+- Parsing runs in a process pool (``BULK_IMPORT_PROCESSES``, default one per
+  core) so CPU-bound parsers use every core. With ``refine_with_llm`` the
+  full parse graph runs in the threadpool instead, since it mostly waits on
+  the LLM.
+
+Parsed items are inserted ``BULK_IMPORT_BATCH_SIZE`` at a time: one slug
+query and one commit per batch. List/feed caches are invalidated and the
+static export rebuilt once per batch. With ``summarize`` the new posts are
+queued for summaries on a small dedicated pool (two workers).
+
+Progress streams back as NDJSON, one object per line::
+
+    {"event": "start", "total": 120}
+    {"event": "item", "index": 0, "source": "posts/a.md", "status": "created", "id": "...", "slug": "..."}
+    {"event": "item", "index": 1, "source": "https://...", "status": "error", "error": "..."}
+    {"event": "done", "created": 118, "failed": 2, "elapsed_s": 9.4}
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import PurePosixPath
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from xml.etree import ElementTree as ET
+
+import orjson
+from fastapi.concurrency import run_in_threadpool
+
+from .cache import acache_json_get, acache_json_set
+from .config import settings
+from .db import session_scope
+from .derivatives import apply_derivatives
+from .export import rebuild_static
+from .fetcher import FetchError, fetch_url, load_body
+from .models import BlogPost
+from .parsing.parser import SUPPORTED_SUFFIXES, parse_any
+from .ratelimit import llm_priority
+from .schemas import ParsedBundle
+from .table_store import discard_orphan_blobs, offload_tables
+from .tasks import SUMMARY_PENDING, generate_post_summary, invalidate_post_caches
+from .utils import make_slug, unique_slugs
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+# Summaries of imported posts queue here instead of occupying the request threadpool
+_summary_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="import-summary")
+
+
+class ImportItem:
+    __slots__ = ("index", "source", "filename", "data", "url")
+
+    def __init__(self, index: int, source: str, filename: str = "", data: Optional[bytes] = None,
+                 url: Optional[str] = None) -> None:
+        self.index = index
+        self.source = source
+        self.filename = filename
+        self.data = data
+        self.url = url
+
+
+class BulkImportError(Exception):
+    """Input-level problem (bad ZIP, unreadable sitemap, too many items); answered with 400."""
+
+
+# Collecting items ------------------------------------------------------------------------------
+def items_from_zip(fileobj: Any) -> List[ImportItem]:
+    """Supported members of a ZIP archive.
+
+    Each member is capped at ``FETCH_MAX_BYTES`` and the archive as a whole at
+    ``BULK_IMPORT_MAX_ZIP_BYTES`` decompressed, so a small archive cannot
+    expand into gigabytes held for the whole request.
+    """
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as e:
+        raise BulkImportError(f"Not a ZIP archive: {e}")
+    limit = settings.fetch_max_bytes
+    total_limit = settings.bulk_import_max_zip_bytes
+    total = 0
+    items: List[ImportItem] = []
+    with archive:
+        for info in archive.infolist():
+            name = info.filename
+            base = PurePosixPath(name).name
+            if info.is_dir() or name.startswith("__MACOSX/") or base.startswith("."):
+                continue
+            if PurePosixPath(base.lower()).suffix not in SUPPORTED_SUFFIXES:
+                continue
+            _check_count(len(items) + 1)
+            item = ImportItem(len(items), name, base)
+            items.append(item)
+            if limit > 0 and info.file_size > limit:
+                continue  # data stays None: reported as an item error, never decompressed
+            if total_limit > 0 and total + info.file_size > total_limit:
+                raise BulkImportError(f"Archive expands past {total_limit} bytes")
+            # file_size comes from the archive header; read one byte past the caps to be sure
+            caps = [c for c in (limit, total_limit - total if total_limit > 0 else 0) if c > 0]
+            with archive.open(info) as member:
+                data = member.read(min(caps) + 1 if caps else -1)
+            total += len(data)
+            if total_limit > 0 and total > total_limit:
+                raise BulkImportError(f"Archive expands past {total_limit} bytes")
+            if limit <= 0 or len(data) <= limit:
+                item.data = data
+    return items
+
+
+def items_from_urls(urls: List[str]) -> List[ImportItem]:
+    seen: Dict[str, None] = {}
+    for line in urls:
+        url = line.strip()
+        if url and not url.startswith("#"):
+            seen.setdefault(url, None)
+    _check_count(len(seen))
+    return [ImportItem(i, url, url=url) for i, url in enumerate(seen)]
+
+
+async def items_from_sitemap(url: str) -> List[ImportItem]:
+    """``<loc>`` entries of a sitemap; a sitemap index is expanded one level."""
+    is_index, locs = await _sitemap_locs(url)
+    if is_index:
+        nested: List[str] = []
+        for child in locs:
+            nested.extend((await _sitemap_locs(child))[1])
+            _check_count(len(nested))
+        locs = nested
+    return items_from_urls(locs)
+
+
+async def _sitemap_locs(url: str) -> Tuple[bool, List[str]]:
+    try:
+        fetched = await fetch_url(url)
+        root = ET.fromstring(await load_body(fetched))
+    except (FetchError, ET.ParseError) as e:
+        raise BulkImportError(f"Could not read sitemap {url}: {e}")
+    locs = [(el.text or "").strip() for el in root.iter() if str(el.tag).rsplit("}", 1)[-1] == "loc"]
+    return str(root.tag).endswith("sitemapindex"), [loc for loc in locs if loc]
+
+
+def _check_count(n: int) -> None:
+    if n > settings.bulk_import_max_items:
+        raise BulkImportError(f"Too many items (limit {settings.bulk_import_max_items})")
+
+
+# Parsing ---------------------------------------------------------------------------------------
+def _parse_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    # 0 = one worker per core; negative = parse in the threadpool (no subprocesses)
+    workers = settings.bulk_import_processes or (os.cpu_count() or 1)
+    if workers < 1:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking a process that runs event-loop and pool threads is unsafe
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_parse_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _refine_parse(filename: str, data: bytes, base_url: Optional[str]) -> ParsedBundle:
+    from .routers.posts import _run_parse_pipeline
+
+    # Imports are batch work: their LLM calls must not queue ahead of interactive requests
+    with llm_priority("background"):
+        return _run_parse_pipeline(filename, data, True, base_url)
+
+
+async def _parse(filename: str, data: bytes, base_url: Optional[str], refine_with_llm: bool) -> ParsedBundle:
+    if refine_with_llm:
+        return await run_in_threadpool(_refine_parse, filename, data, base_url)
+    pool = _parse_pool()
+    if pool is None:
+        return await run_in_threadpool(parse_any, filename, data, base_url)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, parse_any, filename, data, base_url)
+    except BrokenProcessPool as e:
+        # A worker died (OOM kill, crash in a native parser): drop the pool, parse this item in-process
+        logger.warning("bulk import parse pool broken, recreating: %s", e)
+        shutdown_parse_pool()
+        return await run_in_threadpool(parse_any, filename, data, base_url)
+
+
+def _title_for(parsed: ParsedBundle, item: ImportItem, filename: str) -> str:
+    if parsed.title and parsed.title.strip():
+        return parsed.title.strip()[:512]
+    for line in (parsed.text or "").splitlines()[:50]:
+        if line.startswith("# "):
+            return line[2:].strip()[:512]
+    stem = PurePosixPath(filename).stem or item.source
+    return stem.replace("-", " ").replace("_", " ").strip().capitalize()[:512] or "Untitled"
+
+
+async def _process(item: ImportItem, refine_with_llm: bool, sem: asyncio.Semaphore) -> Dict[str, Any]:
+    """Fetch/parse one item; returns the row to insert (raises on failure)."""
+    from .routers.posts import parse_cache_key
+
+    async with sem:
+        base_url = None
+        fetched = None
+        if item.url:
+            fetched = await fetch_url(item.url)
+            filename, base_url, sha = fetched.filename, fetched.final_url, fetched.sha256
+        else:
+            if item.data is None:
+                raise ValueError(f"larger than {settings.fetch_max_bytes} bytes")
+            filename, sha = item.filename, hashlib.sha256(item.data).hexdigest()
+        key = parse_cache_key(sha, refine_with_llm, filename, base_url)
+        cached = await acache_json_get(key)
+        data = item.data
+        if not cached and fetched is not None:
+            data = await load_body(fetched)
+            if fetched.sha256 != sha:
+                # Refetched after a 304 whose body was evicted, and the content changed
+                filename, base_url = fetched.filename, fetched.final_url
+                key = parse_cache_key(fetched.sha256, refine_with_llm, filename, base_url)
+                cached = await acache_json_get(key)
+        if cached:
+            parsed = ParsedBundle.model_validate(cached)
+        else:
+            parsed = await _parse(filename, data or b"", base_url, refine_with_llm)
+            await acache_json_set(key, orjson.loads(parsed.model_dump_json()))
+    if not ((parsed.text or "").strip() or parsed.images or parsed.tables):
+        raise ValueError("no content extracted")
+    return {
+        "title": _title_for(parsed, item, filename),
+        "content_text": parsed.text,
+        "images": [im.model_dump() for im in parsed.images],
+        "tables": [t.model_dump() for t in parsed.tables],
+        "source_type": "url" if item.url else "upload",
+        "source_url": item.url,
+    }
+
+
+async def _outcome(item: ImportItem, refine_with_llm: bool, sem: asyncio.Semaphore) -> Tuple[ImportItem, Any]:
+    """``(item, row)`` on success, ``(item, exception)`` on failure."""
+    try:
+        return item, await _process(item, refine_with_llm, sem)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:  # noqa: BLE001
+        return item, e
+
+
+# Inserting -------------------------------------------------------------------------------------
+def _insert_batch(rows: List[Dict[str, Any]], summarize: bool) -> List[Dict[str, str]]:
+    """One transaction for the batch; returns ``{id, slug}`` per row, in order."""
+    from sqlalchemy.exc import IntegrityError
+
+    from .utils import insert_with_unique_slug, is_slug_conflict
+
+    with session_scope() as db:
+        posts = []
+        for row in rows:
+            meta = {"summary_status": SUMMARY_PENDING} if summarize and (row["content_text"] or "").strip() else {}
+            post_id = str(uuid.uuid4())
+            post = BlogPost(id=post_id, meta=meta, **{**row, "tables": offload_tables(db, post_id, row["tables"])})
+            apply_derivatives(post)
+            posts.append(post)
+        blobs_committed = bool(db.new)
+        if blobs_committed:
+            # Table blobs first, so a slug conflict below never rolls them back
+            db.commit()
+        bases = [make_slug(p.title) for p in posts]
+        try:
+            for post, slug in zip(posts, unique_slugs(db, bases)):
+                post.slug = slug
+            db.add_all(posts)
+            try:
+                db.commit()
+            except IntegrityError as e:
+                db.rollback()
+                if not is_slug_conflict(e):
+                    raise
+                # A concurrent writer took one of the slugs: fall back to per-row inserts with retries
+                for post, base in zip(posts, bases):
+                    insert_with_unique_slug(db, post, base)
+        except Exception:
+            if blobs_committed:
+                discard_orphan_blobs(db, [p.id for p in posts])
+            raise
+        out = [{"id": p.id, "slug": p.slug} for p in posts]
+    invalidate_post_caches(None, slugs=[o["slug"] for o in out])
+    rebuild_static(slugs=[o["slug"] for o in out])
+    return out
+
+
+def _summary_done(fut: Future) -> None:
+    if fut.exception() is not None:
+        logger.warning("bulk import summary failed: %s", fut.exception())
+
+
+# Orchestration ---------------------------------------------------------------------------------
+def _line(obj: Dict[str, Any]) -> bytes:
+    return orjson.dumps(obj) + b"\n"
+
+
+async def run_import(items: List[ImportItem], refine_with_llm: bool = False, summarize: bool = False) -> AsyncIterator[bytes]:
+    """NDJSON progress stream; items are processed concurrently and inserted in batches."""
+    start = time.perf_counter()
+    created = failed = 0
+    yield _line({"event": "start", "total": len(items)})
+    sem = asyncio.Semaphore(max(1, settings.bulk_import_concurrency))
+    tasks = [asyncio.ensure_future(_outcome(item, refine_with_llm, sem)) for item in items]
+    batch: List[tuple] = []
+    batch_size = max(1, settings.bulk_import_batch_size)
+
+    async def _flush() -> AsyncIterator[bytes]:
+        nonlocal created, failed
+        rows = [row for _, row in batch]
+        try:
+            inserted = await run_in_threadpool(_insert_batch, rows, summarize)
+        except Exception as e:  # noqa: BLE001
+            logger.warning("bulk import batch insert failed: %s", e)
+            for item, _ in batch:
+                failed += 1
+                yield _line({"event": "item", "index": item.index, "source": item.source, "status": "error", "error": f"insert failed: {e}"})
+            batch.clear()
+            return
+        for (item, row), ids in zip(batch, inserted):
+            created += 1
+            if summarize and (row["content_text"] or "").strip():
+                _summary_pool.submit(generate_post_summary, ids["id"], row["content_text"]).add_done_callback(_summary_done)
+            yield _line({"event": "item", "index": item.index, "source": item.source, "status": "created", "title": row["title"], **ids})
+        batch.clear()
+
+    try:
+        for fut in asyncio.as_completed(tasks):
+            item, row = await fut
+            if isinstance(row, Exception):
+                failed += 1
+                yield _line({"event": "item", "index": item.index, "source": item.source, "status": "error", "error": str(row) or type(row).__name__})
+                continue
+            batch.append((item, row))
+            if len(batch) >= batch_size:
+                async for line in _flush():
+                    yield line
+        if batch:
+            async for line in _flush():
+                yield line
+    finally:
+        # Client went away or the stream failed: stop the remaining work
+        for t in tasks:
+            t.cancel()
+    yield _line({"event": "done", "created": created, "failed": failed, "elapsed_s": round(time.perf_counter() - start, 3)})
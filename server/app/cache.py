@@ -1,22 +1,167 @@
 import json
 import logging
-from typing import Any, Optional
+import math
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
 
+import orjson
 import redis
+import redis.client
 
 from .config import settings
+from .metrics import record_cache
 
 logger = logging.getLogger(__name__)
 
+try:  # optional: faster/better compression than zlib
+    import zstandard as _zstd  # type: ignore
+except Exception:  # noqa: BLE001
+    _zstd = None
+try:
+    import lz4.frame as _lz4  # type: ignore
+except Exception:  # noqa: BLE001
+    _lz4 = None
+
+
+# Connections ------------------------------------------------------------------
+# All clients share bounded pools with short connect/read timeouts, so a stalled
+# Redis costs a request at most ~a second. On top of that a small circuit
+# breaker opens after a few consecutive connection errors/timeouts: while open,
+# every command raises RedisUnavailable immediately and the cache helpers fall
+# back to "miss", i.e. the routes read from the database.
+
+
+class RedisUnavailable(redis.ConnectionError):
+    """Raised without touching the network while the Redis breaker is open."""
+
+
+class _RedisBreaker:
+    def __init__(self, failure_threshold: int, cooldown: float) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.short_circuited = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def before(self) -> None:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return
+            self.short_circuited += 1
+        raise RedisUnavailable("redis circuit open")
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self.trial_in_flight = False
+            if ok:
+                self.consecutive_failures = 0
+                self.opened_at = None
+                return
+            self.consecutive_failures += 1
+            if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning("redis unavailable, failing fast for %.0fs", self.cooldown)
+                self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """End a half-open trial that said nothing about availability (e.g. it was cancelled)."""
+        with self._lock:
+            self.trial_in_flight = False
+
+
+_breaker = _RedisBreaker(settings.redis_breaker_failures, settings.redis_breaker_cooldown_seconds)
+_UNAVAILABLE = (redis.ConnectionError, redis.TimeoutError, OSError)
+
+
+@contextmanager
+def _guarded() -> Iterator[None]:
+    """Run one Redis round trip under the breaker; every outcome ends a half-open trial."""
+    _breaker.before()
+    try:
+        yield
+    except _UNAVAILABLE:
+        _breaker.record(False)
+        raise
+    except redis.ResponseError:
+        # Command errors (WRONGTYPE, NOSCRIPT, ...) mean Redis answered
+        _breaker.record(True)
+        raise
+    except BaseException:
+        _breaker.release()
+        raise
+    _breaker.record(True)
+
+
+class _GuardedPipeline(redis.client.Pipeline):
+    def execute(self, raise_on_error: bool = True) -> List[Any]:
+        if not self.command_stack:
+            return super().execute(raise_on_error)
+        with _guarded():
+            return super().execute(raise_on_error)
+
+
+class _GuardedRedis(redis.Redis):
+    def execute_command(self, *args: Any, **options: Any) -> Any:
+        with _guarded():
+            return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Any = None) -> _GuardedPipeline:
+        return _GuardedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def _pool_kwargs() -> Dict[str, Any]:
+    return {
+        "max_connections": settings.redis_max_connections,
+        "socket_connect_timeout": settings.redis_connect_timeout_seconds,
+        "socket_timeout": settings.redis_socket_timeout_seconds,
+        "socket_keepalive": True,
+        "health_check_interval": settings.redis_health_check_interval_seconds,
+        "retry_on_timeout": False,
+    }
+
 
 _redis: Optional[redis.Redis] = None
 _redis_bytes: Optional[redis.Redis] = None
+_async_redis: Dict[int, Any] = {}
+_client_lock = threading.Lock()
+
+
+def _make_client(decode: bool) -> redis.Redis:
+    # Blocking pool: when every connection is busy, wait briefly for one instead of erroring
+    pool = redis.BlockingConnectionPool.from_url(
+        settings.redis_url,
+        decode_responses=decode,
+        timeout=settings.redis_connect_timeout_seconds,
+        **_pool_kwargs(),
+    )
+    return _GuardedRedis(connection_pool=pool)
 
 
 def get_redis() -> redis.Redis:
     global _redis
     if _redis is None:
-        _redis = redis.from_url(settings.redis_url, decode_responses=True)
+        with _client_lock:
+            if _redis is None:
+                _redis = _make_client(decode=True)
     return _redis
 
 
@@ -24,10 +169,66 @@ def get_redis_bytes() -> redis.Redis:
     """Redis connection for binary payloads (no unicode decoding)."""
     global _redis_bytes
     if _redis_bytes is None:
-        _redis_bytes = redis.from_url(settings.redis_url, decode_responses=False)
+        with _client_lock:
+            if _redis_bytes is None:
+                _redis_bytes = _make_client(decode=False)
     return _redis_bytes
 
 
+def get_async_redis() -> "redis.asyncio.Redis":
+    """Binary ``redis.asyncio`` client for async routes (one pool per event loop)."""
+    import asyncio
+
+    import redis.asyncio as aioredis
+
+    loop_id = id(asyncio.get_running_loop())
+    client = _async_redis.get(loop_id)
+    if client is None:
+        client = aioredis.from_url(settings.redis_url, decode_responses=False, **_pool_kwargs())
+        _async_redis[loop_id] = client
+    return client
+
+
+async def _aguard(method: str, *args: Any, **kwargs: Any) -> Any:
+    with _guarded():
+        return await getattr(get_async_redis(), method)(*args, **kwargs)
+
+
+async def close_redis() -> None:
+    """Release pooled connections (app shutdown)."""
+    global _redis, _redis_bytes
+    for client in (_redis, _redis_bytes):
+        if client is not None:
+            client.connection_pool.disconnect()
+    _redis = _redis_bytes = None
+    for client in list(_async_redis.values()):
+        try:
+            await client.aclose()
+        except Exception:  # noqa: BLE001
+            pass
+    _async_redis.clear()
+
+
+def redis_client_stats() -> Dict[str, Any]:
+    pools = {}
+    for name, client in (("text", _redis), ("bytes", _redis_bytes)):
+        if client is not None:
+            pool = client.connection_pool
+            pools[name] = {
+                "max_connections": pool.max_connections,
+                "created": len(pool._connections),
+                # The blocking pool's queue holds idle connections plus unused (None) slots
+                "in_use": pool.max_connections - pool.pool.qsize(),
+            }
+    return {
+        "breaker": _breaker.state,
+        "consecutive_failures": _breaker.consecutive_failures,
+        "short_circuited": _breaker.short_circuited,
+        "pools": pools,
+        "async_clients": len(_async_redis),
+    }
+
+
 def cache_get(key: str) -> Optional[str]:
     try:
         r = get_redis()
@@ -45,18 +246,111 @@ def cache_set(key: str, value: str, ttl: Optional[int] = None) -> None:
         logger.debug("cache_set error: %s", e)
 
 
+# Value codec -----------------------------------------------------------------
+# Encoded values start with a 4-byte header: magic b"\x00C" + format version +
+# codec id, followed by orjson bytes (optionally compressed). Values without the
+# header are legacy json.dumps text and are still readable, so the codec can be
+# rolled out (or back, with CACHE_CODEC=legacy) without flushing Redis.
+_MAGIC = b"\x00C"
+_VERSION = 1
+_CODEC_IDS = {"none": 0, "zlib": 1, "zstd": 2, "lz4": 3}
+
+_codec_stats: Dict[str, int] = {"encoded": 0, "compressed": 0, "raw_bytes": 0, "stored_bytes": 0, "decode_errors": 0}
+
+
+def _compressor() -> str:
+    name = settings.cache_codec
+    if name == "zstd" and _zstd is None:
+        name = "zlib"
+    if name == "lz4" and _lz4 is None:
+        name = "zlib"
+    return name if name in _CODEC_IDS else "zlib"
+
+
+def encode_value(obj: Any) -> bytes:
+    if settings.cache_codec == "legacy":
+        return json.dumps(obj).encode()
+    body = orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    raw_len = len(body)
+    codec = "none"
+    if len(body) >= settings.cache_compress_min_bytes:
+        codec = _compressor()
+        if codec == "zstd":
+            body = _zstd.ZstdCompressor(level=3).compress(body)
+        elif codec == "lz4":
+            body = _lz4.compress(body)
+        elif codec == "zlib":
+            body = zlib.compress(body, 6)
+    out = _MAGIC + bytes((_VERSION, _CODEC_IDS[codec])) + body
+    _codec_stats["encoded"] += 1
+    _codec_stats["compressed"] += codec != "none"
+    _codec_stats["stored_bytes"] += len(out)
+    _codec_stats["raw_bytes"] += raw_len
+    return out
+
+
+def decode_value(raw: bytes) -> Any:
+    if raw[:2] != _MAGIC:
+        return json.loads(raw)
+    version, codec = raw[2], raw[3]
+    if version != _VERSION:
+        raise ValueError(f"unsupported cache format version {version}")
+    body = raw[4:]
+    if codec == _CODEC_IDS["zstd"]:
+        if _zstd is None:
+            raise ValueError("zstd value but zstandard is not installed")
+        body = _zstd.ZstdDecompressor().decompress(body)
+    elif codec == _CODEC_IDS["lz4"]:
+        if _lz4 is None:
+            raise ValueError("lz4 value but lz4 is not installed")
+        body = _lz4.decompress(body)
+    elif codec == _CODEC_IDS["zlib"]:
+        body = zlib.decompress(body)
+    return orjson.loads(body)
+
+
+def codec_stats() -> Dict[str, Any]:
+    ratio = _codec_stats["stored_bytes"] / _codec_stats["raw_bytes"] if _codec_stats["raw_bytes"] else None
+    return {
+        "codec": _compressor() if settings.cache_codec != "legacy" else "legacy",
+        **_codec_stats,
+        "stored_to_raw_ratio": round(ratio, 4) if ratio else None,
+    }
+
+
+def redis_memory_stats() -> Dict[str, Any]:
+    """Server-side memory and eviction counters from Redis INFO."""
+    try:
+        r = get_redis()
+        mem = r.info("memory")
+        st = r.info("stats")
+        return {
+            "used_memory": mem.get("used_memory"),
+            "maxmemory": mem.get("maxmemory"),
+            "maxmemory_policy": mem.get("maxmemory_policy"),
+            "evicted_keys": st.get("evicted_keys"),
+            "keyspace_hits": st.get("keyspace_hits"),
+            "keyspace_misses": st.get("keyspace_misses"),
+        }
+    except Exception as e:  # noqa: BLE001
+        return {"error": str(e)}
+
+
 def cache_json_get(key: str) -> Optional[Any]:
-    s = cache_get(key)
-    if not s:
+    raw = cache_bytes_get(key)
+    record_cache(key, bool(raw))
+    if not raw:
         return None
     try:
-        return json.loads(s)
-    except Exception:  # noqa: BLE001
+        return decode_value(raw)
+    except Exception as e:  # noqa: BLE001
+        _codec_stats["decode_errors"] += 1
+        logger.debug("cache_json_get decode error for %s: %s", key, e)
         return None
 
 
-def cache_json_set(key: str, obj: Any, ttl: Optional[int] = None) -> None:
-    cache_set(key, json.dumps(obj), ttl)
+def cache_json_set(key: str, obj: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
+    cache_json_mset({key: obj}, ttl, tags)
 
 
 def cache_delete(key: str) -> None:
@@ -67,6 +361,229 @@ def cache_delete(key: str) -> None:
         logger.debug("cache_delete error: %s", e)
 
 
+# Batched helpers --------------------------------------------------------------
+# Tags group keys for invalidation: every view of one post, all list views, all feeds.
+LIST_TAG = "lists"
+FEED_TAG = "feeds"
+
+
+def post_tag(post_id: str) -> str:
+    return f"post:{post_id}"
+
+
+def _tag_key(tag: str) -> str:
+    return f"tag:{tag}"
+
+
+def cache_json_mget(keys: Sequence[str]) -> List[Optional[Any]]:
+    """Fetch several JSON values in one round-trip (None for misses)."""
+    if not keys:
+        return []
+    try:
+        raws = get_redis_bytes().mget(list(keys))
+    except Exception as e:  # noqa: BLE001
+        logger.debug("cache_json_mget error: %s", e)
+        return [None] * len(keys)
+    out: List[Optional[Any]] = []
+    for key, raw in zip(keys, raws):
+        record_cache(key, bool(raw))
+        if not raw:
+            out.append(None)
+            continue
+        try:
+            out.append(decode_value(raw))
+        except Exception as e:  # noqa: BLE001
+            _codec_stats["decode_errors"] += 1
+            logger.debug("cache_json_mget decode error for %s: %s", key, e)
+            out.append(None)
+    return out
+
+
+def cache_json_mset(items: Dict[str, Any], ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
+    """Store several JSON values (and register them under ``tags``) in one pipelined round-trip."""
+    if not items:
+        return
+    ex = ttl or settings.redis_cache_ttl_seconds
+    tags = list(tags)
+    try:
+        pipe = get_redis_bytes().pipeline(transaction=False)
+        for key, obj in items.items():
+            pipe.set(key, encode_value(obj), ex=ex)
+        for tag in tags:
+            pipe.sadd(_tag_key(tag), *items.keys())
+            # Tag sets outlive their members so invalidation never misses a live key
+            pipe.expire(_tag_key(tag), max(ex, settings.redis_cache_ttl_seconds))
+        pipe.execute()
+    except Exception as e:  # noqa: BLE001
+        logger.debug("cache_json_mset error: %s", e)
+
+
+def cache_tag(tag: str, *keys: str) -> None:
+    """Register existing keys under ``tag`` for later cache_invalidate(tags=...)."""
+    if not keys:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.sadd(_tag_key(tag), *keys)
+        pipe.expire(_tag_key(tag), settings.redis_cache_ttl_seconds)
+        pipe.execute()
+    except Exception as e:  # noqa: BLE001
+        logger.debug("cache_tag error: %s", e)
+
+
+_INVALIDATE_LUA = """
+local n = 0
+for i = 1, #KEYS do
+  if string.sub(KEYS[i], 1, 4) == 'tag:' then
+    local members = redis.call('SMEMBERS', KEYS[i])
+    for j = 1, #members, 500 do
+      n = n + redis.call('DEL', unpack(members, j, math.min(j + 499, #members)))
+    end
+  end
+  n = n + redis.call('DEL', KEYS[i])
+end
+return n
+"""
+_invalidate_script = None
+
+
+def cache_invalidate(keys: Iterable[str] = (), tags: Iterable[str] = ()) -> None:
+    """Delete ``keys`` plus every key registered under ``tags`` in one round-trip."""
+    global _invalidate_script
+    all_keys = list(dict.fromkeys(list(keys) + [_tag_key(t) for t in tags]))
+    if not all_keys:
+        return
+    try:
+        r = get_redis()
+        if _invalidate_script is None:
+            _invalidate_script = r.register_script(_INVALIDATE_LUA)
+        _invalidate_script(keys=all_keys)
+        return
+    except Exception as e:  # noqa: BLE001
+        logger.debug("cache_invalidate script failed, falling back to pipeline: %s", e)
+    try:
+        r = get_redis()
+        tag_keys = [k for k in all_keys if k.startswith("tag:")]
+        members = r.sunion(tag_keys) if tag_keys else set()
+        r.delete(*all_keys, *members)
+    except Exception as e:  # noqa: BLE001
+        logger.debug("cache_invalidate error: %s", e)
+
+
+# Stale-while-revalidate ---------------------------------------------------------
+# Values are wrapped in an envelope carrying a soft expiry and the time the last
+# load took. Until the soft expiry (minus an XFetch-style random head start that
+# grows with load cost) the value is served as-is; after it, the stale value is
+# still served while a single worker reloads it in the background. Redis' own
+# TTL is the hard expiry. Misses are loaded under a short lock so concurrent
+# requests wait for one loader instead of stampeding the database.
+_SWR_MARK = "__swr__"
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+
+
+def _lock_key(key: str) -> str:
+    return f"lock:{key}"
+
+
+def _try_lock(key: str) -> bool:
+    try:
+        return bool(get_redis().set(_lock_key(key), "1", nx=True, ex=max(1, int(settings.cache_lock_seconds))))
+    except Exception:  # noqa: BLE001
+        # Without Redis there is nothing to coordinate on; load locally
+        return True
+
+
+def _unlock(key: str) -> None:
+    cache_delete(_lock_key(key))
+
+
+def _store_envelope(key: str, value: Any, delta: float, ttl: Optional[int], soft_ttl: int,
+                    tags: Sequence[str], only_if_exists: bool = False) -> None:
+    env = {_SWR_MARK: 1, "v": value, "exp": time.time() + soft_ttl, "delta": round(delta, 6)}
+    ex = ttl or settings.redis_cache_ttl_seconds
+    try:
+        pipe = get_redis_bytes().pipeline(transaction=False)
+        # A background refresh must not resurrect a key that was invalidated meanwhile
+        pipe.set(key, encode_value(env), ex=ex, xx=only_if_exists)
+        for tag in tags:
+            pipe.sadd(_tag_key(tag), key)
+            pipe.expire(_tag_key(tag), max(ex, settings.redis_cache_ttl_seconds))
+        pipe.execute()
+    except Exception as e:  # noqa: BLE001
+        logger.debug("cache swr store error: %s", e)
+
+
+def _load_and_store(key: str, loader: Callable[[], Any], ttl: Optional[int], soft_ttl: int,
+                    tags: Sequence[str], only_if_exists: bool = False) -> Any:
+    start = time.perf_counter()
+    value = loader()
+    if value is not None:
+        _store_envelope(key, value, time.perf_counter() - start, ttl, soft_ttl, tags, only_if_exists)
+    elif settings.cache_negative_ttl_seconds > 0:
+        # Cache the miss briefly: waiters on the lock see it at once and repeated 404s skip the DB.
+        # Creating the post invalidates its slug key, so the marker never hides a new row for long.
+        neg = settings.cache_negative_ttl_seconds
+        _store_envelope(key, None, 0.0, neg, neg, (), only_if_exists)
+    return value
+
+
+def _background_refresh(key: str, loader: Callable[[], Any], ttl: Optional[int], soft_ttl: int, tags: Sequence[str]) -> None:
+    try:
+        _load_and_store(key, loader, ttl, soft_ttl, tags, only_if_exists=True)
+    except Exception as e:  # noqa: BLE001
+        logger.warning("cache refresh of %s failed: %s", key, e)
+    finally:
+        _unlock(key)
+
+
+def cache_json_prime(key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
+    """Write a freshly built value in the envelope format read by cache_json_get_or_load."""
+    _store_envelope(key, value, 0.0, ttl, settings.cache_soft_ttl_seconds, list(tags))
+
+
+def cache_json_get_or_load(key: str, loader: Callable[[], Any], ttl: Optional[int] = None,
+                           soft_ttl: Optional[int] = None, tags: Iterable[str] = ()) -> Any:
+    """Return the cached value for ``key``, loading it with ``loader()`` when needed.
+
+    ``loader`` runs outside the request (for background refreshes), so it must
+    open its own DB session. A ``None`` result is cached for only
+    ``CACHE_NEGATIVE_TTL_SECONDS``, without tags.
+    """
+    soft = soft_ttl or settings.cache_soft_ttl_seconds
+    tags = list(tags)
+    env = cache_json_get(key)
+    if isinstance(env, dict) and env.get(_SWR_MARK) == 1:
+        value = env.get("v")
+        exp = float(env.get("exp") or 0)
+        delta = float(env.get("delta") or 0)
+        head_start = -delta * settings.cache_early_refresh_beta * math.log(max(random.random(), 1e-12))
+        if time.time() + head_start < exp:
+            return value
+        if _try_lock(key):
+            try:
+                _refresh_pool.submit(_background_refresh, key, loader, ttl, soft, tags)
+            except Exception:  # noqa: BLE001
+                _unlock(key)
+        return value
+    if env is not None:
+        # Plain value written before the envelope format; serve until it expires
+        return env
+
+    if _try_lock(key):
+        try:
+            return _load_and_store(key, loader, ttl, soft, tags)
+        finally:
+            _unlock(key)
+    # Someone else is loading: wait for their result rather than hitting the DB too
+    deadline = time.monotonic() + settings.cache_lock_wait_seconds
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        env = cache_json_get(key)
+        if isinstance(env, dict) and env.get(_SWR_MARK) == 1:
+            return env.get("v")
+    return _load_and_store(key, loader, ttl, soft, tags)
+
+
 # Binary helpers -------------------------------------------------------------
 def cache_bytes_get(key: str) -> Optional[bytes]:
     try:
@@ -90,3 +607,42 @@ def cache_bytes_set(key: str, value: bytes, ttl: Optional[int] = None) -> None:
             r.set(key, value, ex=effective_ttl)
     except Exception as e:  # noqa: BLE001
         logger.debug("cache_bytes_set error: %s", e)
+
+
+# Async variants (async routes must not block the event loop on Redis) ---------
+async def acache_bytes_get(key: str) -> Optional[bytes]:
+    try:
+        return await _aguard("get", key)
+    except Exception as e:  # noqa: BLE001
+        logger.debug("acache_bytes_get error: %s", e)
+        return None
+
+
+async def acache_bytes_set(key: str, value: bytes, ttl: Optional[int] = None) -> None:
+    effective_ttl = ttl
+    if effective_ttl is None and settings.redis_binary_ttl_seconds > 0:
+        effective_ttl = settings.redis_binary_ttl_seconds
+    try:
+        await _aguard("set", key, value, ex=effective_ttl)
+    except Exception as e:  # noqa: BLE001
+        logger.debug("acache_bytes_set error: %s", e)
+
+
+async def acache_json_get(key: str) -> Optional[Any]:
+    raw = await acache_bytes_get(key)
+    record_cache(key, bool(raw))
+    if not raw:
+        return None
+    try:
+        return decode_value(raw)
+    except Exception as e:  # noqa: BLE001
+        _codec_stats["decode_errors"] += 1
+        logger.debug("acache_json_get decode error for %s: %s", key, e)
+        return None
+
+
+async def acache_json_set(key: str, obj: Any, ttl: Optional[int] = None) -> None:
+    try:
+        await _aguard("set", key, encode_value(obj), ex=ttl or settings.redis_cache_ttl_seconds)
+    except Exception as e:  # noqa: BLE001
+        logger.debug("acache_json_set error: %s", e)
@@ -10,9 +10,39 @@ class Settings(BaseSettings):
     log_level: str = Field(default="INFO", alias="LOG_LEVEL")
 
     database_url: str = Field(default="sqlite:///./data.db", alias="DATABASE_URL")
+    # Run Base.metadata.create_all on startup (disable once the schema is managed elsewhere)
+    db_create_all: bool = Field(default=True, alias="DB_CREATE_ALL")
+    # Import parsers and compile the LangGraph graphs in the background once the app is up
+    warmup_on_startup: bool = Field(default=True, alias="WARMUP_ON_STARTUP")
+    # Prometheus text at /metrics plus X-Response-Time / Server-Timing headers
+    metrics_enabled: bool = Field(default=True, alias="METRICS_ENABLED")
+    # Sampling profiler: keep stack profiles of requests slower than the threshold
+    # (0 disables) and of a random fraction of requests; see /api/admin/profiles
+    profile_enabled: bool = Field(default=False, alias="PROFILE_ENABLED")
+    profile_threshold_seconds: float = Field(default=2.0, alias="PROFILE_THRESHOLD_SECONDS")
+    profile_sample_rate: float = Field(default=0.0, alias="PROFILE_SAMPLE_RATE")
+    profile_interval_ms: float = Field(default=5.0, alias="PROFILE_INTERVAL_MS")
+    profile_store_size: int = Field(default=50, alias="PROFILE_STORE_SIZE")
 
     redis_url: str = Field(default="redis://localhost:6379/0", alias="REDIS_URL")
     redis_cache_ttl_seconds: int = Field(default=86400, alias="REDIS_CACHE_TTL_SECONDS")
+    redis_max_connections: int = Field(default=50, alias="REDIS_MAX_CONNECTIONS")
+    redis_connect_timeout_seconds: float = Field(default=0.5, alias="REDIS_CONNECT_TIMEOUT_SECONDS")
+    redis_socket_timeout_seconds: float = Field(default=1.0, alias="REDIS_SOCKET_TIMEOUT_SECONDS")
+    redis_health_check_interval_seconds: int = Field(default=30, alias="REDIS_HEALTH_CHECK_INTERVAL_SECONDS")
+    # After this many consecutive connection errors, skip Redis for the cooldown
+    redis_breaker_failures: int = Field(default=3, alias="REDIS_BREAKER_FAILURES")
+    redis_breaker_cooldown_seconds: float = Field(default=5.0, alias="REDIS_BREAKER_COOLDOWN_SECONDS")
+    # Blog read caches: served fresh until the soft TTL, then stale while one worker refreshes
+    cache_soft_ttl_seconds: int = Field(default=3600, alias="CACHE_SOFT_TTL_SECONDS")
+    cache_early_refresh_beta: float = Field(default=1.0, alias="CACHE_EARLY_REFRESH_BETA")
+    cache_lock_seconds: float = Field(default=30.0, alias="CACHE_LOCK_SECONDS")
+    cache_lock_wait_seconds: float = Field(default=2.0, alias="CACHE_LOCK_WAIT_SECONDS")
+    # Loader misses (unknown slug) are cached this long so repeated 404s skip the DB (0 = off)
+    cache_negative_ttl_seconds: int = Field(default=5, alias="CACHE_NEGATIVE_TTL_SECONDS")
+    # JSON cache values: orjson + compression above a size threshold (zstd|lz4|zlib|none|legacy)
+    cache_codec: str = Field(default="zstd", alias="CACHE_CODEC")
+    cache_compress_min_bytes: int = Field(default=1024, alias="CACHE_COMPRESS_MIN_BYTES")
     # Binary assets (images/uploads) in Redis: 0 = no expiry
     redis_binary_ttl_seconds: int = Field(default=0, alias="REDIS_BINARY_TTL_SECONDS")
 
@@ -22,11 +52,78 @@ class Settings(BaseSettings):
     ollama_base_url: str | None = Field(default=None, alias="OLLAMA_BASE_URL")
     ollama_model: str = Field(default="gpt-oss-20b", alias="OLLAMA_MODEL")
     llm_parse_mode: str = Field(default="require", alias="LLM_PARSE_MODE")  # require|prefer|off
+    # OpenAI-compatible Groq endpoint override (e.g. a local stand-in server)
+    groq_base_url: str | None = Field(default=None, alias="GROQ_BASE_URL")
+    # Provider routing: per-provider timeouts, circuit breaker and hedging (0 = no hedge)
+    llm_timeout_groq_seconds: float = Field(default=30.0, alias="LLM_TIMEOUT_GROQ_SECONDS")
+    llm_timeout_ollama_seconds: float = Field(default=120.0, alias="LLM_TIMEOUT_OLLAMA_SECONDS")
+    llm_health_window: int = Field(default=50, alias="LLM_HEALTH_WINDOW")
+    llm_breaker_failures: int = Field(default=3, alias="LLM_BREAKER_FAILURES")
+    llm_breaker_cooldown_seconds: float = Field(default=30.0, alias="LLM_BREAKER_COOLDOWN_SECONDS")
+    llm_hedge_after_seconds: float = Field(default=0.0, alias="LLM_HEDGE_AFTER_SECONDS")
+    # Client-side budgets shared across workers via Redis; opt-in (0 = unlimited). Set them to
+    # the account's tier, e.g. 30 RPM / 30000 TPM on Groq's free tier
+    llm_groq_rpm: int = Field(default=0, alias="LLM_GROQ_RPM")
+    llm_groq_tpm: int = Field(default=0, alias="LLM_GROQ_TPM")
+    llm_ollama_rpm: int = Field(default=0, alias="LLM_OLLAMA_RPM")
+    llm_ollama_tpm: int = Field(default=0, alias="LLM_OLLAMA_TPM")
+    llm_ollama_max_concurrency: int = Field(default=2, alias="LLM_OLLAMA_MAX_CONCURRENCY")
+    llm_queue_max_wait_seconds: float = Field(default=60.0, alias="LLM_QUEUE_MAX_WAIT_SECONDS")
+    llm_rate_limit_backoff_seconds: float = Field(default=10.0, alias="LLM_RATE_LIMIT_BACKOFF_SECONDS")
+    # Near-duplicate completion cache (normalized prompt + MinHash similarity); opt-in, and only
+    # consulted by call sites passing semantic_ok=True (summaries), never by edit/refine prompts
+    llm_semantic_cache_enabled: bool = Field(default=False, alias="LLM_SEMANTIC_CACHE_ENABLED")
+    llm_semantic_cache_threshold: float = Field(default=0.9, alias="LLM_SEMANTIC_CACHE_THRESHOLD")
+    llm_semantic_cache_max_entries: int = Field(default=100000, alias="LLM_SEMANTIC_CACHE_MAX_ENTRIES")
+    llm_default_completion_tokens: int = Field(default=1024, alias="LLM_DEFAULT_COMPLETION_TOKENS")
+    # Stored tables whose html+data exceed this many bytes are kept in post_table_blobs
+    table_inline_max_bytes: int = Field(default=16 * 1024, alias="TABLE_INLINE_MAX_BYTES")
+    # Post revisions: a full snapshot at least every N revisions (bounds reconstruction to N-1 deltas)
+    revision_snapshot_every: int = Field(default=20, alias="REVISION_SNAPSHOT_EVERY")
+    # Incremental section refine: max chars per LLM call, neighbouring blocks sent as context, parallel calls
+    refine_chunk_chars: int = Field(default=6000, alias="REFINE_CHUNK_CHARS")
+    refine_context_blocks: int = Field(default=1, alias="REFINE_CONTEXT_BLOCKS")
+    refine_max_parallel: int = Field(default=4, alias="REFINE_MAX_PARALLEL")
+    # PDF export: renders per process, seconds to wait for a slot before 503, bytes kept in memory before spooling to disk
+    pdf_render_concurrency: int = Field(default=2, alias="PDF_RENDER_CONCURRENCY")
+    pdf_render_wait_seconds: float = Field(default=10.0, alias="PDF_RENDER_WAIT_SECONDS")
+    pdf_spool_max_bytes: int = Field(default=1024 * 1024, alias="PDF_SPOOL_MAX_BYTES")
+    # Post derivatives (excerpt, word count, reading time, first image, outline)
+    reading_words_per_minute: int = Field(default=230, alias="READING_WORDS_PER_MINUTE")
+    # Post summaries are generated in the background after create_post commits
+    summary_max_attempts: int = Field(default=3, alias="SUMMARY_MAX_ATTEMPTS")
+    summary_retry_backoff_seconds: float = Field(default=2.0, alias="SUMMARY_RETRY_BACKOFF_SECONDS")
+    # Without an LLM (or after every attempt failed) store an extractive summary instead
+    summary_extractive_fallback: bool = Field(default=True, alias="SUMMARY_EXTRACTIVE_FALLBACK")
 
     storage_dir: str = Field(default="server/storage", alias="STORAGE_DIR")
+    # url= imports: pooled async client, per-host limit, size cap, conditional refetch
+    fetch_timeout_seconds: float = Field(default=30.0, alias="FETCH_TIMEOUT_SECONDS")
+    fetch_connect_timeout_seconds: float = Field(default=5.0, alias="FETCH_CONNECT_TIMEOUT_SECONDS")
+    fetch_max_bytes: int = Field(default=25 * 1024 * 1024, alias="FETCH_MAX_BYTES")
+    fetch_max_connections: int = Field(default=50, alias="FETCH_MAX_CONNECTIONS")
+    fetch_per_host_concurrency: int = Field(default=4, alias="FETCH_PER_HOST_CONCURRENCY")
+    fetch_cache_ttl_seconds: int = Field(default=7 * 86400, alias="FETCH_CACHE_TTL_SECONDS")
+    fetch_cache_body_max_bytes: int = Field(default=2 * 1024 * 1024, alias="FETCH_CACHE_BODY_MAX_BYTES")
+    # POST /api/posts/import: items in flight, parse processes (0 = per core, <0 = threads), rows per commit
+    bulk_import_max_items: int = Field(default=500, alias="BULK_IMPORT_MAX_ITEMS")
+    bulk_import_concurrency: int = Field(default=8, alias="BULK_IMPORT_CONCURRENCY")
+    bulk_import_processes: int = Field(default=0, alias="BULK_IMPORT_PROCESSES")
+    bulk_import_batch_size: int = Field(default=25, alias="BULK_IMPORT_BATCH_SIZE")
+    # Total decompressed bytes accepted from one ZIP upload (0 = unlimited)
+    bulk_import_max_zip_bytes: int = Field(default=256 * 1024 * 1024, alias="BULK_IMPORT_MAX_ZIP_BYTES")
+    # CSV/XLSX ingestion: bounded Markdown preview; all rows go to a gzip CSV attachment
+    table_preview_rows: int = Field(default=50, alias="TABLE_PREVIEW_ROWS")
+    table_preview_columns: int = Field(default=30, alias="TABLE_PREVIEW_COLUMNS")
+    table_max_rows: int = Field(default=1000000, alias="TABLE_MAX_ROWS")
+    # Static pre-render target; when set, creates/deletes incrementally rebuild it
+    static_export_dir: str | None = Field(default=None, alias="STATIC_EXPORT_DIR")
+    static_export_page_size: int = Field(default=20, alias="STATIC_EXPORT_PAGE_SIZE")
 
     backend_cors_origins: str = Field(default="http://localhost:3000,http://localhost:3001,https://eclectic-elf-45002c.netlify.app", alias="BACKEND_CORS_ORIGINS")
     backend_cors_regex: str | None = Field(default=r"^https?://(localhost|127\.0\.0\.1|eclectic-elf-45002c\.netlify\.app)(:\d+)?$", alias="BACKEND_CORS_REGEX")
+    # Token required by /api/admin/* (header X-Admin-Token); admin endpoints are off when unset
+    admin_token: str | None = Field(default=None, alias="ADMIN_TOKEN")
     site_base_url: str = Field(default="https://eclectic-elf-45002c.netlify.app", alias="SITE_BASE_URL")
 
     def model_post_init(self, __context) -> None:  # type: ignore[override]
@@ -46,10 +143,14 @@ class Settings(BaseSettings):
         # Ensure model always has a valid default if env/.env is empty
         self.groq_model = _clean(self.groq_model) or "llama3-8b-8192"  # type: ignore[assignment]
         self.ollama_base_url = _clean(self.ollama_base_url)  # type: ignore[assignment]
+        self.groq_base_url = _clean(self.groq_base_url)  # type: ignore[assignment]
         self.ollama_model = _clean(self.ollama_model)  # type: ignore[assignment]
         self.llm_parse_mode = _clean(self.llm_parse_mode, lower=True) or "require"  # type: ignore[assignment]
+        self.cache_codec = _clean(self.cache_codec, lower=True) or "zstd"  # type: ignore[assignment]
         self.backend_cors_origins = _clean(self.backend_cors_origins) or "http://localhost:3000,http://localhost:3001"  # type: ignore[assignment]
         self.backend_cors_regex = _clean(self.backend_cors_regex)  # type: ignore[assignment]
+        self.admin_token = _clean(self.admin_token)  # type: ignore[assignment]
+        self.static_export_dir = _clean(self.static_export_dir)  # type: ignore[assignment]
         self.site_base_url = _clean(self.site_base_url) or "http://localhost:3001"  # type: ignore[assignment]
 
     class Config:
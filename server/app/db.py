@@ -1,6 +1,10 @@
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from typing import List
+
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from .config import settings
+from .metrics import instrument_engine
 
 
 class Base(DeclarativeBase):
@@ -8,6 +12,7 @@ class Base(DeclarativeBase):
 
 
 engine = create_engine(settings.database_url, pool_pre_ping=True)
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -18,3 +23,34 @@ def get_db():
     finally:
         db.close()
 
+
+@contextmanager
+def session_scope():
+    """Session for work outside a request (background tasks, cache loaders)."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def ensure_schema() -> List[str]:
+    """``create_all`` plus ``ADD COLUMN`` for nullable columns added to existing tables.
+
+    Covers additive model changes without a migration; anything else (NOT
+    NULL columns, type changes) still needs Alembic. Returns the added columns.
+    """
+    Base.metadata.create_all(bind=engine)
+    existing = inspect(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    added: List[str] = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            have = {c["name"] for c in existing.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in have or not col.nullable:
+                    continue
+                ddl_type = col.type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(col.name)} {ddl_type}")
+                added.append(f"{table.name}.{col.name}")
+    return added
@@ -0,0 +1,237 @@
+"""Values derived from a post's body, computed on write and stored in columns.
+
+``apply_derivatives`` runs wherever a post's content is written (create,
+update, restore, bulk import). It sets:
+
+- ``excerpt``: the first prose of the post as plain text, at most ``EXCERPT_CHARS`` characters;
+- ``word_count`` and ``reading_minutes`` (``READING_WORDS_PER_MINUTE``);
+- ``first_image``: the first image URL from ``images``, Markdown or HTML;
+- ``outline``: the headings as ``[{"level": 2, "text": "..."}]``.
+
+List and feed queries read these columns instead of the deferred body.
+``extractive_summary`` is the offline fallback for post summaries when no
+LLM is configured or every attempt failed.
+"""
+from __future__ import annotations
+
+import html
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from .config import settings
+
+EXCERPT_CHARS = 500
+
+_FENCE = re.compile(r"^\s*(`{3,}|~{3,})")
+_MD_HEADING = re.compile(r"^\s{0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+_MD_IMAGE = re.compile(r"!\[[^\]]*\]\(\s*<?([^)\s>]+)[^)]*\)")
+_MD_LIST_ITEM = re.compile(r"^\s*(?:[-+*]|\d+[.)])\s+")
+_MD_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_MD_DECOR = re.compile(r"[*_`~]+|^\s*(?:>\s*)+|^\s*(?:[-+*]|\d+[.)])\s+", re.MULTILINE)
+_HTML_IMAGE = re.compile(r"<img\b[^>]*?\bsrc\s*=\s*[\"']([^\"']+)", re.IGNORECASE)
+_HTML_HEADING = re.compile(r"<h([1-6])\b[^>]*>(.*?)</h\1\s*>", re.IGNORECASE | re.DOTALL)
+_HTML_SKIP = re.compile(r"<(script|style|pre)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_HTML_BLOCK_END = re.compile(r"</(p|div|li|h[1-6]|tr|blockquote|section|article)\s*>|<br\s*/?>", re.IGNORECASE)
+_TAG = re.compile(r"<[^>]+>")
+_WORD = re.compile(r"\w+(?:['’]\w+)*")
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[A-Z0-9\"'(])")
+_WS = re.compile(r"[ \t]+")
+
+# Small English stop list; only used to weight sentences for the extractive summary
+_STOPWORDS = frozenset(
+    "a about above after again all also am an and any are as at be because been before being below between both"
+    " but by can could did do does doing down during each few for from further had has have having he her here"
+    " hers him his how i if in into is it its itself just me more most my no nor not now of off on once only or"
+    " other our ours out over own same she should so some such than that the their theirs them then there these"
+    " they this those through to too under until up very was we were what when where which while who whom why"
+    " will with would you your yours".split()
+)
+
+
+def _markdown_paragraphs(md: str) -> List[str]:
+    """Prose paragraphs of Markdown as plain text; headings, code, tables and images are dropped."""
+    paragraphs: List[str] = []
+    cur: List[str] = []
+    fence: Optional[str] = None
+
+    def flush() -> None:
+        if cur:
+            text = _WS.sub(" ", " ".join(cur)).strip()
+            if text:
+                paragraphs.append(text)
+            cur.clear()
+
+    for line in md.splitlines():
+        if fence is not None:
+            if line.lstrip().startswith(fence):
+                fence = None
+            continue
+        m = _FENCE.match(line)
+        if m:
+            flush()
+            fence = m.group(1)
+            continue
+        stripped = line.strip()
+        if not stripped or _MD_HEADING.match(line) or stripped.startswith("|"):
+            flush()
+            continue
+        if _MD_LIST_ITEM.match(line):
+            # Each list item reads as its own sentence
+            flush()
+        text = _MD_IMAGE.sub(" ", line) if "![" in line else line
+        text = _MD_LINK.sub(r"\1", text)
+        text = html.unescape(_TAG.sub(" ", _MD_DECOR.sub(" ", text)))
+        if text.strip():
+            cur.append(text.strip())
+    flush()
+    return paragraphs
+
+
+def _html_paragraphs(markup: str) -> List[str]:
+    text = _HTML_SKIP.sub(" ", markup)
+    text = _HTML_HEADING.sub("\n\n", text)
+    text = _HTML_BLOCK_END.sub("\n\n", text)
+    text = html.unescape(_TAG.sub(" ", text))
+    return [p for p in (_WS.sub(" ", part.replace("\n", " ")).strip() for part in text.split("\n\n")) if p]
+
+
+def plain_paragraphs(content_text: Optional[str], content_html: Optional[str] = None) -> List[str]:
+    if content_text and content_text.strip():
+        return _markdown_paragraphs(content_text)
+    if content_html and content_html.strip():
+        return _html_paragraphs(content_html)
+    return []
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    cut = text[: limit - 1]
+    space = cut.rfind(" ")
+    if space > limit // 2:
+        cut = cut[:space]
+    return cut.rstrip(" ,;:-") + "…"
+
+
+def make_excerpt(paragraphs: List[str], limit: int = EXCERPT_CHARS) -> str:
+    out = ""
+    for p in paragraphs:
+        out = f"{out} {p}" if out else p
+        if len(out) >= limit:
+            break
+    return _truncate(out, limit)
+
+
+def _outline(content_text: Optional[str], content_html: Optional[str]) -> List[Dict[str, Any]]:
+    outline: List[Dict[str, Any]] = []
+    if content_text and content_text.strip():
+        fence: Optional[str] = None
+        for line in content_text.splitlines():
+            if fence is not None:
+                if line.lstrip().startswith(fence):
+                    fence = None
+                continue
+            m = _FENCE.match(line)
+            if m:
+                fence = m.group(1)
+                continue
+            m = _MD_HEADING.match(line)
+            if m and m.group(2):
+                text = _MD_LINK.sub(r"\1", m.group(2)).replace("`", "").replace("*", "").strip()
+                outline.append({"level": len(m.group(1)), "text": text[:200]})
+    elif content_html:
+        for level, inner in _HTML_HEADING.findall(content_html):
+            text = _WS.sub(" ", html.unescape(_TAG.sub(" ", inner))).strip()
+            if text:
+                outline.append({"level": int(level), "text": text[:200]})
+    return outline
+
+
+def _first_image(images: Any, content_text: Optional[str], content_html: Optional[str]) -> Optional[str]:
+    for img in images or []:
+        url = img.get("url") if isinstance(img, dict) else getattr(img, "url", None)
+        if url:
+            return url
+    for source, pattern in ((content_text, _MD_IMAGE), (content_html, _HTML_IMAGE)):
+        m = pattern.search(source or "")
+        if m:
+            return m.group(1)
+    return None
+
+
+def compute_derivatives(content_text: Optional[str], content_html: Optional[str] = None,
+                        images: Any = None) -> Dict[str, Any]:
+    paragraphs = plain_paragraphs(content_text, content_html)
+    words = sum(len(_WORD.findall(p)) for p in paragraphs)
+    wpm = max(1, settings.reading_words_per_minute)
+    return {
+        "excerpt": make_excerpt(paragraphs) or None,
+        "word_count": words,
+        "reading_minutes": math.ceil(words / wpm) if words else 0,
+        "first_image": (_first_image(images, content_text, content_html) or "")[:2048] or None,
+        "outline": _outline(content_text, content_html),
+    }
+
+
+def apply_derivatives(post: Any) -> None:
+    """Recompute the derivative columns of ``post`` from its current body."""
+    for name, value in compute_derivatives(post.content_text, post.content_html, post.images).items():
+        setattr(post, name, value)
+
+
+def extractive_summary(content_text: Optional[str], content_html: Optional[str] = None,
+                       max_sentences: int = 3, max_chars: int = 600) -> Optional[str]:
+    """Top sentences by content-word frequency, in document order; None for posts without prose."""
+    paragraphs = plain_paragraphs(content_text, content_html)
+    sentences = [s.strip() for p in paragraphs for s in _SENTENCE_END.split(p)]
+    # Complete sentences only: list fragments and captions rarely end in punctuation
+    sentences = [s for s in sentences if 20 <= len(s) <= 500 and s[-1] in ".!?" and len(_WORD.findall(s)) >= 4]
+    if not sentences:
+        return make_excerpt(paragraphs, max_chars) or None
+    if len(sentences) <= max_sentences:
+        return _truncate(" ".join(sentences), max_chars)
+    tokens = [[w.lower() for w in _WORD.findall(s)] for s in sentences]
+    freq = Counter(w for ws in tokens for w in ws if w not in _STOPWORDS and len(w) > 2)
+    top = max(freq.values(), default=1)
+
+    def score(i: int) -> float:
+        content = [w for w in tokens[i] if w in freq]
+        if not content:
+            return 0.0
+        # Normalized by sqrt(length) so long sentences do not win by size alone; the lead sentence gets a nudge
+        base = sum(freq[w] for w in content) / top / math.sqrt(len(tokens[i]))
+        return base * (1.25 if i == 0 else 1.0)
+
+    chosen = sorted(sorted(range(len(sentences)), key=score, reverse=True)[:max_sentences])
+    return _truncate(" ".join(sentences[i] for i in chosen), max_chars)
+
+
+def backfill_derivatives(batch_size: int = 200) -> int:
+    """Fill derivative columns for rows written before they existed; returns rows updated."""
+    from sqlalchemy import update
+
+    from .db import session_scope
+    from .models import BlogPost, with_body
+
+    updated = 0
+    with session_scope() as db:
+        while True:
+            rows = (
+                db.query(BlogPost)
+                .options(with_body())
+                .filter(BlogPost.word_count.is_(None))
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            for row in rows:
+                values = compute_derivatives(row.content_text, row.content_html, row.images)
+                # Core UPDATE so the backfill does not bump updated_at (feeds, sitemap lastmod)
+                db.execute(update(BlogPost).where(BlogPost.id == row.id).values(updated_at=BlogPost.updated_at, **values))
+            db.commit()
+            db.expire_all()
+            updated += len(rows)
+    return updated
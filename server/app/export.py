@@ -0,0 +1,368 @@
+"""Static pre-render of the public blog.
+
+Writes every post, the paginated list pages, the feeds and a sitemap into a
+directory that any static host can serve::
+
+    <out>/index.html, <out>/blog/index.html -> first list page
+    <out>/page/<n>/index.html             -> further list pages
+    <out>/blog/<slug>/index.html          -> post page
+    <out>/api/posts.json                  -> list payload for every post (items shaped like GET /api/posts)
+    <out>/api/posts/slug/<slug>.json      -> post payload (same shape as GET /api/posts/slug/<slug>)
+    <out>/feed/rss.xml, atom.xml, feed.json
+    <out>/sitemap.xml
+
+Files are only rewritten when their content changes, so incremental rebuilds
+after a create/delete touch a handful of files.
+
+Usage: ``python -m server.app.export --out ./public`` (or ``python -m app.export``
+from ``server/``).
+"""
+from __future__ import annotations
+
+import argparse
+import html
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .db import SessionLocal
+from .feeds import FEED_KINDS, render_feed
+from .models import BlogPost, with_body
+
+logger = logging.getLogger(__name__)
+
+_FEED_FILES = {"rss": "rss.xml", "atom": "atom.xml", "json": "feed.json"}
+
+_lock = threading.Lock()
+
+
+# Rendering ------------------------------------------------------------------
+_INLINE_TOKEN = re.compile(r"`([^`]+)`|!\[([^\]]*)\]\(([^)\s]+)\)|\[([^\]]+)\]\(([^)\s]+)\)")
+_URL_SCHEME = re.compile(r"^([a-zA-Z][a-zA-Z0-9+.-]*):")
+_SAFE_SCHEMES = {"http", "https", "mailto"}
+
+
+def _safe_url(url: str) -> bool:
+    """http(s), mailto and relative URLs only; anything else (``javascript:``, ``data:``) is dropped."""
+    if any(ord(c) < 0x20 for c in url):
+        return False
+    m = _URL_SCHEME.match(url)
+    return m is None or m.group(1).lower() in _SAFE_SCHEMES
+
+
+def _emphasis(escaped: str) -> str:
+    s = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", escaped)
+    return re.sub(r"(?<!\*)\*(?!\*)(.+?)(?<!\*)\*(?!\*)", r"<em>\1</em>", s)
+
+
+def _inline(text: str) -> str:
+    # Tokens are matched on the raw text and every piece is escaped exactly once
+    out: List[str] = []
+    pos = 0
+    for m in _INLINE_TOKEN.finditer(text):
+        out.append(_emphasis(html.escape(text[pos : m.start()], quote=False)))
+        code, alt, src, label, href = m.groups()
+        if code is not None:
+            out.append(f"<code>{html.escape(code, quote=False)}</code>")
+        elif src is not None:
+            if _safe_url(src):
+                out.append(f'<img src="{html.escape(src)}" alt="{html.escape(alt)}">')
+            else:
+                out.append(html.escape(alt, quote=False))
+        else:
+            label_html = _emphasis(html.escape(label, quote=False))
+            out.append(f'<a href="{html.escape(href)}">{label_html}</a>' if _safe_url(href) else label_html)
+        pos = m.end()
+    out.append(_emphasis(html.escape(text[pos:], quote=False)))
+    return "".join(out)
+
+
+def markdown_to_html(md: str) -> str:
+    """Small Markdown subset (headings, lists, code, tables, images, emphasis) to HTML."""
+    out: List[str] = []
+    para: List[str] = []
+    lines = md.splitlines()
+    i = 0
+
+    def _flush_para() -> None:
+        if para:
+            out.append(f"<p>{_inline(' '.join(para))}</p>")
+            para.clear()
+
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            _flush_para()
+            code: List[str] = []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith("```"):
+                code.append(lines[i])
+                i += 1
+            out.append(f"<pre><code>{html.escape(chr(10).join(code))}</code></pre>")
+            i += 1
+            continue
+        m = re.match(r"^(#{1,6})\s+(.*)$", stripped)
+        if m:
+            _flush_para()
+            level = len(m.group(1))
+            out.append(f"<h{level}>{_inline(m.group(2))}</h{level}>")
+            i += 1
+            continue
+        if re.match(r"^\s*(?:[-*+]|\d+\.)\s+", line):
+            _flush_para()
+            ordered = bool(re.match(r"^\s*\d+\.", line))
+            items: List[str] = []
+            while i < len(lines) and re.match(r"^\s*(?:[-*+]|\d+\.)\s+", lines[i]):
+                items.append(re.sub(r"^\s*(?:[-*+]|\d+\.)\s+", "", lines[i]))
+                i += 1
+            tag = "ol" if ordered else "ul"
+            out.append(f"<{tag}>" + "".join(f"<li>{_inline(t)}</li>" for t in items) + f"</{tag}>")
+            continue
+        if "|" in stripped and i + 1 < len(lines) and re.search(r"\|\s*:?-{2,}", lines[i + 1]):
+            _flush_para()
+
+            def _cells(row: str) -> List[str]:
+                return [c.strip() for c in row.strip().strip("|").split("|")]
+
+            head = "".join(f"<th>{_inline(c)}</th>" for c in _cells(line))
+            rows: List[str] = []
+            i += 2
+            while i < len(lines) and "|" in lines[i]:
+                rows.append("<tr>" + "".join(f"<td>{_inline(c)}</td>" for c in _cells(lines[i])) + "</tr>")
+                i += 1
+            out.append(f"<table><thead><tr>{head}</tr></thead><tbody>{''.join(rows)}</tbody></table>")
+            continue
+        if not stripped:
+            _flush_para()
+        else:
+            para.append(stripped)
+        i += 1
+    _flush_para()
+    return "\n".join(out)
+
+
+def _page(title: str, body: str, description: str = "") -> str:
+    return (
+        "<!doctype html>\n<html lang=\"en\"><head><meta charset=\"utf-8\">"
+        "<meta name=\"viewport\" content=\"width=device-width, initial-scale=1\">"
+        f"<title>{html.escape(title)}</title>"
+        f"<meta name=\"description\" content=\"{html.escape(description)}\">"
+        f"<link rel=\"alternate\" type=\"application/rss+xml\" href=\"/feed/rss.xml\">"
+        f"</head><body><main>\n{body}\n</main></body></html>\n"
+    )
+
+
+def render_post_page(post: dict) -> str:
+    if post.get("content_html"):
+        body = post["content_html"]
+    else:
+        body = markdown_to_html(post.get("content_text") or "")
+    header = f"<h1>{html.escape(post['title'])}</h1>"
+    if post.get("source_type") == "external" and post.get("source_url"):
+        body = f"<p><a href=\"{html.escape(post['source_url'])}\">Read the original post</a></p>"
+    return _page(post["title"], f"<article>{header}\n{body}</article>", post.get("summary") or "")
+
+
+def render_list_page(posts: List[dict], page: int, pages: int) -> str:
+    items = []
+    for p in posts:
+        summary = f"<p>{html.escape(p['summary'])}</p>" if p.get("summary") else ""
+        items.append(f"<li><a href=\"/blog/{html.escape(p['slug'])}/\">{html.escape(p['title'])}</a>{summary}</li>")
+    nav = []
+    if page > 1:
+        nav.append(f"<a href=\"{'/' if page == 2 else f'/page/{page - 1}/'}\">Newer</a>")
+    if page < pages:
+        nav.append(f"<a href=\"/page/{page + 1}/\">Older</a>")
+    body = f"<h1>{html.escape(settings.app_name)}</h1>\n<ul>{''.join(items)}</ul>\n<nav>{' '.join(nav)}</nav>"
+    return _page(settings.app_name, body)
+
+
+def render_sitemap(posts: List[dict]) -> str:
+    base = settings.site_base_url.rstrip("/")
+    urls = [f"<url><loc>{html.escape(base)}/blog</loc></url>"]
+    for p in posts:
+        lastmod = f"<lastmod>{p['updated_at']}</lastmod>" if p.get("updated_at") else ""
+        urls.append(f"<url><loc>{html.escape(base)}/blog/{html.escape(p['slug'])}</loc>{lastmod}</url>")
+    return (
+        "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n"
+        "<urlset xmlns=\"http://www.sitemaps.org/schemas/sitemap/0.9\">\n" + "\n".join(urls) + "\n</urlset>\n"
+    )
+
+
+# Writing --------------------------------------------------------------------
+def _write_if_changed(path: Path, content: str) -> bool:
+    data = content.encode("utf-8")
+    try:
+        if path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Atomic replace so a static host never serves a half-written file
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+    return True
+
+
+def _post_paths(out: Path, slug: str) -> Optional[Tuple[Path, Path]]:
+    """Page directory and JSON file of a post, or None when either would resolve outside ``out``.
+
+    Slugs are slugified on write, but rows created before that may still hold
+    client-supplied values such as ``../x``.
+    """
+    root = out.resolve()
+    blog_dir, data_dir = out / "blog", out / "api" / "posts" / "slug"
+    page_dir, data = blog_dir / slug, data_dir / f"{slug}.json"
+    for path, parent in ((page_dir, blog_dir), (data, data_dir)):
+        # Exactly one level below its folder: rules out "", ".", ".." and nested slugs
+        resolved = path.resolve()
+        if not resolved.is_relative_to(root) or resolved.parent != parent.resolve():
+            logger.warning("static export: skipping post with unsafe slug %r", slug)
+            return None
+    return page_dir, data
+
+
+def _post_files(out: Path, post: dict) -> Dict[Path, str]:
+    paths = _post_paths(out, post["slug"])
+    if paths is None:
+        return {}
+    page_dir, data = paths
+    return {
+        page_dir / "index.html": render_post_page(post),
+        data: json.dumps(post, ensure_ascii=False),
+    }
+
+
+def _shared_files(db: Session, out: Path) -> Dict[Path, str]:
+    """List pages, list payload, feeds and sitemap (everything a create/delete affects)."""
+    rows = (
+        db.query(BlogPost.slug, BlogPost.updated_at)
+        .order_by(BlogPost.created_at.desc())
+        .all()
+    )
+    # Every post, unlike the API's first 100: the static index is the only way to reach older posts
+    listed = [r.to_list_dict() for r in db.query(BlogPost).order_by(BlogPost.created_at.desc()).yield_per(500)]
+    files: Dict[Path, str] = {out / "api" / "posts.json": json.dumps(listed, ensure_ascii=False)}
+
+    page_size = max(1, settings.static_export_page_size)
+    pages = max(1, (len(listed) + page_size - 1) // page_size)
+    for n in range(1, pages + 1):
+        chunk = listed[(n - 1) * page_size : n * page_size]
+        page_html = render_list_page(chunk, n, pages)
+        if n == 1:
+            files[out / "index.html"] = page_html
+            files[out / "blog" / "index.html"] = page_html
+        else:
+            files[out / "page" / str(n) / "index.html"] = page_html
+
+    for kind in FEED_KINDS:
+        files[out / "feed" / _FEED_FILES[kind]] = render_feed(db, kind)
+    files[out / "sitemap.xml"] = render_sitemap(
+        [{"slug": r.slug, "updated_at": r.updated_at.date().isoformat() if r.updated_at else None} for r in rows]
+    )
+    return files
+
+
+def _write_all(files: Dict[Path, str]) -> int:
+    return sum(1 for path, content in files.items() if _write_if_changed(path, content))
+
+
+def _remove_post_files(out: Path, slug: str) -> None:
+    paths = _post_paths(out, slug)
+    if paths is None:
+        return
+    page_dir, data = paths
+    shutil.rmtree(page_dir, ignore_errors=True)
+    data.unlink(missing_ok=True)
+
+
+def export_site(db: Session, out_dir: str | Path) -> dict:
+    """Full export; prunes pages of posts that no longer exist."""
+    out = Path(out_dir)
+    with _lock:
+        files: Dict[Path, str] = {}
+        slugs = set()
+        for row in db.query(BlogPost).options(with_body()).yield_per(100):
+            post = row.to_dict()
+            slugs.add(post["slug"])
+            files.update(_post_files(out, post))
+        files.update(_shared_files(db, out))
+        written = _write_all(files)
+
+        removed = 0
+        blog_dir = out / "blog"
+        if blog_dir.is_dir():
+            for child in blog_dir.iterdir():
+                if child.is_dir() and child.name not in slugs:
+                    _remove_post_files(out, child.name)
+                    removed += 1
+        # Drop list pages beyond the current page count
+        page_dir = out / "page"
+        if page_dir.is_dir():
+            for child in page_dir.iterdir():
+                if child / "index.html" not in files:
+                    shutil.rmtree(child, ignore_errors=True)
+    return {"files": len(files), "written": written, "removed": removed}
+
+
+def rebuild_static(slug: Optional[str] = None, removed_slug: Optional[str] = None, slugs: Sequence[str] = ()) -> None:
+    """Incremental rebuild after a write; no-op unless STATIC_EXPORT_DIR is set.
+
+    Re-renders the given post(s) (``slug`` and/or ``slugs``, e.g. a bulk-import
+    batch), drops a removed post's files and refreshes the shared
+    list/feed/sitemap files once.
+    """
+    if not settings.static_export_dir:
+        return
+    out = Path(settings.static_export_dir)
+    db = SessionLocal()
+    try:
+        with _lock:
+            files: Dict[Path, str] = {}
+            if removed_slug:
+                _remove_post_files(out, removed_slug)
+            wanted = [s for s in (slug, *slugs) if s]
+            if wanted:
+                for row in db.query(BlogPost).options(with_body()).filter(BlogPost.slug.in_(wanted)):
+                    files.update(_post_files(out, row.to_dict()))
+            files.update(_shared_files(db, out))
+            written = _write_all(files)
+        logger.info("static export: %d/%d files rewritten", written, len(files))
+    except Exception as e:  # noqa: BLE001
+        logger.warning("static export rebuild failed: %s", e)
+    finally:
+        db.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Pre-render the blog to static files")
+    parser.add_argument("--out", default=settings.static_export_dir, help="output directory (default: STATIC_EXPORT_DIR)")
+    args = parser.parse_args(argv)
+    if not args.out:
+        parser.error("--out is required when STATIC_EXPORT_DIR is not set")
+    logging.basicConfig(level=getattr(logging, settings.log_level.upper(), logging.INFO))
+    from .db import ensure_schema
+
+    ensure_schema()
+    db = SessionLocal()
+    try:
+        stats = export_site(db, args.out)
+    finally:
+        db.close()
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+from email.utils import format_datetime
+from typing import Dict, List
+from xml.sax.saxutils import escape as _xml_escape
+
+from sqlalchemy.orm import Session
+
+from .cache import FEED_TAG, cache_invalidate, cache_json_get_or_load, cache_json_mget, cache_json_set, post_tag
+from .config import settings
+from .db import session_scope
+from .models import BlogPost
+
+FEED_LIMIT = 50
+SUMMARY_CHARS = 500
+
+FEED_KINDS = ("rss", "atom", "json")
+MEDIA_TYPES = {
+    "rss": "application/rss+xml",
+    "atom": "application/atom+xml",
+    "json": "application/feed+json",
+}
+
+
+def _channel_key(kind: str) -> str:
+    return f"feed:{kind}"
+
+
+def _item_key(post_id: str) -> str:
+    return f"feed:item:{post_id}"
+
+
+def absolute_post_url(slug: str) -> str:
+    base = settings.site_base_url.rstrip("/")
+    return f"{base}/blog/{slug}"
+
+
+def _utc(value: dt.datetime | None) -> dt.datetime:
+    value = value or dt.datetime.utcnow()
+    return value.replace(tzinfo=dt.timezone.utc) if value.tzinfo is None else value
+
+
+def render_item_fragments(row: BlogPost) -> Dict[str, object]:
+    """Pre-render one post as an RSS item, an Atom entry and a JSON Feed item."""
+    link = absolute_post_url(row.slug)
+    published = _utc(row.created_at)
+    updated = _utc(row.updated_at or row.created_at)
+    summary = (row.meta or {}).get("summary") if isinstance(row.meta, dict) else None
+    if not summary:
+        # The stored excerpt; only rows written before it existed fall back to the body
+        summary = row.excerpt if row.excerpt is not None or row.word_count is not None else row.content_text
+    summary = (summary or "")[:SUMMARY_CHARS]
+    rss = (
+        f"<item>\n<title>{_xml_escape(row.title)}</title>\n<link>{_xml_escape(link)}</link>\n"
+        f"<guid>{_xml_escape(link)}</guid>\n<pubDate>{format_datetime(published)}</pubDate>\n"
+        f"<description>{_xml_escape(summary)}</description>\n</item>"
+    )
+    atom = (
+        f"<entry>\n<title>{_xml_escape(row.title)}</title>\n<link href=\"{_xml_escape(link)}\"/>\n"
+        f"<id>{_xml_escape(link)}</id>\n<updated>{updated.isoformat()}</updated>\n"
+        f"<summary>{_xml_escape(summary)}</summary>\n</entry>"
+    )
+    item = {
+        "id": link,
+        "url": link,
+        "title": row.title,
+        "summary": summary,
+        "date_published": published.isoformat(),
+        "date_modified": updated.isoformat(),
+    }
+    return {"rss": rss, "atom": atom, "json": item, "updated": updated.isoformat()}
+
+
+def _load_fragments(db: Session) -> List[Dict[str, object]]:
+    # Only ids are needed to order the feed; full rows are read just for posts
+    # whose fragments are not cached yet.
+    ids = [
+        r[0]
+        for r in db.query(BlogPost.id).order_by(BlogPost.created_at.desc()).limit(FEED_LIMIT).all()
+    ]
+    fragments: Dict[str, Dict[str, object]] = {}
+    missing: List[str] = []
+    for post_id, frag in zip(ids, cache_json_mget([_item_key(i) for i in ids])):
+        if isinstance(frag, dict):
+            fragments[post_id] = frag
+        else:
+            missing.append(post_id)
+    if missing:
+        for row in db.query(BlogPost).filter(BlogPost.id.in_(missing)).all():
+            frag = render_item_fragments(row)
+            cache_json_set(_item_key(row.id), frag, tags=[post_tag(row.id)])
+            fragments[row.id] = frag
+    return [fragments[i] for i in ids if i in fragments]
+
+
+def _splice(kind: str, fragments: List[Dict[str, object]]) -> str:
+    title = settings.app_name
+    site = settings.site_base_url
+    updated = max((str(f["updated"]) for f in fragments), default=_utc(None).isoformat())
+    if kind == "rss":
+        channel = (
+            f"<channel>\n<title>{_xml_escape(title)}</title>\n<link>{_xml_escape(site)}</link>\n"
+            f"<lastBuildDate>{format_datetime(dt.datetime.fromisoformat(updated))}</lastBuildDate>\n"
+            + "\n".join(str(f["rss"]) for f in fragments)
+            + "\n</channel>"
+        )
+        return f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><rss version=\"2.0\">{channel}</rss>"
+    if kind == "atom":
+        return (
+            f"<feed xmlns=\"http://www.w3.org/2005/Atom\">\n<title>{_xml_escape(title)}</title>\n"
+            f"<link href=\"{_xml_escape(site)}\"/>\n<updated>{updated}</updated>\n"
+            + "\n".join(str(f["atom"]) for f in fragments)
+            + "\n</feed>"
+        )
+    feed = {
+        "version": "https://jsonfeed.org/version/1.1",
+        "title": title,
+        "home_page_url": site,
+        "feed_url": f"{settings.site_base_url.rstrip('/')}/api/feed/feed.json",
+        "items": [f["json"] for f in fragments],
+    }
+    return json.dumps(feed, ensure_ascii=False)
+
+
+def render_feed(db: Session, kind: str) -> str:
+    """Render the ``rss``/``atom``/``json`` feed from cached item fragments (channel uncached)."""
+    return _splice(kind, _load_fragments(db))
+
+
+def build_feed(kind: str) -> str:
+    """Return the cached feed; a stale copy is served while it is rebuilt in the background."""
+    def _load() -> dict:
+        with session_scope() as db:
+            return {"body": render_feed(db, kind)}
+
+    return cache_json_get_or_load(_channel_key(kind), _load, tags=[FEED_TAG])["body"]
+
+
+def feed_keys(post_id: str | None = None) -> List[str]:
+    """Channel keys plus, when given, the fragment key of one post."""
+    keys = [_channel_key(kind) for kind in FEED_KINDS]
+    if post_id:
+        keys.append(_item_key(post_id))
+    return keys
+
+
+def invalidate_feeds(post_id: str | None = None) -> None:
+    """Drop the spliced channels and, when given, the fragments of one post."""
+    cache_invalidate(feed_keys(post_id), [FEED_TAG])
@@ -0,0 +1,234 @@
+"""Async URL fetching for ``url=`` imports.
+
+One pooled ``httpx.AsyncClient`` per event loop (keep-alive, HTTP/1.1), a
+semaphore per host so one slow site cannot take every connection, and a
+streamed download that stops at ``FETCH_MAX_BYTES``.
+
+Each fetched URL leaves validators in Redis (``fetch:<sha>``: ETag,
+Last-Modified, final URL, content type and the body's SHA-256). The next
+fetch sends ``If-None-Match``/``If-Modified-Since``; on 304 the caller gets
+the stored content hash without a download and can look the parse result up
+directly. Bodies up to ``FETCH_CACHE_BODY_MAX_BYTES`` are kept as well, so a
+304 can still be parsed when the parse result itself was evicted.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from contextlib import asynccontextmanager
+from pathlib import PurePosixPath
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .cache import acache_bytes_get, acache_bytes_set, acache_json_get, acache_json_set
+from .config import settings
+from .metrics import FETCH_SECONDS
+
+_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+# Extension added to the URL's last path segment when it has none, so parse_any picks a parser
+_EXTENSIONS = {
+    "text/html": ".html",
+    "application/xhtml+xml": ".html",
+    "text/plain": ".txt",
+    "text/markdown": ".md",
+    "text/csv": ".csv",
+    "application/json": ".json",
+    "application/pdf": ".pdf",
+    "application/vnd.ms-excel": ".xls",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": ".xlsx",
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/webp": ".webp",
+    "image/tiff": ".tiff",
+    "image/bmp": ".bmp",
+    "image/gif": ".gif",
+}
+
+_clients: Dict[int, Any] = {}
+
+
+class _HostLimit:
+    __slots__ = ("sem", "users")
+
+    def __init__(self) -> None:
+        self.sem = asyncio.Semaphore(max(1, settings.fetch_per_host_concurrency))
+        self.users = 0
+
+
+# Only hosts with a fetch running or waiting have an entry, so the map stays small
+_host_limits: Dict[Tuple[int, str], _HostLimit] = {}
+
+
+class FetchError(Exception):
+    """URL could not be fetched; ``status_code`` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FetchResult:
+    __slots__ = ("url", "final_url", "content", "content_type", "sha256", "not_modified")
+
+    def __init__(self, url: str, final_url: str, content: Optional[bytes], content_type: str,
+                 sha256: str, not_modified: bool = False) -> None:
+        self.url = url
+        self.final_url = final_url
+        # None when the origin answered 304; see load_body()
+        self.content = content
+        self.content_type = content_type
+        self.sha256 = sha256
+        self.not_modified = not_modified
+
+    @property
+    def filename(self) -> str:
+        name = PurePosixPath(urlsplit(self.final_url).path).name or "content"
+        ext = _EXTENSIONS.get(self.content_type)
+        if ext and not PurePosixPath(name).suffix:
+            name += ext
+        return name
+
+
+def _client() -> Any:
+    import httpx
+
+    loop_id = id(asyncio.get_running_loop())
+    client = _clients.get(loop_id)
+    if client is None:
+        client = httpx.AsyncClient(
+            headers=_HEADERS,
+            follow_redirects=True,
+            max_redirects=5,
+            timeout=httpx.Timeout(settings.fetch_timeout_seconds, connect=settings.fetch_connect_timeout_seconds),
+            limits=httpx.Limits(
+                max_connections=settings.fetch_max_connections,
+                max_keepalive_connections=settings.fetch_max_connections,
+            ),
+        )
+        _clients[loop_id] = client
+    return client
+
+
+@asynccontextmanager
+async def _host_limit(host: str) -> AsyncIterator[None]:
+    key = (id(asyncio.get_running_loop()), host)
+    limit = _host_limits.get(key)
+    if limit is None:
+        limit = _host_limits[key] = _HostLimit()
+    limit.users += 1
+    try:
+        async with limit.sem:
+            yield
+    finally:
+        limit.users -= 1
+        if limit.users == 0 and _host_limits.get(key) is limit:
+            del _host_limits[key]
+
+
+def _meta_key(url: str) -> str:
+    return "fetch:" + hashlib.sha256(url.encode()).hexdigest()[:32]
+
+
+def _body_key(sha256: str) -> str:
+    return f"fetchbody:{sha256}"
+
+
+async def _download(url: str, meta: Optional[Dict[str, Any]]) -> FetchResult:
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    limit = settings.fetch_max_bytes
+    async with _client().stream("GET", url, headers=headers) as resp:
+        if resp.status_code == 304:
+            if not meta:
+                # Nothing was sent to revalidate against, so there is no body to reuse
+                raise FetchError(f"Unexpected 304 Not Modified for url: {url}", status_code=502)
+            return FetchResult(url, meta.get("final_url") or url, None, meta.get("content_type") or "",
+                               meta["sha256"], not_modified=True)
+        if resp.status_code >= 400:
+            raise FetchError(f"{resp.status_code} {resp.reason_phrase} for url: {url}")
+        declared = resp.headers.get("Content-Length")
+        if limit > 0 and declared and declared.isdigit() and int(declared) > limit:
+            raise FetchError(f"Response is {declared} bytes; limit is {limit}", status_code=413)
+        chunks = []
+        size = 0
+        async for chunk in resp.aiter_bytes():
+            size += len(chunk)
+            if limit > 0 and size > limit:
+                raise FetchError(f"Response exceeds {limit} bytes", status_code=413)
+            chunks.append(chunk)
+        content = b"".join(chunks)
+        content_type = resp.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        result = FetchResult(url, str(resp.url), content, content_type, hashlib.sha256(content).hexdigest())
+        validators = {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+    if validators["etag"] or validators["last_modified"]:
+        await acache_json_set(_meta_key(url), {
+            **validators,
+            "final_url": result.final_url,
+            "content_type": content_type,
+            "sha256": result.sha256,
+        }, ttl=settings.fetch_cache_ttl_seconds)
+        if len(content) <= settings.fetch_cache_body_max_bytes:
+            await acache_bytes_set(_body_key(result.sha256), content, ttl=settings.fetch_cache_ttl_seconds)
+    return result
+
+
+async def fetch_url(url: str, revalidate: bool = True) -> FetchResult:
+    """GET ``url`` through the shared pool; conditional when validators are cached and ``revalidate``."""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise FetchError("Only http(s) URLs can be fetched")
+    meta = await acache_json_get(_meta_key(url)) if revalidate else None
+    if meta is not None and not meta.get("sha256"):
+        meta = None
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        async with _host_limit(parts.hostname.lower()):
+            result = await asyncio.wait_for(_download(url, meta), timeout=settings.fetch_timeout_seconds)
+        outcome = "not_modified" if result.not_modified else "ok"
+        return result
+    except FetchError:
+        raise
+    except asyncio.TimeoutError:
+        raise FetchError(f"Timed out after {settings.fetch_timeout_seconds:g}s", status_code=504)
+    except Exception as e:  # noqa: BLE001  (httpx transport errors, bad URLs)
+        raise FetchError(str(e) or type(e).__name__)
+    finally:
+        FETCH_SECONDS.observe(time.perf_counter() - start, outcome=outcome)
+
+
+async def load_body(result: FetchResult) -> bytes:
+    """Bytes for ``result``: the download, the cached body after a 304, or a fresh unconditional GET.
+
+    The fresh GET may return different content; ``result`` is updated to it, so
+    keys derived from ``sha256``/``filename``/``final_url`` must be rebuilt afterwards.
+    """
+    if result.content is not None:
+        return result.content
+    body = await acache_bytes_get(_body_key(result.sha256))
+    if body is not None and hashlib.sha256(body).hexdigest() == result.sha256:
+        result.content = body
+        return body
+    fresh = await fetch_url(result.url, revalidate=False)
+    result.content, result.sha256 = fresh.content, fresh.sha256
+    result.final_url, result.content_type = fresh.final_url, fresh.content_type
+    return fresh.content or b""
+
+
+async def close_fetcher() -> None:
+    """Close pooled HTTP connections (app shutdown)."""
+    for client in list(_clients.values()):
+        try:
+            await client.aclose()
+        except Exception:  # noqa: BLE001
+            pass
+    _clients.clear()
+    _host_limits.clear()
@@ -5,10 +5,10 @@ import json
 import logging
 from typing import Any, Dict, List, Optional
 
-import requests
-
 from .config import settings
-from .cache import cache_get, cache_set
+from .cache import cache_json_get, cache_json_set
+from .llm_router import ProviderError, build_router
+from .semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
@@ -20,15 +20,33 @@ def _hash_dict(d: Dict[str, Any]) -> str:
 class LLMClient:
     """
     Prefers Groq (gpt-oss-120b) with fallback to Ollama (gpt-oss-20b).
-    Uses Redis to cache completions keyed by input hash.
+    Provider choice, timeouts, circuit breaking and hedging live in LLMRouter.
+    Uses Redis to cache completions keyed by input hash. Call sites passing
+    ``semantic_ok=True`` may also be answered from a second tier keyed on
+    normalized / near-duplicate prompts (SemanticCache); edit and refine
+    prompts must not, since a small edit would return the old output.
     """
     def __init__(self) -> None:
         self.groq_api_key = settings.groq_api_key
         self.groq_model = settings.groq_model
         self.ollama_base = (settings.ollama_base_url or "").rstrip("/")
         self.ollama_model = settings.ollama_model
+        self.router = build_router()
+        self.semantic_cache = (
+            SemanticCache(
+                threshold=settings.llm_semantic_cache_threshold,
+                max_entries=settings.llm_semantic_cache_max_entries,
+            )
+            if settings.llm_semantic_cache_enabled
+            else None
+        )
+
+    def chat(self, messages: List[Dict[str, str]], temperature: float = 0.2, max_tokens: Optional[int] = None,
+             priority: Optional[str] = None, semantic_ok: bool = False) -> str:
+        """Complete ``messages``; ``priority`` (interactive|background) orders queued calls.
 
-    def chat(self, messages: List[Dict[str, str]], temperature: float = 0.2, max_tokens: Optional[int] = None) -> str:
+        ``semantic_ok`` allows answers for a near-identical prompt (when the tier is enabled).
+        """
         payload = {
             "messages": messages,
             "temperature": temperature,
@@ -36,56 +54,30 @@ class LLMClient:
             "max_tokens": max_tokens,
         }
         cache_key = f"llm:chat:{_hash_dict(payload)}"
-        cached = cache_get(cache_key)
-        if cached:
+        cached = cache_json_get(cache_key)
+        if isinstance(cached, str) and cached:
             return cached
+        semantic = self.semantic_cache if semantic_ok else None
+        if semantic is not None:
+            cached = semantic.lookup(payload)
+            if cached:
+                return cached
 
-        # Try Groq using LangChain integration
-        if self.groq_api_key:
-            try:
-                from langchain_groq import ChatGroq
-                llm = ChatGroq(
-                    groq_api_key=self.groq_api_key,
-                    model=self.groq_model,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                )
-                logger.info("Using Groq model: %s", self.groq_model)
-                response = llm.invoke(messages)
-                content = response.content.strip() if hasattr(response, 'content') else str(response)
-                cache_set(cache_key, content)
-                return content
-            except Exception as e:
-                logger.warning("Groq chat failed, falling back to Ollama: %s", e)
-
-        # Fallback to Ollama chat API only if explicitly configured
-        if self.ollama_base:
-            try:
-                resp = requests.post(
-                    f"{self.ollama_base}/api/chat",
-                    headers={"Content-Type": "application/json"},
-                    json={
-                        "model": self.ollama_model,
-                        "messages": messages,
-                        "options": {"temperature": temperature},
-                    },
-                    timeout=120,
-                )
-                resp.raise_for_status()
-                data = resp.json()
-                logger.info("Ollama chat")
-                # Ollama streams sometimes; in chat API final response has message
-                content = data.get("message", {}).get("content") or data.get("content") or ""
-                cache_set(cache_key, content)
-                return content
-            except Exception as e:  # noqa: BLE001
-                logger.error("Ollama chat failed: %s", e)
+        try:
+            content, provider = self.router.chat(messages, temperature=temperature, max_tokens=max_tokens, priority=priority)
+        except ProviderError as e:
+            if self.ollama_base:
                 raise
-        else:
-            logger.info("Ollama not configured; Groq-only mode")
-            # No raise—let caller handle no response if needed
-            return ""  # Or raise if strict
+            # Groq-only mode: no raise—let caller handle no response if needed
+            logger.warning("LLM chat failed: %s", e)
+            return ""
+        if provider is None:
+            logger.info("No LLM provider configured")
+            return ""
+        cache_json_set(cache_key, content)
+        if semantic is not None:
+            semantic.store(payload, content)
+        return content
 
 
 llm_client = LLMClient()
-
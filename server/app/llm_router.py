@@ -0,0 +1,357 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Optional
+
+import requests
+
+from .config import settings
+from .metrics import LLM_SECONDS
+from .ratelimit import ProviderLimiter, RateLimited, build_limiters, current_priority, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    pass
+
+
+class Provider:
+    """One chat backend. ``complete`` returns the assistant text or raises."""
+
+    name = "provider"
+
+    def __init__(self, timeout: float) -> None:
+        self.timeout = timeout
+
+    @property
+    def configured(self) -> bool:
+        return True
+
+    def complete(self, messages: List[Dict[str, str]], temperature: float, max_tokens: Optional[int]) -> str:
+        raise NotImplementedError
+
+
+class GroqProvider(Provider):
+    name = "groq"
+
+    def __init__(self, api_key: str | None, model: str, base_url: str | None, timeout: float) -> None:
+        super().__init__(timeout)
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    def complete(self, messages, temperature, max_tokens):
+        from langchain_groq import ChatGroq
+
+        kwargs: Dict[str, Any] = {}
+        if self.base_url:
+            kwargs["base_url"] = self.base_url
+        llm = ChatGroq(
+            groq_api_key=self.api_key,
+            model=self.model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=self.timeout,
+            # Retries are the router's job; the SDK's own backoff would hide a brownout
+            max_retries=0,
+            **kwargs,
+        )
+        logger.info("Using Groq model: %s", self.model)
+        response = llm.invoke(messages)
+        return response.content.strip() if hasattr(response, "content") else str(response)
+
+
+class OllamaProvider(Provider):
+    name = "ollama"
+
+    def __init__(self, base_url: str | None, model: str, timeout: float) -> None:
+        super().__init__(timeout)
+        self.base_url = (base_url or "").rstrip("/")
+        self.model = model
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.base_url)
+
+    def complete(self, messages, temperature, max_tokens):
+        options: Dict[str, Any] = {"temperature": temperature}
+        if max_tokens:
+            options["num_predict"] = max_tokens
+        resp = requests.post(
+            f"{self.base_url}/api/chat",
+            headers={"Content-Type": "application/json"},
+            json={"model": self.model, "messages": messages, "options": options, "stream": False},
+            timeout=self.timeout,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        logger.info("Ollama chat")
+        # Ollama streams sometimes; in chat API final response has message
+        return data.get("message", {}).get("content") or data.get("content") or ""
+
+
+class ProviderHealth:
+    """Rolling latency/error window plus a consecutive-failure circuit breaker.
+
+    closed -> open after ``failure_threshold`` consecutive failures; after
+    ``cooldown`` seconds one trial call is let through (half-open) and its
+    outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, window: int, failure_threshold: int, cooldown: float) -> None:
+        self.samples: Deque[tuple[float, bool]] = deque(maxlen=max(1, window))
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self.samples.append((latency, ok))
+            self.trial_in_flight = False
+            if ok:
+                self.consecutive_failures = 0
+                self.opened_at = None
+            else:
+                self.consecutive_failures += 1
+                if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+                    self.opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial slot when the call never reached the provider."""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def latency_p50(self) -> Optional[float]:
+        lat = sorted(l for l, ok in self.samples if ok)
+        return lat[len(lat) // 2] if lat else None
+
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def score(self) -> Optional[float]:
+        """Expected cost of a call: median latency inflated by the error rate."""
+        p50 = self.latency_p50()
+        if p50 is None:
+            return None
+        return p50 / max(0.05, 1.0 - self.error_rate())
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "samples": len(self.samples),
+            "latency_p50_s": self.latency_p50(),
+            "error_rate": round(self.error_rate(), 4),
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+class LLMRouter:
+    """Routes a chat call across providers.
+
+    Providers are tried in order of their health score (configured order
+    breaks ties and is used until latency samples exist); providers with an
+    open breaker are skipped. With ``hedge_after`` > 0 a second provider is
+    started when the first has not answered by that deadline, and the first
+    successful answer wins.
+    """
+
+    def __init__(self, providers: List[Provider], hedge_after: float = 0.0, window: int = 50,
+                 failure_threshold: int = 3, cooldown: float = 30.0, decisions: int = 100,
+                 limiters: Optional[Dict[str, ProviderLimiter]] = None) -> None:
+        self.providers = providers
+        self.limiters = limiters or {}
+        self.hedge_after = hedge_after
+        self.health = {p.name: ProviderHealth(window, failure_threshold, cooldown) for p in providers}
+        self.decisions: Deque[Dict[str, Any]] = deque(maxlen=decisions)
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+
+    def _ordered(self) -> List[Provider]:
+        configured = [p for p in self.providers if p.configured]
+        measured = sorted(
+            (p for p in configured if self.health[p.name].score() is not None),
+            key=lambda p: self.health[p.name].score(),
+        )
+        # Providers without successful samples keep their configured order at the back
+        return measured + [p for p in configured if p not in measured]
+
+    def _call(self, provider: Provider, messages, temperature, max_tokens, decision: Dict[str, Any]) -> str:
+        attempts: List[Dict[str, Any]] = decision["attempts"]
+        limiter = self.limiters.get(provider.name)
+        if limiter is not None and limiter.enabled:
+            try:
+                with limiter.admit(decision["tokens"], decision["priority"]) as waited:
+                    return self._timed_call(provider, messages, temperature, max_tokens, attempts, waited)
+            except RateLimited as e:
+                # Client-side budget exhausted: not a health signal for the provider
+                self.health[provider.name].release_trial()
+                attempts.append({"provider": provider.name, "ok": False, "rate_limited": True, "error": str(e)})
+                raise
+        return self._timed_call(provider, messages, temperature, max_tokens, attempts, 0.0)
+
+    def _timed_call(self, provider: Provider, messages, temperature, max_tokens,
+                    attempts: List[Dict[str, Any]], queue_wait: float) -> str:
+        start = time.perf_counter()
+        try:
+            content = provider.complete(messages, temperature, max_tokens)
+        except Exception as e:  # noqa: BLE001
+            latency = time.perf_counter() - start
+            status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+            if status == 429 and provider.name in self.limiters:
+                # Upstream says we are over budget: pause admissions for everyone
+                self.limiters[provider.name].penalize(settings.llm_rate_limit_backoff_seconds)
+                self.health[provider.name].release_trial()
+            else:
+                self.health[provider.name].record(latency, False)
+            LLM_SECONDS.observe(latency, provider=provider.name, outcome="rate_limited" if status == 429 else "error")
+            attempts.append({
+                "provider": provider.name, "ok": False, "latency_s": round(latency, 4),
+                "queue_wait_s": round(queue_wait, 4), "status": status, "error": str(e)[:200],
+            })
+            raise
+        latency = time.perf_counter() - start
+        self.health[provider.name].record(latency, True)
+        LLM_SECONDS.observe(latency, provider=provider.name, outcome="ok")
+        attempts.append({"provider": provider.name, "ok": True, "latency_s": round(latency, 4), "queue_wait_s": round(queue_wait, 4)})
+        return content
+
+    def chat(self, messages: List[Dict[str, str]], temperature: float = 0.2, max_tokens: Optional[int] = None,
+             priority: Optional[str] = None) -> tuple[str, Optional[str]]:
+        """Return ``(content, provider_name)``. Raises ProviderError when every provider failed."""
+        order = self._ordered()
+        decision: Dict[str, Any] = {
+            "ts": time.time(),
+            "priority": priority or current_priority.get(),
+            "tokens": estimate_tokens(messages, max_tokens),
+            "order": [p.name for p in order],
+            "skipped": [],
+            "hedged": False,
+            "attempts": [],
+            "chosen": None,
+        }
+        self.decisions.append(decision)
+        if not order:
+            return "", None
+        try:
+            if self.hedge_after > 0 and len(order) >= 2:
+                content, chosen = self._hedged(order, messages, temperature, max_tokens, decision)
+            else:
+                content, chosen = self._sequential(order, messages, temperature, max_tokens, decision)
+        except ProviderError:
+            logger.error("LLM routing failed: %s", decision)
+            raise
+        decision["chosen"] = chosen
+        logger.info("LLM routed to %s (order=%s hedged=%s)", chosen, decision["order"], decision["hedged"])
+        return content, chosen
+
+    def _admit(self, provider: Provider, decision: Dict[str, Any]) -> bool:
+        # Checked right before each call so a half-open trial slot is only taken when used
+        if self.health[provider.name].allow():
+            return True
+        decision["skipped"].append(provider.name)
+        return False
+
+    def _sequential(self, order, messages, temperature, max_tokens, decision):
+        last: Optional[Exception] = None
+        for p in order:
+            if not self._admit(p, decision):
+                continue
+            try:
+                return self._call(p, messages, temperature, max_tokens, decision), p.name
+            except Exception as e:  # noqa: BLE001
+                logger.warning("%s chat failed, trying next provider: %s", p.name, e)
+                last = e
+        raise ProviderError(f"all providers failed: {last}" if last else "no provider available")
+
+    def _hedged(self, order, messages, temperature, max_tokens, decision):
+        futures: Dict[Future, Provider] = {}
+        pending = list(order)
+
+        def _submit() -> bool:
+            while pending:
+                p = pending.pop(0)
+                if self._admit(p, decision):
+                    futures[self._pool.submit(self._call, p, messages, temperature, max_tokens, decision)] = p
+                    return True
+            return False
+
+        _submit()
+        first_wait: Optional[float] = self.hedge_after
+        last: Optional[BaseException] = None
+        while futures:
+            done, _ = wait(list(futures), timeout=first_wait, return_when=FIRST_COMPLETED)
+            first_wait = None
+            if not done:
+                # Deadline passed with no answer: hedge to the next provider
+                if _submit():
+                    decision["hedged"] = True
+                continue
+            for f in done:
+                p = futures.pop(f)
+                if f.exception() is None:
+                    return f.result(), p.name
+                last = f.exception()
+            if not futures and _submit():
+                first_wait = self.hedge_after
+        raise ProviderError(f"all providers failed: {last}" if last else "no provider available")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "hedge_after_s": self.hedge_after,
+            "providers": {
+                p.name: {
+                    "configured": p.configured,
+                    "timeout_s": p.timeout,
+                    **self.health[p.name].snapshot(),
+                    "limits": self.limiters[p.name].snapshot() if p.name in self.limiters else None,
+                }
+                for p in self.providers
+            },
+            "recent_decisions": list(self.decisions)[-20:],
+        }
+
+
+def build_router() -> LLMRouter:
+    providers: List[Provider] = [
+        GroqProvider(settings.groq_api_key, settings.groq_model, settings.groq_base_url, settings.llm_timeout_groq_seconds),
+        OllamaProvider(settings.ollama_base_url, settings.ollama_model, settings.llm_timeout_ollama_seconds),
+    ]
+    return LLMRouter(
+        providers,
+        hedge_after=settings.llm_hedge_after_seconds,
+        window=settings.llm_health_window,
+        failure_threshold=settings.llm_breaker_failures,
+        cooldown=settings.llm_breaker_cooldown_seconds,
+        limiters=build_limiters(),
+    )
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import logging
+import threading
+import time
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -11,8 +13,9 @@ from fastapi.responses import Response
 import mimetypes
 
 from .config import settings
-from .db import Base, engine
-from .routers import posts
+from .db import ensure_schema
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, TimingMiddleware, render_metrics
+from .routers import admin, posts
 from .observability import enable_langsmith_tracing
 from .utils import ensure_storage
 
@@ -33,23 +36,68 @@ if settings.backend_cors_regex:
 else:
     app.add_middleware(CORSMiddleware, allow_origins=origins, **cors_kwargs)
 
+if settings.profile_enabled:
+    from .profiler import ProfilingMiddleware
+
+    app.add_middleware(ProfilingMiddleware)
+if settings.metrics_enabled:
+    app.add_middleware(TimingMiddleware)
+
 app.include_router(posts.router)
+app.include_router(admin.router)
+
+
+def _warmup() -> None:
+    """Load what the first parse/refine/PDF request would otherwise pay for."""
+    start = time.perf_counter()
+    try:
+        from .agent.graph import get_parse_graph, get_refine_graph, get_summary_graph
+        from .parsing.parser import preload_parsers
+
+        preload_parsers()
+        get_parse_graph()
+        get_refine_graph()
+        get_summary_graph()
+        import reportlab.platypus  # noqa: F401  (PDF export)
+    except Exception as e:  # noqa: BLE001
+        logger.warning("warmup failed: %s", e)
+        return
+    logger.info("warmup finished in %.2fs", time.perf_counter() - start)
+
+
+def _backfill_derivatives() -> None:
+    from .derivatives import backfill_derivatives
+
+    try:
+        n = backfill_derivatives()
+    except Exception as e:  # noqa: BLE001
+        logger.warning("derivatives backfill failed: %s", e)
+        return
+    if n:
+        logger.info("derivatives backfilled for %d posts", n)
 
 
 @app.on_event("startup")
 def on_startup():
     enable_langsmith_tracing()
     ensure_storage()
-    Base.metadata.create_all(bind=engine)
+    if settings.db_create_all:
+        added = ensure_schema()
+        if added:
+            logger.info("added columns: %s", ", ".join(added))
+        threading.Thread(target=_backfill_derivatives, name="derivatives-backfill", daemon=True).start()
+    if settings.warmup_on_startup:
+        # Off the startup path so the process reports ready immediately
+        threading.Thread(target=_warmup, name="warmup", daemon=True).start()
     static_dir = Path(settings.storage_dir)
     app.mount("/static", StaticFiles(directory=static_dir, html=False), name="static")
 
     # Serve binary assets from Redis at /static-redis/{key}
-    from .cache import cache_bytes_get, cache_bytes_set
+    from .cache import acache_bytes_get, acache_bytes_set
 
     @app.get("/static-redis/{key:path}")
-    def get_static_redis(key: str, request: Request):
-        data = cache_bytes_get(key)
+    async def get_static_redis(key: str, request: Request):
+        data = await acache_bytes_get(key)
         if data is None:
             # Lazy-migrate legacy disk files into Redis for backward compatibility
             try:
@@ -58,15 +106,36 @@ def on_startup():
                 cand = base_dir / name
                 if cand.exists() and cand.is_file():
                     data = cand.read_bytes()
-                    cache_bytes_set(key, data)
+                    await acache_bytes_set(key, data)
                 else:
                     return Response(status_code=404)
             except Exception:
                 return Response(status_code=404)
-        ctype, _ = mimetypes.guess_type(key)
+        ctype, encoding = mimetypes.guess_type(key)
+        if encoding == "gzip":
+            # Compressed downloads (table exports) are served as-is, not as transfer-encoded CSV
+            ctype = "application/gzip"
         return Response(content=data, media_type=ctype or "application/octet-stream")
 
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    from .bulk_import import shutdown_parse_pool
+    from .cache import close_redis
+    from .fetcher import close_fetcher
+
+    shutdown_parse_pool()
+    await close_fetcher()
+    await close_redis()
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    if not settings.metrics_enabled:
+        return Response(status_code=404)
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/")
 def root():
     return {"service": settings.app_name, "status": "ok"}
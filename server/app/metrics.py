@@ -0,0 +1,251 @@
+"""In-process metrics with Prometheus text exposition.
+
+Small self-contained histograms/counters (no prometheus_client dependency);
+an observation is a lock plus a bisect, cheap enough to leave on. Values are
+per process: with several uvicorn workers each one is scraped separately.
+
+Histograms created with ``stage=...`` also add their time to the current
+request's breakdown, which TimingMiddleware returns as ``Server-Timing``.
+Only the outermost timer of a stage counts there: a docling or OCR timer
+running inside the ``parse_any`` timer is already part of its time.
+"""
+from __future__ import annotations
+
+import bisect
+import contextvars
+import functools
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_registry: Dict[str, "_Metric"] = {}
+_request_stages: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("request_stages", default=None)
+# Stages with a timer currently running in this context (nested timers of the same stage are not re-added)
+_open_stages: contextvars.ContextVar[frozenset] = contextvars.ContextVar("open_stages", default=frozenset())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        if name in _registry:
+            raise ValueError(f"metric {name} already registered")
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], extra: str = "") -> str:
+        parts = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._labels(k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, stage: Optional[str] = None) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.stage = stage
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, seconds: float, **labels: Any) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][idx] += 1
+            entry[1][0] += seconds
+        if self.stage and self.stage not in _open_stages.get():
+            add_stage(self.stage, seconds)
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        open_stages = _open_stages.get()
+        token = _open_stages.set(open_stages | {self.stage}) if self.stage and self.stage not in open_stages else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if token is not None:
+                _open_stages.reset(token)
+            self.observe(elapsed, **labels)
+
+    def wrap(self, fn: Callable[..., Any], **labels: Any) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def _timed(*args: Any, **kwargs: Any) -> Any:
+            with self.time(**labels):
+                return fn(*args, **kwargs)
+
+        return _timed
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Dict[str, float]]:
+        with self._lock:
+            return {k: {"count": sum(c), "sum": s[0]} for k, (c, s) in self._values.items()}
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(c), s[0]) for k, (c, s) in self._values.items()]
+        lines: List[str] = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="%s"' % _fmt(bound)
+                lines.append(f"{self.name}_bucket{self._labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+def render_metrics() -> str:
+    out: List[str] = []
+    for metric in list(_registry.values()):
+        out.append(f"# HELP {metric.name} {metric.help}")
+        out.append(f"# TYPE {metric.name} {metric.kind}")
+        out.extend(metric.render())
+    return "\n".join(out) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# Request-level stage breakdown ------------------------------------------------
+def add_stage(stage: str, seconds: float) -> None:
+    stages = _request_stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+# The application's metrics ----------------------------------------------------
+HTTP_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"))
+GRAPH_NODE_SECONDS = Histogram("graph_node_duration_seconds", "LangGraph node latency", ("graph", "node"))
+PARSER_SECONDS = Histogram("parser_duration_seconds", "Parser latency by format (incl. docling and ocr)", ("parser",), stage="parse")
+LLM_SECONDS = Histogram("llm_request_duration_seconds", "LLM provider call latency", ("provider", "outcome"), stage="llm")
+FETCH_SECONDS = Histogram("url_fetch_duration_seconds", "url= download latency by outcome (ok|not_modified|error)", ("outcome",), stage="fetch")
+PDF_SECONDS = Histogram("pdf_render_duration_seconds", "Markdown to PDF render latency", stage="pdf")
+PDF_REJECTED = Counter("pdf_render_rejected_total", "PDF requests refused with 503 while every render slot was busy")
+DB_SECONDS = Histogram(
+    "db_query_duration_seconds", "Database statement latency", ("operation",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0), stage="db",
+)
+REFINE_BLOCKS = Counter("refine_blocks_total", "Incremental refine blocks by result (reused|refined|failed)", ("result",))
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by key prefix and result", ("prefix", "result"))
+
+_PREFIX_PART = re.compile(r"^[a-z_]+$")
+
+
+def cache_prefix(key: str) -> str:
+    """Up to two leading all-letter segments (``blog:slug:x`` -> ``blog:slug``) to bound cardinality."""
+    parts: List[str] = []
+    for part in key.split(":", 2)[:2]:
+        if not _PREFIX_PART.match(part):
+            break
+        parts.append(part)
+    return ":".join(parts) or "other"
+
+
+def record_cache(key: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(prefix=cache_prefix(key), result="hit" if hit else "miss")
+
+
+def instrument_engine(engine: Any) -> None:
+    """Time every statement on ``engine`` via SQLAlchemy cursor events."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        starts = conn.info.get("_query_start")
+        if not starts:
+            return
+        op = (statement.lstrip().split(None, 1) or ["other"])[0].lower()
+        if op not in {"select", "insert", "update", "delete"}:
+            op = "other"
+        DB_SECONDS.observe(time.perf_counter() - starts.pop(), operation=op)
+
+
+class TimingMiddleware:
+    """ASGI middleware: request histogram plus ``X-Response-Time`` / ``Server-Timing`` headers."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        stages: Dict[str, float] = {}
+        token = _request_stages.set(stages)
+        status = {"code": 500}
+
+        async def _send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                elapsed = time.perf_counter() - start
+                timing = [f"{k};dur={v * 1000:.1f}" for k, v in stages.items()]
+                timing.append(f"total;dur={elapsed * 1000:.1f}")
+                headers = list(message.get("headers") or [])
+                headers.append((b"x-response-time", f"{elapsed * 1000:.1f}ms".encode()))
+                headers.append((b"server-timing", ", ".join(timing).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _request_stages.reset(token)
+            route = scope.get("route")
+            # Templated path keeps label cardinality bounded; unmatched paths share one label
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_SECONDS.observe(time.perf_counter() - start, method=scope.get("method", ""), route=path, status=status["code"])
@@ -4,11 +4,20 @@ import datetime as dt
 import uuid
 from typing import Any, Optional
 
-from sqlalchemy import JSON, String, Text
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import JSON, ForeignKey, Integer, LargeBinary, String, Text, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, undefer_group
 
 from .db import Base
 
+# Heavy columns load on first access (one SELECT for the whole group) unless a
+# query asks for them up front with ``with_body()``; list/feed queries never touch them
+BODY_GROUP = "body"
+
+
+def with_body() -> Any:
+    """Loader option for queries that render full posts."""
+    return undefer_group(BODY_GROUP)
+
 
 class BlogPost(Base):
     __tablename__ = "blog_posts"
@@ -20,13 +29,101 @@ class BlogPost(Base):
     source_type: Mapped[str] = mapped_column(String(32))  # upload|external|manual
     source_url: Mapped[Optional[str]] = mapped_column(String(2048), nullable=True)
 
-    content_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
-    content_html: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    content_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True, deferred=True, deferred_group=BODY_GROUP)
+    content_html: Mapped[Optional[str]] = mapped_column(Text, nullable=True, deferred=True, deferred_group=BODY_GROUP)
 
-    images: Mapped[Optional[Any]] = mapped_column(JSON, nullable=True)  # list of {url, alt}
-    tables: Mapped[Optional[Any]] = mapped_column(JSON, nullable=True)  # list of HTML strings or JSON tables
+    # list of {url, alt}
+    images: Mapped[Optional[Any]] = mapped_column(JSON, nullable=True, deferred=True, deferred_group=BODY_GROUP)
+    # list of TableRef dicts; large html/data payloads live in post_table_blobs (see table_store.py)
+    tables: Mapped[Optional[Any]] = mapped_column(JSON, nullable=True, deferred=True, deferred_group=BODY_GROUP)
     meta: Mapped[Optional[Any]] = mapped_column(JSON, nullable=True)
 
+    # Derived from the body on write (derivatives.py) so list/feed queries skip the body;
+    # nullable so db.ensure_schema can add them to existing tables
+    excerpt: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    word_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    reading_minutes: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    first_image: Mapped[Optional[str]] = mapped_column(String(2048), nullable=True)
+    outline: Mapped[Optional[Any]] = mapped_column(JSON, nullable=True, deferred=True, deferred_group=BODY_GROUP)
+
     created_at: Mapped[dt.datetime] = mapped_column(default=lambda: dt.datetime.utcnow())
     updated_at: Mapped[dt.datetime] = mapped_column(default=lambda: dt.datetime.utcnow(), onupdate=lambda: dt.datetime.utcnow())
 
+
+    def to_dict(self) -> dict:
+        """Public representation used by the API, the caches and the static export."""
+        meta = self.meta or {}
+        return {
+            "id": self.id,
+            "title": self.title,
+            "slug": self.slug,
+            "content_text": self.content_text,
+            "content_html": self.content_html,
+            "images": self.images or [],
+            "tables": self.tables or [],
+            "source_type": self.source_type,
+            "source_url": self.source_url,
+            "meta": meta,
+            "summary": meta.get("summary") if isinstance(meta, dict) else None,
+            "summary_status": meta.get("summary_status") if isinstance(meta, dict) else None,
+            **self._derived(),
+            "outline": self.outline or [],
+        }
+
+    def _derived(self) -> dict:
+        return {
+            "excerpt": self.excerpt,
+            "word_count": self.word_count,
+            "reading_minutes": self.reading_minutes,
+            "first_image": self.first_image,
+        }
+
+    def to_list_dict(self) -> dict:
+        """List/index representation; reads no deferred column."""
+        meta = self.meta if isinstance(self.meta, dict) else {}
+        return {
+            "id": self.id,
+            "title": self.title,
+            "slug": self.slug,
+            "source_type": self.source_type,
+            "source_url": self.source_url,
+            "summary": meta.get("summary"),
+            "summary_status": meta.get("summary_status"),
+            **self._derived(),
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+class PostRevision(Base):
+    """One saved version of a post's content (see revisions.py).
+
+    ``data`` is zlib-compressed JSON: the full content for ``snapshot`` rows,
+    a line-level edit script against revision ``number - 1`` for ``delta`` rows.
+    """
+
+    __tablename__ = "post_revisions"
+    __table_args__ = (UniqueConstraint("post_id", "number", name="uq_post_revisions_post_number"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    post_id: Mapped[str] = mapped_column(String(36), ForeignKey("blog_posts.id", ondelete="CASCADE"), index=True)
+    number: Mapped[int] = mapped_column(Integer)
+    kind: Mapped[str] = mapped_column(String(16))  # snapshot|delta
+    source: Mapped[str] = mapped_column(String(32))  # baseline|update|restore
+    title: Mapped[str] = mapped_column(String(512))
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+    created_at: Mapped[dt.datetime] = mapped_column(default=lambda: dt.datetime.utcnow())
+
+
+class PostTableBlob(Base):
+    """Out-of-line ``html``/``data`` of a large table, addressed by content hash within a post.
+
+    Rows are immutable, so revisions keep pointing at the payload they were saved with.
+    No foreign key: blobs are written before the post row they belong to.
+    """
+
+    __tablename__ = "post_table_blobs"
+
+    post_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+    created_at: Mapped[dt.datetime] = mapped_column(default=lambda: dt.datetime.utcnow())
@@ -0,0 +1,389 @@
+"""Main-content extraction for HTML pages.
+
+The page is parsed with lxml (C, libxml2) when available, otherwise with a
+small ``html.parser`` tree builder producing ElementTree elements; the rest
+only uses the API both share (``tag``/``get``/``text``/``tail``/iteration).
+
+Steps:
+1. Drop boilerplate: scripts/styles/forms/nav/aside/footer, hidden nodes and
+   elements whose class/id looks like navigation, ads, sharing, comments...
+2. Score blocks readability-style: every paragraph of 25+ characters credits
+   its ancestors (1 + commas + length bonus, halved per level), adjusted by
+   tag/class hints and by link density. The best block, plus siblings that
+   score close to it, is the article.
+3. Render the article as compact Markdown (headings, lists, code, quotes,
+   tables, images and links), resolving relative URLs against the page URL.
+"""
+from __future__ import annotations
+
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+from xml.etree import ElementTree as ET
+
+_DROP_TAGS = frozenset({
+    "script", "style", "noscript", "template", "iframe", "svg", "canvas", "form", "button", "input",
+    "select", "textarea", "nav", "aside", "footer", "dialog", "object", "embed", "link", "meta",
+})
+_DROP_ROLES = frozenset({"navigation", "banner", "complementary", "contentinfo", "dialog", "menu", "menubar", "search"})
+_KEEP_TAGS = frozenset({"html", "body", "main", "article"})
+_NEGATIVE = re.compile(
+    r"(?:^|[-_\s])(?:nav|navbar|menu|sidebar|sidenav|footer|masthead|breadcrumbs?|share|sharing|social|"
+    r"sponsor(?:ed)?|ads?|advert\w*|promo\w*|banner|cookies?|consent|popup|modal|newsletter|subscribe|"
+    r"signup|related|recommended|comments?|widget|toolbar|pagination|pager|skip)(?:[-_\s]|$)",
+    re.I,
+)
+_POSITIVE = re.compile(r"article|content|entry|main|post|story|body|text|blog|prose", re.I)
+_UNLIKELY_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.I)
+
+_BLOCK_TAGS = frozenset({
+    "address", "article", "blockquote", "body", "dd", "details", "div", "dl", "dt", "figcaption", "figure",
+    "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "html", "li", "main", "ol", "p", "pre", "section",
+    "summary", "table", "ul",
+})
+_PARAGRAPH_TAGS = frozenset({"p", "pre", "td", "blockquote", "li", "dd"})
+_TAG_BONUS = {
+    "article": 10, "main": 10, "div": 5, "section": 3, "pre": 3, "td": 3, "blockquote": 3,
+    "address": -3, "ol": -3, "ul": -3, "dl": -3, "dd": -3, "dt": -3, "li": -3,
+    "h1": -5, "h2": -5, "h3": -5, "h4": -5, "h5": -5, "h6": -5, "th": -5,
+}
+_WS = re.compile(r"\s+")
+_VOID = frozenset({"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"})
+# A new block element implicitly closes an open <p> (and <li> closes a sibling <li>)
+_CLOSES_P = _BLOCK_TAGS - {"body", "html"}
+
+
+# Parsing ---------------------------------------------------------------------------------------
+class _TreeBuilder(HTMLParser):
+    """Lenient html.parser -> ElementTree builder (fallback when lxml is missing or fails)."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.root = ET.Element("html")
+        self.stack: List[ET.Element] = [self.root]
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag == "html":
+            self.root.attrib.update({k: v or "" for k, v in attrs})
+            return
+        top = self.stack[-1].tag
+        if (tag in _CLOSES_P and top == "p") or (tag == "li" and top == "li"):
+            self.stack.pop()
+        el = ET.SubElement(self.stack[-1], tag, {k: v or "" for k, v in attrs})
+        if tag not in _VOID:
+            self.stack.append(el)
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID and len(self.stack) > 1 and self.stack[-1].tag == tag:
+            self.stack.pop()
+
+    def handle_endtag(self, tag: str) -> None:
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                del self.stack[i:]
+                return
+
+    def handle_data(self, data: str) -> None:
+        parent = self.stack[-1]
+        if len(parent):
+            last = parent[-1]
+            last.tail = (last.tail or "") + data
+        else:
+            parent.text = (parent.text or "") + data
+
+
+def _parse_tree(data: bytes) -> Tuple[Any, bool]:
+    """Document root and whether it came from lxml."""
+    try:
+        import lxml.html
+
+        return lxml.html.document_fromstring(data), True
+    except Exception:  # noqa: BLE001  (lxml missing, empty or undecodable document)
+        builder = _TreeBuilder()
+        builder.feed(data.decode("utf-8", errors="replace"))
+        builder.close()
+        return builder.root, False
+
+
+def _serialize(el: Any, is_lxml: bool) -> str:
+    if is_lxml:
+        import lxml.html
+
+        return lxml.html.tostring(el, encoding="unicode", with_tail=False)
+    tail, el.tail = el.tail, None
+    try:
+        return ET.tostring(el, encoding="unicode", method="html")
+    finally:
+        el.tail = tail
+
+
+# Cleaning and scoring --------------------------------------------------------------------------
+def _tag(el: Any) -> str:
+    # lxml comments/processing instructions have a callable tag
+    return el.tag.lower() if isinstance(el.tag, str) else ""
+
+
+def _class_id(el: Any) -> str:
+    return f"{el.get('class') or ''} {el.get('id') or ''}"
+
+
+def _is_boilerplate(el: Any) -> bool:
+    tag = _tag(el)
+    if not tag or tag in _DROP_TAGS:
+        return True
+    if tag in _KEEP_TAGS:
+        return False
+    if el.get("hidden") is not None or el.get("aria-hidden") == "true":
+        return True
+    if (el.get("role") or "").lower() in _DROP_ROLES:
+        return True
+    if _UNLIKELY_STYLE.search(el.get("style") or ""):
+        return True
+    names = _class_id(el)
+    return bool(_NEGATIVE.search(names)) and not _POSITIVE.search(names)
+
+
+def _drop(parent: Any, child: Any) -> None:
+    """Remove ``child`` but keep its tail text."""
+    if child.tail:
+        idx = list(parent).index(child)
+        if idx:
+            prev = parent[idx - 1]
+            prev.tail = (prev.tail or "") + child.tail
+        else:
+            parent.text = (parent.text or "") + child.tail
+    parent.remove(child)
+
+
+def _strip_boilerplate(root: Any) -> None:
+    doomed = [(parent, child) for parent in root.iter() for child in parent if _is_boilerplate(child)]
+    for parent, child in doomed:
+        _drop(parent, child)
+
+
+def _text(el: Any) -> str:
+    return _WS.sub(" ", "".join(el.itertext())).strip()
+
+
+def _text_len(el: Any) -> int:
+    # Raw length (no whitespace collapsing): cheap on large containers, fine for ratios
+    return sum(map(len, el.itertext()))
+
+
+def _link_density(el: Any, text_len: int) -> float:
+    if not text_len:
+        return 1.0
+    links = sum(_text_len(a) for a in el.iter("a"))
+    return min(1.0, links / text_len)
+
+
+def _class_weight(el: Any) -> int:
+    names = _class_id(el)
+    return (25 if _POSITIVE.search(names) else 0) - (25 if _NEGATIVE.search(names) else 0)
+
+
+def _content_roots(body: Any) -> List[Any]:
+    """The highest-scoring block plus siblings that look like part of the same article."""
+    parents: Dict[Any, Any] = {child: parent for parent in body.iter() for child in parent}
+    scores: Dict[Any, float] = {}
+
+    def _init(el: Any) -> None:
+        if el not in scores:
+            scores[el] = _TAG_BONUS.get(_tag(el), 0) + _class_weight(el)
+
+    for el in body.iter():
+        if _tag(el) not in _PARAGRAPH_TAGS:
+            continue
+        text = _text(el)
+        if len(text) < 25:
+            continue
+        score = 1 + text.count(",") + min(len(text) // 100, 3)
+        node, level = parents.get(el), 1
+        while node is not None and level <= 3:
+            _init(node)
+            scores[node] += score / level
+            node, level = parents.get(node), level + 1
+
+    if not scores:
+        return [body]
+    final = {el: s * (1 - _link_density(el, _text_len(el))) for el, s in scores.items()}
+    best = max(final, key=final.get)
+    parent = parents.get(best)
+    if parent is None:
+        return [best]
+    threshold = max(10.0, final[best] * 0.2)
+    roots = []
+    for sibling in parent:
+        if sibling is best or final.get(sibling, 0) >= threshold:
+            roots.append(sibling)
+        elif _tag(sibling) == "p":
+            size = _text_len(sibling)
+            if size > 80 and _link_density(sibling, size) < 0.25:
+                roots.append(sibling)
+    return roots
+
+
+def _title(root: Any) -> Optional[str]:
+    for meta in root.iter("meta"):
+        if (meta.get("property") or meta.get("name") or "").lower() in ("og:title", "twitter:title") and meta.get("content"):
+            return meta.get("content").strip()
+    for el in root.iter("title"):
+        text = _text(el)
+        if text:
+            return text
+    return None
+
+
+# Markdown rendering ----------------------------------------------------------------------------
+class _Renderer:
+    def __init__(self, base_url: Optional[str]) -> None:
+        self.base_url = base_url or ""
+        self.images: List[Tuple[str, Optional[str]]] = []
+        self._seen_images: set[str] = set()
+
+    def url(self, value: Optional[str]) -> Optional[str]:
+        value = (value or "").strip()
+        if not value or value.startswith(("data:", "javascript:", "#", "mailto:")):
+            return None
+        resolved = urljoin(self.base_url, value)
+        return resolved if resolved.startswith(("http://", "https://")) else None
+
+    def image(self, el: Any) -> str:
+        # Lazy-loading pages keep the real URL in data-src; srcset lists "url width" candidates
+        src = el.get("data-src") or el.get("data-original") or el.get("data-lazy-src") or el.get("src")
+        if not src and el.get("srcset"):
+            src = el.get("srcset").split(",")[0].split()[0]
+        url = self.url(src)
+        if not url:
+            return ""
+        alt = _WS.sub(" ", el.get("alt") or "").strip() or None
+        if url not in self._seen_images:
+            self._seen_images.add(url)
+            self.images.append((url, alt))
+        return f"![{alt or ''}]({url})"
+
+    def inline(self, el: Any) -> str:
+        parts = [_WS.sub(" ", el.text or "")]
+        for child in el:
+            parts.append(self.inline_child(child))
+            parts.append(_WS.sub(" ", child.tail or ""))
+        return "".join(parts)
+
+    def inline_child(self, el: Any) -> str:
+        tag = _tag(el)
+        if tag == "br":
+            return "\n"
+        if tag == "img":
+            return self.image(el)
+        inner = self.inline(el)
+        text = inner.strip()
+        if not text:
+            return inner
+        if tag == "a":
+            href = self.url(el.get("href"))
+            return f"[{text}]({href})" if href and href != text else text
+        if tag in ("strong", "b"):
+            return f"**{text}**"
+        if tag in ("em", "i"):
+            return f"*{text}*"
+        if tag == "code":
+            return f"`{text}`"
+        return inner
+
+    def container(self, el: Any, out: List[str]) -> None:
+        buf = [_WS.sub(" ", el.text or "")]
+        for child in el:
+            if _tag(child) in _BLOCK_TAGS:
+                self._flush(buf, out)
+                buf = []
+                self.block(child, out)
+            else:
+                buf.append(self.inline_child(child))
+            buf.append(_WS.sub(" ", child.tail or ""))
+        self._flush(buf, out)
+
+    @staticmethod
+    def _flush(buf: List[str], out: List[str]) -> None:
+        text = "\n".join(line.strip() for line in "".join(buf).split("\n")).strip()
+        if text:
+            out.append(text)
+
+    def block(self, el: Any, out: List[str]) -> None:
+        tag = _tag(el)
+        if tag in ("h1", "h2", "h3", "h4", "h5", "h6"):
+            text = self.inline(el).strip()
+            if text:
+                out.append("#" * int(tag[1]) + " " + text.replace("\n", " "))
+        elif tag == "pre":
+            code = "".join(el.itertext()).strip("\n")
+            if code.strip():
+                out.append(f"```\n{code}\n```")
+        elif tag in ("ul", "ol"):
+            items: List[str] = []
+            for n, li in enumerate((c for c in el if _tag(c) == "li"), start=1):
+                sub: List[str] = []
+                self.container(li, sub)
+                if not sub:
+                    continue
+                marker = f"{n}. " if tag == "ol" else "- "
+                lines = "\n".join(sub).split("\n")
+                items.append(marker + lines[0] + "".join("\n  " + line if line else "\n" for line in lines[1:]))
+            if items:
+                out.append("\n".join(items))
+        elif tag == "blockquote":
+            sub = []
+            self.container(el, sub)
+            if sub:
+                out.append("\n".join("> " + line if line else ">" for line in "\n\n".join(sub).split("\n")))
+        elif tag == "table":
+            self.table(el, out)
+        elif tag == "hr":
+            out.append("---")
+        else:
+            self.container(el, out)
+
+    def table(self, el: Any, out: List[str]) -> None:
+        from .parser import _markdown_table  # parser imports this module
+
+        rows: List[List[str]] = []
+        for tr in el.iter("tr"):
+            cells = [self.inline(c).strip().replace("\n", " ").replace("|", "\\|") for c in tr if _tag(c) in ("td", "th")]
+            if any(cells):
+                rows.append(cells)
+        if not rows:
+            return
+        if len(rows) == 1 or max(len(r) for r in rows) == 1:
+            # Layout table: keep the text, not the grid
+            out.extend(" ".join(r) for r in rows)
+            return
+        out.append(_markdown_table(rows[0], rows[1:]))
+
+
+class ExtractedPage:
+    """Title, article Markdown (images and tables inline), article HTML and ``(url, alt)`` images."""
+
+    def __init__(self, title: Optional[str], markdown: str, html: str, images: List[Tuple[str, Optional[str]]]) -> None:
+        self.title = title
+        self.markdown = markdown
+        self.html = html
+        self.images = images
+
+
+def extract_main_content(data: bytes, base_url: Optional[str] = None) -> ExtractedPage:
+    root, is_lxml = _parse_tree(data)
+    for base in root.iter("base"):
+        if base.get("href"):
+            base_url = urljoin(base_url or "", base.get("href"))
+            break
+    title = _title(root)
+    _strip_boilerplate(root)
+    body = next(iter(root.iter("body")), root)
+    roots = _content_roots(body)
+    renderer = _Renderer(base_url)
+    blocks: List[str] = []
+    for el in roots:
+        renderer.block(el, blocks)
+    html = "\n".join(_serialize(el, is_lxml) for el in roots)
+    return ExtractedPage(title, "\n\n".join(blocks), html, renderer.images)
@@ -3,22 +3,38 @@ from __future__ import annotations
 import io
 import zipfile
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from bs4 import BeautifulSoup
-from PIL import Image
 import io as _io
 import csv as _csv
 import json as _json
-from openpyxl import load_workbook
-from pypdf import PdfReader
-from docx import Document as DocxDocument
 
+from ..config import settings
+from ..metrics import PARSER_SECONDS
 from ..schemas import ImageRef, ParsedBundle, TableRef
-from ..utils import save_image_bytes
+from ..utils import save_image_bytes, save_table_attachment
+from .html_extract import extract_main_content
+from .tabular import TableSummary, summarize_rows
+
+# Parser libraries (bs4, PIL, openpyxl, pypdf, python-docx) are imported inside
+# the functions that need them so importing the API does not pay for all of
+# them up front; preload_parsers() pulls them in after startup.
+_PARSER_MODULES = ("bs4", "lxml.html", "PIL.Image", "openpyxl", "pypdf", "docx")
+
+
+def preload_parsers() -> None:
+    import importlib
+
+    for name in _PARSER_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception:  # noqa: BLE001
+            pass
 
 
 def _parse_txt(data: bytes) -> ParsedBundle:
+    from bs4 import BeautifulSoup
+
     text = data.decode(errors="ignore")
     return ParsedBundle(text=text, html=f"<pre>{BeautifulSoup(text, 'html.parser').text}</pre>")
 
@@ -30,6 +46,8 @@ def _parse_md(data: bytes) -> ParsedBundle:
 
 
 def _parse_pdf(data: bytes) -> ParsedBundle:
+    from pypdf import PdfReader
+
     reader = PdfReader(io.BytesIO(data))
     text_parts: List[str] = []
     for page in reader.pages:
@@ -43,6 +61,8 @@ def _parse_pdf(data: bytes) -> ParsedBundle:
 
 
 def _parse_docx(data: bytes) -> ParsedBundle:
+    from docx import Document as DocxDocument
+
     # Extract text via python-docx
     buf = io.BytesIO(data)
     doc = DocxDocument(buf)
@@ -67,25 +87,24 @@ def _parse_docx(data: bytes) -> ParsedBundle:
     return ParsedBundle(text=text, images=images, tables=tables)
 
 
-def _parse_html(data: bytes) -> ParsedBundle:
-    soup = BeautifulSoup(data, "html.parser")
-    text = soup.get_text("\n", strip=True)
-    images: List[ImageRef] = []
-    for img in soup.find_all("img"):
-        src = img.get("src")
-        if src and src.startswith("http"):
-            images.append(ImageRef(url=src, alt=img.get("alt")))
-    return ParsedBundle(text=text, html=str(soup), images=images)
+def _parse_html(data: bytes, base_url: Optional[str] = None) -> ParsedBundle:
+    # Main content only, as Markdown; relative image/link URLs resolve against base_url
+    page = extract_main_content(data, base_url)
+    images = [ImageRef(url=url, alt=alt) for url, alt in page.images]
+    return ParsedBundle(title=page.title, text=page.markdown, html=page.html or None, images=images)
 
 
 def _parse_image_ocr(filename: str, data: bytes) -> ParsedBundle:
     # Save original image to static and run OCR via Tesseract
     try:
         import pytesseract  # type: ignore
+        from PIL import Image
+
         im = Image.open(_io.BytesIO(data))
         if im.mode not in ("RGB", "L"):
             im = im.convert("RGB")
-        text = pytesseract.image_to_string(im)
+        with PARSER_SECONDS.time(parser="ocr"):
+            text = pytesseract.image_to_string(im)
     except Exception:
         text = ""
     url = save_image_bytes(data, Path(filename).name or "image.png")
@@ -111,17 +130,55 @@ def _markdown_table(headers: List[str], rows: List[List[str]]) -> str:
     return "\n".join(lines)
 
 
-def _parse_csv(data: bytes) -> ParsedBundle:
-    try:
-        text = data.decode("utf-8")
-    except Exception:
-        text = data.decode(errors="ignore")
-    reader = _csv.reader(text.splitlines())
-    rows = list(reader)
-    headers: List[str] = rows[0] if rows else []
-    body = rows[1:] if len(rows) > 1 else []
-    md = _markdown_table(headers, body) if rows else ""
-    return ParsedBundle(text=md or text)
+def _fmt_stat(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
+
+
+def _table_part(summary: TableSummary) -> Tuple[str, TableRef]:
+    """Bounded Markdown (preview rows/columns + column stats) and a TableRef pointing at the full data."""
+    url = save_table_attachment(summary.attachment, summary.name) if summary.attachment else None
+    max_cols = max(1, settings.table_preview_columns)
+    headers = summary.headers[:max_cols]
+    preview = _markdown_table(headers, [r[:max_cols] for r in summary.preview])
+    shown = f"showing the first {len(summary.preview)} rows"
+    if len(summary.headers) > max_cols:
+        shown += f" and {max_cols} columns"
+    note = f"_{summary.row_count} rows x {len(summary.headers)} columns"
+    if summary.truncated:
+        note += " (row limit reached)"
+    note += f"; {shown}."
+    if url:
+        note += f" Full data: [{summary.name}.csv.gz]({url})"
+    note += "_"
+    stats = [c.to_dict() for c in summary.columns]
+    stats_md = _markdown_table(
+        ["Column", "Type", "Nulls", "Min", "Max"],
+        [[c["name"], c["type"], str(c["nulls"]), _fmt_stat(c["min"]), _fmt_stat(c["max"])] for c in stats[:max_cols]],
+    )
+    md = "\n\n".join(p for p in (preview, note, stats_md) if p)
+    ref = TableRef(
+        data=[summary.headers] + summary.preview,
+        name=summary.name,
+        row_count=summary.row_count,
+        truncated=summary.truncated,
+        columns=stats,
+        attachment_url=url,
+    )
+    return md, ref
+
+
+def _parse_csv(data: bytes, name: str = "table") -> ParsedBundle:
+    # Decode incrementally; rows stream through summarize_rows instead of list(reader)
+    stream = _io.TextIOWrapper(_io.BytesIO(data), encoding="utf-8-sig", errors="ignore", newline="")
+    summary = summarize_rows(name, _csv.reader(stream), settings.table_preview_rows, settings.table_max_rows)
+    if not summary.headers:
+        return ParsedBundle(text="")
+    md, ref = _table_part(summary)
+    return ParsedBundle(text=md, tables=[ref])
 
 
 def _parse_json(data: bytes) -> ParsedBundle:
@@ -144,46 +201,69 @@ def _parse_json(data: bytes) -> ParsedBundle:
 
 
 def _parse_excel_xlsx(data: bytes) -> ParsedBundle:
+    from openpyxl import load_workbook
+
+    # read_only mode yields rows lazily from the sheet XML
     wb = load_workbook(_io.BytesIO(data), read_only=True, data_only=True)
-    images: List[ImageRef] = []
     tables: List[TableRef] = []
     md_parts: List[str] = []
-    for ws in wb.worksheets:
-        rows: List[List[str]] = []
-        for row in ws.iter_rows(values_only=True):
-            rows.append(["" if v is None else str(v) for v in row])
-        headers = rows[0] if rows else []
-        body = rows[1:] if len(rows) > 1 else []
-        md = _markdown_table(headers, body)
-        if md:
+    try:
+        for ws in wb.worksheets:
+            summary = summarize_rows(
+                ws.title, ws.iter_rows(values_only=True), settings.table_preview_rows, settings.table_max_rows
+            )
+            if not summary.headers:
+                continue
+            md, ref = _table_part(summary)
             md_parts.append(f"### {ws.title}\n\n" + md)
-        tables.append(TableRef(data=rows))
+            tables.append(ref)
+    finally:
+        wb.close()
     text = "\n\n".join(md_parts)
-    return ParsedBundle(text=text, tables=tables, images=images)
+    return ParsedBundle(text=text, tables=tables)
+
+
+_PARSERS: Dict[str, Tuple[str, Callable[[str, bytes, Optional[str]], ParsedBundle]]] = {}
+for _suffixes, _kind, _fn in (
+    ({".txt"}, "txt", lambda f, d, u: _parse_txt(d)),
+    ({".md", ".markdown"}, "md", lambda f, d, u: _parse_md(d)),
+    ({".csv"}, "csv", lambda f, d, u: _parse_csv(d, Path(f).stem)),
+    ({".json"}, "json", lambda f, d, u: _parse_json(d)),
+    ({".pdf"}, "pdf", lambda f, d, u: _parse_pdf(d)),
+    ({".docx"}, "docx", lambda f, d, u: _parse_docx(d)),
+    ({".html", ".htm"}, "html", lambda f, d, u: _parse_html(d, u)),
+    ({".xlsx", ".xlsm"}, "xlsx", lambda f, d, u: _parse_excel_xlsx(d)),
+    ({".png", ".jpg", ".jpeg", ".webp", ".tif", ".tiff", ".bmp", ".gif"}, "image", lambda f, d, u: _parse_image_ocr(f, d)),
+):
+    for _suffix in _suffixes:
+        _PARSERS[_suffix] = (_kind, _fn)
+
+
+SUPPORTED_SUFFIXES = frozenset(_PARSERS)
 
 
-def parse_any(filename: str, data: bytes) -> ParsedBundle:
+def is_html(filename: str) -> bool:
+    return _PARSERS.get(Path(filename.lower()).suffix, ("",))[0] == "html"
+
+
+def parse_any(filename: str, data: bytes, base_url: Optional[str] = None) -> ParsedBundle:
+    """Parse by file suffix. ``base_url`` (the page URL for fetched HTML) resolves relative links."""
     suffix = Path(filename.lower()).suffix
-    if suffix in {".txt"}:
-        return _parse_txt(data)
-    if suffix in {".md", ".markdown"}:
-        return _parse_md(data)
-    if suffix in {".csv"}:
-        return _parse_csv(data)
-    if suffix in {".json"}:
-        return _parse_json(data)
-    if suffix in {".pdf"}:
-        return _parse_pdf(data)
-    if suffix in {".docx"}:
-        return _parse_docx(data)
-    if suffix in {".html", ".htm"}:
-        return _parse_html(data)
-    if suffix in {".xlsx", ".xlsm"}:
-        return _parse_excel_xlsx(data)
-    if suffix in {".png", ".jpg", ".jpeg", ".webp", ".tif", ".tiff", ".bmp", ".gif"}:
-        return _parse_image_ocr(filename, data)
     # Fallback: best-effort text
-    return _parse_txt(data)
+    kind, fn = _PARSERS.get(suffix, ("txt", lambda f, d, u: _parse_txt(d)))
+    with PARSER_SECONDS.time(parser=kind):
+        return fn(filename, data, base_url)
+
+
+def media_in_text(parsed: ParsedBundle) -> bool:
+    """True when every image and table is already referenced in the text (HTML pages, CSV/XLSX previews).
+
+    Media alignment has nothing to place then, so its LLM call can be skipped.
+    """
+    text = parsed.text or ""
+    return all(im.url in text for im in parsed.images) and all(
+        t.attachment_url and t.attachment_url in text for t in parsed.tables
+    )
 
 
 def parse_with_docling(filename: str, data: bytes) -> Optional[ParsedBundle]:
@@ -204,8 +284,9 @@ def parse_with_docling(filename: str, data: bytes) -> Optional[ParsedBundle]:
             tmp.write(data)
             tmp_path = tmp.name
         try:
-            converter = DocumentConverter()
-            doc = converter.convert(tmp_path).document
+            with PARSER_SECONDS.time(parser="docling"):
+                converter = DocumentConverter()
+                doc = converter.convert(tmp_path).document
             # Prefer Markdown export; fall back to str(doc)
             try:
                 md = doc.export_to_markdown()  # type: ignore[attr-defined]
@@ -0,0 +1,297 @@
+"""Streaming summaries for tabular sources (CSV, XLSX sheets).
+
+Rows are pulled lazily in batches of ``BATCH_ROWS``. Each batch is written to
+a gzip-compressed CSV (the downloadable full-data attachment) and transposed
+into columns; a column batch is coerced in one go into a typed ``array``
+(``q`` for ints, ``d`` for floats) so type inference and min/max run in C.
+Mixed columns fall back to per-cell inference. Only the first
+``preview_rows`` rows, the running per-column stats and the compressed
+attachment stay in memory, whatever the row count.
+"""
+from __future__ import annotations
+
+import csv
+import datetime as _dt
+import gzip
+import io
+import itertools
+import math
+from array import array
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+BATCH_ROWS = 4096
+_NUMERIC = ("int", "float")
+_NUMERIC_START = frozenset("0123456789+-.")
+_BOOLS = frozenset(("true", "false"))
+
+
+def _coerce(value: Any) -> Any:
+    """Typed view of a cell: int/float/bool/datetime stay as-is, numeric or ISO-date strings are parsed."""
+    if value is None:
+        return None
+    if isinstance(value, (bool, int, float, _dt.date, _dt.time)):
+        return value
+    s = str(value).strip()
+    if not s:
+        return None
+    c = s[0]
+    if c.isdigit() or c in "+-.":
+        # Cheap shape checks first: exceptions from int()/float() dominate on large files
+        if s.isdigit() or (c in "+-" and s[1:].isdigit()):
+            return int(s)
+        if len(s) >= 10 and s[4] == "-" and s[7] == "-":
+            try:
+                return _dt.date.fromisoformat(s) if len(s) == 10 else _dt.datetime.fromisoformat(s)
+            except ValueError:
+                return s
+        try:
+            f = float(s)
+        except ValueError:
+            return s
+        if f == f and f not in (float("inf"), float("-inf")):
+            return f
+        return s
+    low = s.lower()
+    if low in ("true", "false"):
+        return low == "true"
+    return s
+
+
+def _kind(value: Any) -> str:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, (_dt.date, _dt.time)):
+        return "date"
+    return "text"
+
+
+def _order_key(value: Any) -> Any:
+    """Comparable form of a range value: dates as midnight datetimes, datetimes without tzinfo."""
+    if isinstance(value, _dt.datetime):
+        return value.replace(tzinfo=None) if value.tzinfo is not None else value
+    if isinstance(value, _dt.date):
+        return _dt.datetime.combine(value, _dt.time())
+    return value
+
+
+def cell_text(value: Any) -> str:
+    return "" if value is None else str(value)
+
+
+class ColumnStats:
+    """Running stats for one column; O(1) memory regardless of row count."""
+
+    __slots__ = ("name", "count", "nulls", "kinds", "min", "max", "max_len")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.count = 0
+        self.nulls = 0
+        self.kinds: dict[str, int] = {}
+        self.min: Any = None
+        self.max: Any = None
+        self.max_len = 0
+
+    def add(self, raw: Any) -> None:
+        self.count += 1
+        value = _coerce(raw)
+        if value is None:
+            self.nulls += 1
+            return
+        kind = _kind(value)
+        self.kinds[kind] = self.kinds.get(kind, 0) + 1
+        if kind == "text":
+            self.max_len = max(self.max_len, len(value))
+            return
+        if kind == "bool":
+            return
+        if kind == "date" and isinstance(value, _dt.datetime) and value.tzinfo is not None:
+            value = value.replace(tzinfo=None)
+        self._update_range(value, value)
+
+    def _update_range(self, lo: Any, hi: Any) -> None:
+        try:
+            if self.min is None or _order_key(lo) < _order_key(self.min):
+                self.min = lo
+            if self.max is None or _order_key(hi) > _order_key(self.max):
+                self.max = hi
+        except TypeError:
+            # date vs time, int vs datetime: keep the first comparable range
+            pass
+
+    def add_batch(self, values: Sequence[Any]) -> None:
+        present = [v for v in values if v is not None and v != ""]
+        self.count += len(values)
+        self.nulls += len(values) - len(present)
+        if not present:
+            return
+        typed = _typed_batch(present)
+        if typed is None:
+            self.count -= len(present)
+            for v in present:
+                self.add(v)
+            return
+        kind, arr = typed
+        self.kinds[kind] = self.kinds.get(kind, 0) + len(arr)
+        if kind == "text":
+            self.max_len = max(self.max_len, max(map(len, arr)))
+            return
+        if kind == "bool":
+            return
+        self._update_range(min(arr), max(arr))
+
+    @property
+    def type(self) -> str:
+        kinds = set(self.kinds)
+        if not kinds:
+            return "empty"
+        if len(kinds) == 1:
+            return next(iter(kinds))
+        if kinds <= set(_NUMERIC):
+            return "float"
+        return "mixed"
+
+    def to_dict(self) -> dict[str, Any]:
+        typ = self.type
+        ranged = typ in _NUMERIC or typ == "date"
+        return {
+            "name": self.name,
+            "type": typ,
+            "nulls": self.nulls,
+            "min": _jsonable(self.min) if ranged else None,
+            "max": _jsonable(self.max) if ranged else None,
+            "max_length": self.max_len or None,
+        }
+
+
+def _typed_batch(values: List[Any]) -> Optional[Tuple[str, Sequence[Any]]]:
+    """Whole-batch coercion of a non-empty column slice; None when the batch needs per-cell inference."""
+    types = set(map(type, values))
+    if types == {str}:
+        try:
+            return "int", array("q", map(int, values))
+        except (ValueError, OverflowError):
+            pass
+        try:
+            arr = array("d", map(float, values))
+            # nan/inf strings are text; fsum propagates both (and raises on inf - inf)
+            if math.isfinite(math.fsum(arr)):
+                return "float", arr
+            return None
+        except (ValueError, OverflowError):
+            pass
+        first = values[0]
+        if len(first) >= 10 and first[4] == "-" and first[7] == "-":
+            try:
+                parse = _dt.date.fromisoformat if len(first) == 10 else _dt.datetime.fromisoformat
+                dates = list(map(parse, values))
+            except ValueError:
+                return None
+            return ("date", dates) if len(set(map(type, dates))) == 1 else None
+        lowered = set(map(str.lower, values))
+        if lowered <= _BOOLS:
+            return "bool", values
+        if lowered & _BOOLS or any(v[:1] in _NUMERIC_START for v in values):
+            return None
+        return "text", values
+    if types == {int}:
+        return "int", values
+    if types <= {int, float}:
+        arr = array("d", values)
+        try:
+            if math.isfinite(math.fsum(arr)):
+                return "float", arr
+        except (ValueError, OverflowError):
+            pass
+        return None
+    if len(types) == 1 and types <= {_dt.date, _dt.datetime} and not any(getattr(v, "tzinfo", None) for v in values):
+        return "date", values
+    return None
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (_dt.date, _dt.time)):
+        return value.isoformat()
+    return value
+
+
+class TableSummary:
+    """Result of ``summarize_rows``: header, preview, column stats and the gzip CSV attachment."""
+
+    def __init__(self, name: str, headers: List[str], preview: List[List[str]], columns: List[ColumnStats],
+                 row_count: int, truncated: bool, attachment: Optional[bytes]) -> None:
+        self.name = name
+        self.headers = headers
+        self.preview = preview
+        self.columns = columns
+        self.row_count = row_count
+        self.truncated = truncated
+        self.attachment = attachment
+
+
+def _is_empty(row: Sequence[Any]) -> bool:
+    return row.count(None) + row.count("") == len(row)
+
+
+def summarize_rows(name: str, rows: Iterable[Sequence[Any]], preview_rows: int, max_rows: int) -> TableSummary:
+    """Consume ``rows`` (first non-empty row = header) in a single pass.
+
+    Empty rows are skipped. Rows longer than the header add ``colN`` columns.
+    Reading stops after ``max_rows`` data rows (``truncated``).
+    """
+    columns: List[ColumnStats] = []
+    preview: List[List[str]] = []
+    row_count = 0
+    truncated = False
+
+    buf = io.BytesIO()
+    gz = gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=1, mtime=0)
+    out = io.StringIO()
+    writer = csv.writer(out)
+
+    it = iter(rows)
+    for row in it:
+        if not _is_empty(row):
+            columns = [ColumnStats(cell_text(v).strip() or f"col{i + 1}") for i, v in enumerate(row)]
+            writer.writerow([c.name for c in columns])
+            break
+    gz.write(out.getvalue().encode("utf-8"))
+    out.seek(0)
+    out.truncate()
+    while columns:
+        # any() settles the common case; zeros/False need the exact check
+        raw = list(itertools.islice(it, BATCH_ROWS))
+        if not raw:
+            break
+        batch = [r for r in raw if any(r) or not _is_empty(r)]
+        if not batch:
+            # A run of blank rows, not the end of the input
+            continue
+        if row_count + len(batch) > max_rows:
+            batch = batch[: max_rows - row_count]
+            truncated = True
+        row_count += len(batch)
+        # csv.writer renders None as "" and numbers/dates via str(); one gzip write per batch
+        writer.writerows(batch)
+        gz.write(out.getvalue().encode("utf-8"))
+        out.seek(0)
+        out.truncate()
+        if len(preview) < preview_rows:
+            preview.extend([cell_text(v) for v in r] for r in batch[: preview_rows - len(preview)])
+        width = 0
+        for width, values in enumerate(itertools.zip_longest(*batch), start=1):
+            if width > len(columns):
+                columns.append(ColumnStats(f"col{width}"))
+            columns[width - 1].add_batch(values)
+        for col in columns[width:]:
+            # Every row in the batch was shorter than this column
+            col.add_batch((None,) * len(batch))
+        if truncated:
+            break
+    gz.close()
+    headers = [c.name for c in columns]
+    return TableSummary(name, headers, preview, columns, row_count, truncated, buf.getvalue() if headers else None)
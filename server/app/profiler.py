@@ -0,0 +1,197 @@
+"""Opt-in sampling profiler for slow requests.
+
+While at least one profiled request is in flight, a background thread samples
+every thread's Python stack (``sys._current_frames``) every
+``PROFILE_INTERVAL_MS`` and folds the stacks into ``a;b;c count`` lines,
+the input format of flamegraph.pl, speedscope and inferno.
+
+A profile is kept when the request took longer than
+``PROFILE_THRESHOLD_SECONDS``, when it was picked by ``PROFILE_SAMPLE_RATE``,
+or when it sent ``X-Profile: <ADMIN_TOKEN>``. Kept profiles live in a
+bounded in-memory store served by the admin API.
+
+Samples cannot be attributed to a request exactly, because sync endpoints
+run on worker threads. A profile therefore holds every busy thread seen
+while it ran. ``concurrent`` records how many other requests overlapped it.
+"""
+from __future__ import annotations
+
+import itertools
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from .config import settings
+
+# Threads parked in these modules are idle (event loop select, pool workers waiting for work)
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "thread.py")
+_MAX_STACKS = 5000
+_MAX_DEPTH = 128
+
+
+class _Profile:
+    __slots__ = ("id", "method", "path", "started", "stacks", "samples", "concurrent", "forced", "sampled")
+
+    def __init__(self, pid: int, method: str, path: str, forced: bool, sampled: bool) -> None:
+        self.id = pid
+        self.method = method
+        self.path = path
+        self.started = time.time()
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.concurrent = 0
+        self.forced = forced
+        self.sampled = sampled
+
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float, threshold: float, sample_rate: float, store_size: int) -> None:
+        self.interval = max(0.001, interval)
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.profiles: Deque[Dict[str, Any]] = deque(maxlen=max(1, store_size))
+        self._active: Dict[int, _Profile] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Sampling -----------------------------------------------------------------
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while True:
+            if not self._active:
+                # Clear before re-checking under the lock: a start() between the two sets the event again
+                self._wake.clear()
+                with self._lock:
+                    idle = not self._active
+                if idle:
+                    self._wake.wait()
+                continue
+            names = {t.ident: t.name for t in threading.enumerate()}
+            folded: List[str] = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me or frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                parts: List[str] = []
+                while frame is not None and len(parts) < _MAX_DEPTH:
+                    parts.append(_frame_label(frame))
+                    frame = frame.f_back
+                # Pool workers share one root so their samples merge in the flamegraph
+                thread = names.get(ident, "thread")
+                parts.append(thread.rstrip("0123456789_-").strip() or "thread")
+                folded.append(";".join(reversed(parts)))
+            with self._lock:
+                for prof in self._active.values():
+                    prof.samples += 1
+                    for stack in folded:
+                        if stack in prof.stacks or len(prof.stacks) < _MAX_STACKS:
+                            prof.stacks[stack] = prof.stacks.get(stack, 0) + 1
+            time.sleep(self.interval)
+
+    # Request lifecycle --------------------------------------------------------
+    def start(self, method: str, path: str, forced: bool = False) -> Optional[_Profile]:
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not (forced or sampled or self.threshold > 0):
+            return None
+        prof = _Profile(next(self._ids), method, path, forced, sampled)
+        with self._lock:
+            prof.concurrent = len(self._active)
+            for other in self._active.values():
+                other.concurrent += 1
+            self._active[prof.id] = prof
+        self._ensure_thread()
+        self._wake.set()
+        return prof
+
+    def finish(self, prof: _Profile, status: int, duration: float) -> None:
+        with self._lock:
+            self._active.pop(prof.id, None)
+        slow = self.threshold > 0 and duration >= self.threshold
+        if not (slow or prof.sampled or prof.forced) or not prof.stacks:
+            return
+        self.profiles.append({
+            "id": prof.id,
+            "method": prof.method,
+            "path": prof.path,
+            "status": status,
+            "started": prof.started,
+            "duration_s": round(duration, 4),
+            "samples": prof.samples,
+            "interval_ms": round(self.interval * 1000, 2),
+            "concurrent": prof.concurrent,
+            "reason": "forced" if prof.forced else "slow" if slow else "sampled",
+            "stacks": prof.stacks,
+        })
+
+    # Read side ----------------------------------------------------------------
+    def list(self) -> List[Dict[str, Any]]:
+        return [{k: v for k, v in p.items() if k != "stacks"} for p in reversed(self.profiles)]
+
+    def get(self, pid: int) -> Optional[Dict[str, Any]]:
+        return next((p for p in self.profiles if p["id"] == pid), None)
+
+    def clear(self) -> None:
+        self.profiles.clear()
+
+
+def folded(profile: Dict[str, Any]) -> str:
+    """Collapsed-stack text (``frame;frame;frame count``), heaviest stacks first."""
+    items = sorted(profile["stacks"].items(), key=lambda kv: kv[1], reverse=True)
+    return "".join(f"{stack} {count}\n" for stack, count in items)
+
+
+profiler = SamplingProfiler(
+    interval=settings.profile_interval_ms / 1000.0,
+    threshold=settings.profile_threshold_seconds,
+    sample_rate=settings.profile_sample_rate,
+    store_size=settings.profile_store_size,
+)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware feeding ``profiler``; add it only when PROFILE_ENABLED is set."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        forced = False
+        if settings.admin_token:
+            token = dict(scope.get("headers") or []).get(b"x-profile", b"").decode("latin-1")
+            forced = bool(token) and secrets.compare_digest(token, settings.admin_token)
+        prof = profiler.start(scope.get("method", ""), scope.get("path", ""), forced)
+        if prof is None:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def _send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            profiler.finish(prof, status["code"], time.perf_counter() - start)
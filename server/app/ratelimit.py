@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from .cache import get_redis
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Lower value = served first
+PRIORITIES = {"interactive": 0, "background": 10}
+
+current_priority: contextvars.ContextVar[str] = contextvars.ContextVar("llm_priority", default="interactive")
+
+
+@contextmanager
+def llm_priority(priority: str) -> Iterator[None]:
+    """Run LLM calls made inside the block at ``priority`` (interactive|background)."""
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class RateLimited(Exception):
+    """Raised when a call could not be admitted before its queue deadline."""
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: Optional[int]) -> int:
+    """Rough prompt + completion token count (~4 chars per token plus per-message overhead)."""
+    prompt = sum(len(m.get("content") or "") // 4 + 4 for m in messages)
+    return prompt + (max_tokens or settings.llm_default_completion_tokens)
+
+
+# Refill is continuous: ``limit`` units per 60 s. Both buckets are checked and
+# debited atomically so a request never holds RPM while waiting for TPM.
+_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local blocked = tonumber(redis.call('GET', KEYS[3]) or '0')
+if blocked > now then return blocked - now end
+local caps = {tonumber(ARGV[2]), tonumber(ARGV[3])}
+local costs = {1, tonumber(ARGV[4])}
+local levels = {}
+local wait = 0
+for i = 1, 2 do
+  local cap = caps[i]
+  if cap > 0 then
+    local st = redis.call('HMGET', KEYS[i], 't', 'ts')
+    local tokens = tonumber(st[1]) or cap
+    local ts = tonumber(st[2]) or now
+    tokens = math.min(cap, tokens + (now - ts) * cap / 60000)
+    local cost = math.min(costs[i], cap)
+    if tokens < cost then
+      wait = math.max(wait, math.ceil((cost - tokens) * 60000 / cap))
+    end
+    levels[i] = tokens - cost
+  end
+end
+if wait > 0 then return wait end
+for i = 1, 2 do
+  if levels[i] then
+    redis.call('HSET', KEYS[i], 't', levels[i], 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], 120000)
+  end
+end
+return 0
+"""
+
+
+class _LocalBuckets:
+    """In-process stand-in for the Redis buckets when Redis is unreachable."""
+
+    def __init__(self) -> None:
+        self.state: Dict[str, Tuple[float, float]] = {}
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def take(self, name: str, rpm: int, tpm: int, cost: int, now_ms: float) -> float:
+        with self.lock:
+            if self.blocked_until > now_ms:
+                return self.blocked_until - now_ms
+            wait = 0.0
+            levels: Dict[str, float] = {}
+            for dim, cap, c in (("rpm", rpm, 1), ("tpm", tpm, cost)):
+                if cap <= 0:
+                    continue
+                tokens, ts = self.state.get(f"{name}:{dim}", (float(cap), now_ms))
+                tokens = min(cap, tokens + (now_ms - ts) * cap / 60000)
+                c = min(c, cap)
+                if tokens < c:
+                    wait = max(wait, (c - tokens) * 60000 / cap)
+                levels[dim] = tokens - c
+            if wait > 0:
+                return wait
+            for dim, level in levels.items():
+                self.state[f"{name}:{dim}"] = (level, now_ms)
+            return 0.0
+
+
+class ProviderLimiter:
+    """Per-provider RPM/TPM limit shared across workers through Redis.
+
+    Waiting callers are queued in-process by priority, so an interactive
+    refine is admitted before queued background summaries. While the head of
+    the queue waits for its buckets to refill, calls behind it may try the
+    buckets too (a large call does not hold up small ones); that backfill
+    window lasts only as long as the head's first estimated wait, after which
+    the head retries alone, so it cannot be starved. ``max_concurrency``
+    additionally caps in-flight calls from this process (useful for a local
+    Ollama that degrades under parallel load).
+    """
+
+    def __init__(self, name: str, rpm: int, tpm: int, max_concurrency: int = 0, max_wait: float = 60.0) -> None:
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_wait = max_wait
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+        self._cv = threading.Condition()
+        self._heap: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._blocked_head: Optional[Tuple[int, int]] = None
+        self._backfill_until = 0.0
+        self._local = _LocalBuckets()
+        self._script = None
+        self.waits: Dict[str, Deque[float]] = {p: deque(maxlen=200) for p in PRIORITIES}
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rpm > 0 or self.tpm > 0 or self._slots is not None
+
+    def _keys(self) -> List[str]:
+        base = f"ratelimit:llm:{self.name}"
+        return [f"{base}:rpm", f"{base}:tpm", f"{base}:blocked"]
+
+    def _take(self, cost: int) -> float:
+        """Try to debit the buckets; returns seconds to wait (0 = admitted)."""
+        if self.rpm <= 0 and self.tpm <= 0:
+            return 0.0
+        now_ms = time.time() * 1000
+        try:
+            if self._script is None:
+                self._script = get_redis().register_script(_BUCKET_LUA)
+            wait_ms = float(self._script(keys=self._keys(), args=[int(now_ms), self.rpm, self.tpm, cost]))
+        except Exception as e:  # noqa: BLE001
+            logger.debug("rate limit via redis failed, using local bucket: %s", e)
+            wait_ms = self._local.take(self.name, self.rpm, self.tpm, cost, now_ms)
+        return wait_ms / 1000.0
+
+    def penalize(self, retry_after: float) -> None:
+        """Stop admitting calls for ``retry_after`` seconds (after an upstream 429)."""
+        until_ms = int((time.time() + retry_after) * 1000)
+        self._local.blocked_until = max(self._local.blocked_until, until_ms)
+        try:
+            get_redis().set(self._keys()[2], until_ms, px=int(retry_after * 1000) + 1000)
+        except Exception as e:  # noqa: BLE001
+            logger.debug("rate limit penalize failed: %s", e)
+
+    def _wait_turn(self, cost: int, priority: str) -> None:
+        ticket = (PRIORITIES.get(priority, PRIORITIES["interactive"]), next(self._seq))
+        deadline = time.monotonic() + self.max_wait
+        with self._cv:
+            heapq.heappush(self._heap, ticket)
+        try:
+            while True:
+                with self._cv:
+                    while self._heap[0] != ticket and time.monotonic() >= self._backfill_until:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise RateLimited(f"{self.name}: queued longer than {self.max_wait:.0f}s")
+                        self._cv.wait(remaining)
+                    head = self._heap[0] == ticket
+                wait_s = self._take(cost)
+                if wait_s <= 0:
+                    return
+                remaining = deadline - time.monotonic()
+                if not head:
+                    # Backfill attempt did not fit; wait for the next refill or a change of head
+                    if remaining <= 0:
+                        raise RateLimited(f"{self.name}: queued longer than {self.max_wait:.0f}s")
+                    with self._cv:
+                        self._cv.wait(min(remaining, 0.5))
+                    continue
+                if wait_s > remaining:
+                    raise RateLimited(f"{self.name}: limit needs {wait_s:.1f}s, deadline in {remaining:.1f}s")
+                with self._cv:
+                    if self._blocked_head != ticket:
+                        # Let the calls behind try the buckets for as long as this one expects to wait
+                        self._blocked_head = ticket
+                        self._backfill_until = time.monotonic() + wait_s
+                        self._cv.notify_all()
+                # Short sleeps so a newly queued higher-priority call can take over the head
+                time.sleep(min(wait_s, 0.5))
+        finally:
+            with self._cv:
+                if self._blocked_head == ticket:
+                    self._blocked_head = None
+                    self._backfill_until = 0.0
+                self._heap.remove(ticket)
+                heapq.heapify(self._heap)
+                self._cv.notify_all()
+
+    @contextmanager
+    def admit(self, cost: int, priority: str = "interactive") -> Iterator[float]:
+        """Block until the call fits the limits; yields the queue wait in seconds."""
+        start = time.monotonic()
+        try:
+            self._wait_turn(cost, priority)
+            if self._slots is not None:
+                remaining = self.max_wait - (time.monotonic() - start)
+                if remaining <= 0 or not self._slots.acquire(timeout=remaining):
+                    raise RateLimited(f"{self.name}: no free concurrency slot")
+        except RateLimited:
+            self.rejected += 1
+            raise
+        waited = time.monotonic() - start
+        self.waits.setdefault(priority, deque(maxlen=200)).append(waited)
+        try:
+            yield waited
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        def _pct(vals: List[float], q: float) -> Optional[float]:
+            return round(vals[min(len(vals) - 1, int(q * len(vals)))], 4) if vals else None
+
+        waits = {}
+        for prio, dq in self.waits.items():
+            vals = sorted(dq)
+            waits[prio] = {"count": len(vals), "p50_s": _pct(vals, 0.5), "p95_s": _pct(vals, 0.95), "max_s": vals[-1] if vals else None}
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "queued": len(self._heap),
+            "rejected": self.rejected,
+            "queue_wait": waits,
+        }
+
+
+def build_limiters() -> Dict[str, ProviderLimiter]:
+    max_wait = settings.llm_queue_max_wait_seconds
+    return {
+        "groq": ProviderLimiter("groq", settings.llm_groq_rpm, settings.llm_groq_tpm, max_wait=max_wait),
+        "ollama": ProviderLimiter(
+            "ollama", settings.llm_ollama_rpm, settings.llm_ollama_tpm,
+            max_concurrency=settings.llm_ollama_max_concurrency, max_wait=max_wait,
+        ),
+    }
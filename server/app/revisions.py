@@ -0,0 +1,218 @@
+"""Post revision history stored as line deltas with periodic snapshots.
+
+Every content change of a post (``PUT /api/posts/{id}``, restores) adds a
+``PostRevision``. Most revisions are deltas: a line-level edit script
+against the previous revision, where copied line ranges are ``[start, end]``
+pairs and inserted text is a string. A snapshot with the full content is
+written for the first revision, at least every ``REVISION_SNAPSHOT_EVERY``
+revisions, and whenever the delta would not be smaller than a snapshot.
+Rebuilding any revision therefore costs one range query and at most
+``REVISION_SNAPSHOT_EVERY - 1`` patch applications.
+
+Posts created before their first edit have no revisions; the pre-edit state
+is recorded as a ``baseline`` snapshot when they are first updated.
+"""
+from __future__ import annotations
+
+import difflib
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import BlogPost, PostRevision
+
+# Diffed line by line; other tracked fields are stored whole when they change
+TEXT_FIELDS = ("content_text", "content_html")
+VALUE_FIELDS = ("images", "tables")
+
+
+class RevisionNotFound(LookupError):
+    pass
+
+
+def post_state(post: BlogPost) -> Dict[str, Any]:
+    """Tracked content of ``post``; the title is stored on the revision row itself."""
+    return {
+        "content_text": post.content_text,
+        "content_html": post.content_html,
+        "images": post.images or [],
+        "tables": post.tables or [],
+    }
+
+
+def _encode(obj: Any) -> bytes:
+    return zlib.compress(orjson.dumps(obj), 6)
+
+
+def _decode(data: bytes) -> Any:
+    return orjson.loads(zlib.decompress(data))
+
+
+def _text_delta(old: str, new: str) -> List[Any]:
+    a = old.splitlines(keepends=True)
+    b = new.splitlines(keepends=True)
+    ops: List[Any] = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b).get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(b[j1:j2]))
+    return ops
+
+
+def _apply_text(old: str, ops: List[Any]) -> str:
+    lines = old.splitlines(keepends=True)
+    return "".join("".join(lines[op[0]:op[1]]) if isinstance(op, list) else op for op in ops)
+
+
+def make_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Edit script turning ``old`` into ``new``: ``d`` holds text deltas, ``v`` whole values."""
+    delta: Dict[str, Dict[str, Any]] = {"d": {}, "v": {}}
+    for field in TEXT_FIELDS:
+        a, b = old.get(field), new.get(field)
+        if a == b:
+            continue
+        if a is None or b is None:
+            delta["v"][field] = b
+        else:
+            delta["d"][field] = _text_delta(a, b)
+    for field in VALUE_FIELDS:
+        if old.get(field) != new.get(field):
+            delta["v"][field] = new.get(field)
+    return delta
+
+
+def apply_delta(state: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(state)
+    for field, ops in (delta.get("d") or {}).items():
+        out[field] = _apply_text(out.get(field) or "", ops)
+    out.update(delta.get("v") or {})
+    return out
+
+
+def latest_number(db: Session, post_id: str) -> int:
+    return db.query(func.max(PostRevision.number)).filter(PostRevision.post_id == post_id).scalar() or 0
+
+
+def load_revision(db: Session, post_id: str, number: int) -> Tuple[PostRevision, Dict[str, Any]]:
+    """Revision ``number`` and its reconstructed state: nearest snapshot plus the deltas after it."""
+    snapshot = (
+        db.query(func.max(PostRevision.number))
+        .filter(PostRevision.post_id == post_id, PostRevision.kind == "snapshot", PostRevision.number <= number)
+        .scalar()
+    )
+    if snapshot is None:
+        raise RevisionNotFound(number)
+    rows = (
+        db.query(PostRevision)
+        .filter(PostRevision.post_id == post_id, PostRevision.number >= snapshot, PostRevision.number <= number)
+        .order_by(PostRevision.number)
+        .all()
+    )
+    if not rows or rows[-1].number != number:
+        raise RevisionNotFound(number)
+    state: Dict[str, Any] = {}
+    for row in rows:
+        payload = _decode(row.data)
+        state = payload if row.kind == "snapshot" else apply_delta(state, payload)
+    return rows[-1], state
+
+
+def _add(db: Session, post: BlogPost, number: int, source: str, state: Dict[str, Any],
+         base_state: Optional[Dict[str, Any]]) -> PostRevision:
+    """Store ``state`` as revision ``number``: a delta against ``base_state`` unless a snapshot is due."""
+    snapshot = _encode(state)
+    kind, data = "snapshot", snapshot
+    if base_state is not None:
+        last_snapshot = (
+            db.query(func.max(PostRevision.number))
+            .filter(PostRevision.post_id == post.id, PostRevision.kind == "snapshot")
+            .scalar()
+        ) or 0
+        if number - last_snapshot < max(1, settings.revision_snapshot_every):
+            delta = _encode(make_delta(base_state, state))
+            if len(delta) < len(snapshot):
+                kind, data = "delta", delta
+    rev = PostRevision(post_id=post.id, number=number, kind=kind, source=source, title=post.title, data=data)
+    db.add(rev)
+    return rev
+
+
+def ensure_baseline(db: Session, post: BlogPost) -> None:
+    """Record the current (pre-edit) state as revision 1 if the post has no history yet."""
+    if latest_number(db, post.id) == 0:
+        _add(db, post, 1, "baseline", post_state(post), None)
+        db.flush()
+
+
+def record_revision(db: Session, post: BlogPost, source: str = "update") -> Optional[PostRevision]:
+    """Add a revision for the post's current state (not committed); None when nothing changed."""
+    state = post_state(post)
+    latest = latest_number(db, post.id)
+    if latest == 0:
+        return _add(db, post, 1, source, state, None)
+    base_row, base_state = load_revision(db, post.id, latest)
+    if base_state == state and base_row.title == post.title:
+        return None
+    return _add(db, post, latest + 1, source, state, base_state)
+
+
+def list_revisions(db: Session, post_id: str) -> List[Dict[str, Any]]:
+    rows = (
+        db.query(
+            PostRevision.number, PostRevision.kind, PostRevision.source, PostRevision.title,
+            func.length(PostRevision.data), PostRevision.created_at,
+        )
+        .filter(PostRevision.post_id == post_id)
+        .order_by(PostRevision.number.desc())
+        .all()
+    )
+    return [
+        {
+            "number": number,
+            "kind": kind,
+            "source": source,
+            "title": title,
+            "stored_bytes": size or 0,
+            "created_at": created_at.isoformat() if created_at else None,
+        }
+        for number, kind, source, title, size, created_at in rows
+    ]
+
+
+def revision_detail(row: PostRevision, state: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "number": row.number,
+        "kind": row.kind,
+        "source": row.source,
+        "title": row.title,
+        "stored_bytes": len(row.data),
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        **state,
+    }
+
+
+def _unified(a: Optional[str], b: Optional[str], old: int, new: int) -> str:
+    return "\n".join(difflib.unified_diff(
+        (a or "").splitlines(), (b or "").splitlines(), fromfile=f"r{old}", tofile=f"r{new}", lineterm="",
+    ))
+
+
+def diff_revisions(db: Session, post_id: str, old: int, new: int) -> Dict[str, Any]:
+    old_row, old_state = load_revision(db, post_id, old)
+    new_row, new_state = load_revision(db, post_id, new)
+    return {
+        "from_number": old,
+        "to_number": new,
+        "title": [old_row.title, new_row.title] if old_row.title != new_row.title else None,
+        **{f: _unified(old_state.get(f), new_state.get(f), old, new) for f in TEXT_FIELDS},
+    }
+
+
+def delete_revisions(db: Session, post_id: str) -> None:
+    # Explicit so SQLite (no enforced foreign keys by default) does not keep orphans
+    db.query(PostRevision).filter(PostRevision.post_id == post_id).delete(synchronize_session=False)
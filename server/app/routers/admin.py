@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+
+from ..cache import codec_stats, redis_client_stats, redis_memory_stats
+from ..config import settings
+from ..llm import llm_client
+from ..profiler import folded, profiler
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    # Admin endpoints are disabled unless ADMIN_TOKEN is configured
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/llm/routing")
+def llm_routing() -> dict:
+    """Provider health, breaker state and the most recent routing decisions."""
+    return llm_client.router.snapshot()
+
+
+@router.get("/llm/cache")
+def llm_cache() -> dict:
+    """Hit rates of the normalized / near-duplicate completion cache."""
+    sc = llm_client.semantic_cache
+    return sc.snapshot() if sc is not None else {"enabled": False}
+
+
+@router.get("/cache")
+def cache_stats() -> dict:
+    """Codec compression ratio (this process) plus Redis memory/eviction counters."""
+    return {"codec": codec_stats(), "redis": redis_memory_stats(), "client": redis_client_stats()}
+
+
+@router.get("/profiles")
+def list_profiles() -> dict:
+    """Stored request profiles (newest first), without their stacks."""
+    return {"enabled": settings.profile_enabled, "profiles": profiler.list()}
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: int, format: str = "folded"):
+    """One profile as collapsed stacks (flamegraph.pl / speedscope) or JSON."""
+    prof = profiler.get(profile_id)
+    if prof is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    if format == "json":
+        return prof
+    return Response(content=folded(prof), media_type="text/plain; charset=utf-8")
+
+
+@router.delete("/profiles", status_code=204)
+def clear_profiles() -> Response:
+    profiler.clear()
+    return Response(status_code=204)
@@ -3,38 +3,88 @@ from __future__ import annotations
 import io
 import json
 import logging
-from typing import List, Optional
-import datetime as dt
-from email.utils import format_datetime
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, List, Optional, Tuple
 
+import anyio
 import orjson
 import requests
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, UploadFile
 from fastapi import Response
+from fastapi.responses import StreamingResponse
 from fastapi import status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
 
-from ..agent.graph import parse_graph, refine_graph, summary_graph
+from ..agent.graph import get_parse_graph, get_refine_graph
+from ..agent.incremental import refine_incremental
 from ..parsing import parse_with_docling, parse_any
+from ..bulk_import import BulkImportError, items_from_sitemap, items_from_urls, items_from_zip, run_import
+from ..fetcher import FetchError, FetchResult, fetch_url, load_body
+from ..parsing.parser import is_html, media_in_text
 from ..llm import llm_client
-from ..cache import cache_json_get, cache_json_set, cache_delete
+from ..cache import (
+    LIST_TAG,
+    acache_json_get,
+    acache_json_set,
+    cache_json_get,
+    cache_json_get_or_load,
+    cache_json_prime,
+    cache_json_set,
+    cache_tag,
+    post_tag,
+)
 from ..config import settings
-from ..db import get_db
-from ..models import BlogPost
+from ..db import get_db, session_scope
+from ..derivatives import apply_derivatives
+from ..export import rebuild_static
+from ..feeds import MEDIA_TYPES as FEED_MEDIA_TYPES, build_feed
+from ..metrics import PDF_REJECTED, PDF_SECONDS
+from ..models import BlogPost, with_body
 from ..schemas import (
     ExternalLinkCreate,
     ParsedBundle,
     PostCreate,
+    PostListItem,
     PostOut,
+    PostUpdate,
+    RevisionDetail,
+    RevisionDiff,
+    RevisionOut,
     SectionRefineRequest,
     SectionRefineResponse,
+    TableRef,
+)
+from ..revisions import (
+    RevisionNotFound,
+    delete_revisions,
+    diff_revisions,
+    ensure_baseline,
+    list_revisions,
+    load_revision,
+    record_revision,
+    revision_detail,
 )
-from ..utils import make_slug, save_upload, unique_slug
+from ..table_store import delete_table_blobs, discard_orphan_blobs, load_table, offload_tables
+from ..tasks import SUMMARY_PENDING, generate_post_summary, invalidate_post_caches
+from ..utils import insert_with_unique_slug, make_slug, save_upload
 
 logger = logging.getLogger(__name__)
 
 
 router = APIRouter(prefix="/api", tags=["posts"])
+
+_PDF_CHUNK_BYTES = 64 * 1024
+# Per-process cap on concurrent PDF renders; ReportLab holds the whole flowable list in memory while building.
+# Waiting happens on the event loop, so queued PDF requests hold neither a threadpool worker nor a DB session.
+_pdf_slots = anyio.Semaphore(max(1, settings.pdf_render_concurrency))
+
+
 def _post_to_markdown(post: dict) -> str:
     title = (post.get("title") or "Untitled").strip()
     lines = [f"# {title}"]
@@ -49,7 +99,33 @@ def _post_to_markdown(post: dict) -> str:
     return "\n\n".join(lines)
 
 def _render_pdf_from_md(md: str) -> bytes:
-    """Render Markdown to a nicely formatted PDF using ReportLab Platypus.
+    buf = io.BytesIO()
+    _write_pdf_from_md(md, buf)
+    return buf.getvalue()
+
+
+def _fetch_pdf_image(url: str, directory: str, n: int) -> str:
+    """Download an image into ``directory`` in chunks; returns the file path."""
+    path = os.path.join(directory, f"img{n}")
+    size = 0
+    with requests.get(url, timeout=15, stream=True) as resp:
+        resp.raise_for_status()
+        with open(path, "wb") as fh:
+            for chunk in resp.iter_content(_PDF_CHUNK_BYTES):
+                size += len(chunk)
+                if size > settings.fetch_max_bytes:
+                    raise ValueError(f"image larger than {settings.fetch_max_bytes} bytes")
+                fh.write(chunk)
+    return path
+
+
+def _write_pdf_from_md(md: str, out: BinaryIO) -> None:
+    with tempfile.TemporaryDirectory(prefix="pdf-img-") as img_dir:
+        _build_pdf(md, out, img_dir)
+
+
+def _build_pdf(md: str, out: BinaryIO, img_dir: str) -> None:
+    """Render Markdown to a nicely formatted PDF using ReportLab Platypus, written to ``out``.
 
     Supported:
     - Headings (#, ##, ###)
@@ -58,8 +134,10 @@ def _render_pdf_from_md(md: str) -> bytes:
     - Fenced code blocks (```)
     - GitHub-style pipe tables
     - Image blocks ![alt](url)
+
+    Images are downloaded into ``img_dir`` and read from disk while the
+    document is built, so they are not all held in memory at once.
     """
-    import io as _io
     import re as _re
     from xml.sax.saxutils import escape as _xml_escape
     from reportlab.lib.pagesizes import letter
@@ -77,9 +155,8 @@ def _render_pdf_from_md(md: str) -> bytes:
         Preformatted,
     )
 
-    buf = _io.BytesIO()
     doc = SimpleDocTemplate(
-        buf,
+        out,
         pagesize=letter,
         leftMargin=54,
         rightMargin=54,
@@ -199,14 +276,9 @@ def _render_pdf_from_md(md: str) -> bytes:
         if mimg:
             url = mimg.group(1)
             try:
-                resp = requests.get(url, timeout=15)
-                resp.raise_for_status()
-                bio = _io.BytesIO(resp.content)
-                img = RLImage(bio)
-                max_w = 450
-                iw, ih = img.wrap(0, 0)
-                scale = min(max_w / max(iw, 1), 1.0)
-                img._restrictSize(max_w, 320)
+                # lazy=2: the file is opened only while the image is drawn
+                img = RLImage(_fetch_pdf_image(url, img_dir, len(content)), lazy=2)
+                img._restrictSize(450, 320)
                 content.append(img)
                 content.append(Spacer(1, 8))
             except Exception:
@@ -247,7 +319,6 @@ def _render_pdf_from_md(md: str) -> bytes:
 
     _flush_code()
     doc.build(content)
-    return buf.getvalue()
 
 
 
@@ -256,245 +327,208 @@ def health() -> dict:
     return {"status": "ok"}
 
 
-@router.get("/posts", response_model=List[PostOut])
-def list_posts(db: Session = Depends(get_db)):
-    cache_key = "blog:list"
-    cached = cache_json_get(cache_key)
-    if cached:
-        return cached
-    rows = db.query(BlogPost).order_by(BlogPost.created_at.desc()).limit(100).all()
-    out = []
-    for r in rows:
-        meta = r.meta or {}
-        summary = meta.get("summary") if isinstance(meta, dict) else None
-        out.append({
-            "id": r.id,
-            "title": r.title,
-            "slug": r.slug,
-            "content_text": r.content_text,
-            "content_html": r.content_html,
-            "images": r.images or [],
-            "tables": r.tables or [],
-            "source_type": r.source_type,
-            "source_url": r.source_url,
-            "meta": meta,
-            "summary": summary,
-        })
-    cache_json_set(cache_key, out)
-    return out
+@router.get("/posts", response_model=List[PostListItem])
+def list_posts():
+    return cache_json_get_or_load("blog:list", _load_post_list, tags=[LIST_TAG])
+
+
+def _load_post_list() -> List[dict]:
+    with session_scope() as db:
+        rows = db.query(BlogPost).order_by(BlogPost.created_at.desc()).limit(100).all()
+        return [r.to_list_dict() for r in rows]
 
 
 @router.get("/posts/{post_id}", response_model=PostOut)
 def get_post(post_id: str, db: Session = Depends(get_db)):
-    row = db.get(BlogPost, post_id)
+    row = db.get(BlogPost, post_id, options=[with_body()])
     if not row:
         raise HTTPException(status_code=404, detail="Not found")
-    return row
+    return row.to_dict()
 
 
 @router.get("/posts/{post_id}/pdf")
-def get_post_pdf(post_id: str, db: Session = Depends(get_db)):
-    row = db.get(BlogPost, post_id)
-    if not row:
-        raise HTTPException(status_code=404, detail="Not found")
-    return _generate_post_pdf(row)
+async def get_post_pdf(post_id: str):
+    return await _generate_post_pdf(post_id=post_id)
 
 
 @router.get("/posts/slug/{slug}", response_model=PostOut)
-def get_post_by_slug(slug: str, db: Session = Depends(get_db)):
-    cache_key = f"blog:slug:{slug}"
-    cached = cache_json_get(cache_key)
-    if cached:
-        return cached
-    row = db.query(BlogPost).filter(BlogPost.slug == slug).first()
-    if not row:
+def get_post_by_slug(slug: str):
+    # The tag is only known once the row is loaded, so it is added inside the loader
+    obj = cache_json_get_or_load(f"blog:slug:{slug}", lambda: _load_post_by_slug(slug))
+    if not obj:
         raise HTTPException(status_code=404, detail="Not found")
-    obj = {
-        "id": row.id,
-        "title": row.title,
-        "slug": row.slug,
-        "content_text": row.content_text,
-        "content_html": row.content_html,
-        "images": row.images or [],
-        "tables": row.tables or [],
-        "source_type": row.source_type,
-        "source_url": row.source_url,
-        "meta": row.meta or {},
-        "summary": (row.meta or {}).get("summary") if isinstance(row.meta, dict) else None,
-    }
-    cache_json_set(cache_key, obj)
     return obj
 
 
+def _load_post_by_slug(slug: str) -> Optional[dict]:
+    with session_scope() as db:
+        row = db.query(BlogPost).options(with_body()).filter(BlogPost.slug == slug).first()
+        if not row:
+            return None
+        cache_tag(post_tag(row.id), f"blog:slug:{slug}")
+        return row.to_dict()
+
+
 @router.get("/posts/slug/{slug}/pdf")
-def get_post_pdf_by_slug(slug: str, db: Session = Depends(get_db)):
-    row = db.query(BlogPost).filter(BlogPost.slug == slug).first()
-    if not row:
+async def get_post_pdf_by_slug(slug: str):
+    return await _generate_post_pdf(slug=slug)
+
+
+@router.get("/posts/{post_id}/tables/{blob}", response_model=TableRef)
+def get_post_table(post_id: str, blob: str):
+    """Full ``html``/``data`` of a table stored out of line (``TableRef.blob``)."""
+    obj = cache_json_get_or_load(f"blog:table:{post_id}:{blob}", lambda: _load_post_table(post_id, blob))
+    if not obj:
         raise HTTPException(status_code=404, detail="Not found")
-    return _generate_post_pdf(row)
+    return obj
 
 
-def _generate_post_pdf(row: BlogPost) -> Response:
-    post_obj = {
-        "title": row.title,
-        "content_text": row.content_text,
-        "images": row.images or [],
-    }
-    md = _post_to_markdown(post_obj)
-    pdf_bytes = _render_pdf_from_md(md)
-    return Response(
-        content=pdf_bytes,
+def _load_post_table(post_id: str, blob: str) -> Optional[dict]:
+    with session_scope() as db:
+        payload = load_table(db, post_id, blob)
+        if payload is None:
+            return None
+        row = db.get(BlogPost, post_id)
+        # Metadata comes from the current post; blobs only referenced by older revisions return bare
+        stub = next((t for t in (row.tables or []) if isinstance(t, dict) and t.get("blob") == blob), None) if row else None
+        cache_tag(post_tag(post_id), f"blog:table:{post_id}:{blob}")
+        return {**(stub or {"blob": blob}), **payload}
+
+
+async def _generate_post_pdf(post_id: Optional[str] = None, slug: Optional[str] = None) -> Response:
+    """Render into a spooled temp file (on disk past ``PDF_SPOOL_MAX_BYTES``) and stream it back.
+
+    The render slot is taken before the post is loaded; only loading and
+    rendering run in the threadpool.
+    """
+    try:
+        # A free slot is taken without a cancel scope: a zero timeout would cancel even that acquire
+        _pdf_slots.acquire_nowait()
+    except anyio.WouldBlock:
+        with anyio.move_on_after(max(0.0, settings.pdf_render_wait_seconds)) as wait:
+            await _pdf_slots.acquire()
+        if wait.cancelled_caught:
+            PDF_REJECTED.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many PDF renders in progress",
+                headers={"Retry-After": str(max(1, round(settings.pdf_render_wait_seconds)))},
+            )
+    try:
+        source = await run_in_threadpool(_load_pdf_source, post_id, slug)
+        if source is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        filename, md = source
+        spool, size = await run_in_threadpool(_render_pdf_spooled, md)
+    finally:
+        # The slot only covers rendering; streaming the finished file is cheap
+        _pdf_slots.release()
+    return StreamingResponse(
+        _iter_spooled(spool),
         media_type="application/pdf",
-        headers={"Content-Disposition": f"inline; filename=\"{row.slug or 'post'}.pdf\""},
+        headers={
+            "Content-Length": str(size),
+            "Content-Disposition": f"inline; filename=\"{filename}.pdf\"",
+        },
+        # Runs after the stream ends, also when the client disconnects before the first chunk
+        background=BackgroundTask(spool.close),
     )
 
 
-def _absolute_post_url(slug: str) -> str:
-    base = settings.site_base_url.rstrip("/")
-    return f"{base}/blog/{slug}"
+def _load_pdf_source(post_id: Optional[str], slug: Optional[str]) -> Optional[Tuple[str, str]]:
+    """``(filename, markdown)`` of the post, or None."""
+    with session_scope() as db:
+        if post_id is not None:
+            row = db.get(BlogPost, post_id, options=[with_body()])
+        else:
+            row = db.query(BlogPost).options(with_body()).filter(BlogPost.slug == slug).first()
+        if not row:
+            return None
+        post_obj = {
+            "title": row.title,
+            "content_text": row.content_text,
+            "images": row.images or [],
+        }
+        return row.slug or "post", _post_to_markdown(post_obj)
+
+
+def _render_pdf_spooled(md: str) -> Tuple[BinaryIO, int]:
+    spool = tempfile.SpooledTemporaryFile(max_size=max(0, settings.pdf_spool_max_bytes))
+    try:
+        with PDF_SECONDS.time():
+            _write_pdf_from_md(md, spool)
+        size = spool.seek(0, os.SEEK_END)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return spool, size
+
+
+def _iter_spooled(f: BinaryIO) -> Iterator[bytes]:
+    while True:
+        chunk = f.read(_PDF_CHUNK_BYTES)
+        if not chunk:
+            break
+        yield chunk
 
 
 @router.get("/feed/rss.xml")
-def rss_feed(db: Session = Depends(get_db)):
-    cache_key = "feed:rss"
-    cached = cache_json_get(cache_key)
-    if cached:
-        return Response(content=cached.get("xml", ""), media_type="application/rss+xml")
-
-    rows = db.query(BlogPost).order_by(BlogPost.created_at.desc()).limit(50).all()
-    now = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc)
-    items_xml = []
-    for r in rows:
-        link = _absolute_post_url(r.slug)
-        pub = r.created_at.replace(tzinfo=dt.timezone.utc) if r.created_at.tzinfo is None else r.created_at
-        desc = (r.meta or {}).get("summary") if isinstance(r.meta, dict) else None
-        desc = (desc or (r.content_text or ""))[:500]
-        items_xml.append(
-            f"<item>\n<title>{_xml_escape(r.title)}</title>\n<link>{_xml_escape(link)}</link>\n<guid>{_xml_escape(link)}</guid>\n<pubDate>{format_datetime(pub)}</pubDate>\n<description>{_xml_escape(desc)}</description>\n</item>"
-        )
-    channel = (
-        f"<channel>\n<title>{_xml_escape(settings.app_name)}</title>\n<link>{_xml_escape(settings.site_base_url)}</link>\n<lastBuildDate>{format_datetime(now)}</lastBuildDate>\n"
-        + "\n".join(items_xml)
-        + "\n</channel>"
-    )
-    xml = f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><rss version=\"2.0\">{channel}</rss>"
-    cache_json_set(cache_key, {"xml": xml})
-    return Response(content=xml, media_type="application/rss+xml")
+def rss_feed():
+    return Response(content=build_feed("rss"), media_type=FEED_MEDIA_TYPES["rss"])
 
 
 @router.get("/feed/atom.xml")
-def atom_feed(db: Session = Depends(get_db)):
-    cache_key = "feed:atom"
-    cached = cache_json_get(cache_key)
-    if cached:
-        return Response(content=cached.get("xml", ""), media_type="application/atom+xml")
-
-    rows = db.query(BlogPost).order_by(BlogPost.created_at.desc()).limit(50).all()
-    updated = dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc).isoformat()
-    entries = []
-    for r in rows:
-        link = _absolute_post_url(r.slug)
-        up = r.updated_at or r.created_at
-        up = up.replace(tzinfo=dt.timezone.utc).isoformat()
-        summary = (r.meta or {}).get("summary") if isinstance(r.meta, dict) else None
-        summary = summary or (r.content_text or "")[:500]
-        entries.append(
-            f"<entry>\n<title>{_xml_escape(r.title)}</title>\n<link href=\"{_xml_escape(link)}\"/>\n<id>{_xml_escape(link)}</id>\n<updated>{up}</updated>\n<summary>{_xml_escape(summary)}</summary>\n</entry>"
-        )
-    feed = (
-        f"<feed xmlns=\"http://www.w3.org/2005/Atom\">\n<title>{_xml_escape(settings.app_name)}</title>\n<link href=\"{_xml_escape(settings.site_base_url)}\"/>\n<updated>{updated}</updated>\n"
-        + "\n".join(entries)
-        + "\n</feed>"
-    )
-    cache_json_set(cache_key, {"xml": feed})
-    return Response(content=feed, media_type="application/atom+xml")
+def atom_feed():
+    return Response(content=build_feed("atom"), media_type=FEED_MEDIA_TYPES["atom"])
+
+
+@router.get("/feed/feed.json")
+def json_feed():
+    return Response(content=build_feed("json"), media_type=FEED_MEDIA_TYPES["json"])
 
 
 @router.post("/posts/external", response_model=PostOut)
-def add_external_link(payload: ExternalLinkCreate, db: Session = Depends(get_db)):
-    slug = make_slug(payload.title)
+def add_external_link(payload: ExternalLinkCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     post = BlogPost(
         title=payload.title,
-        slug=slug,
         source_type="external",
         source_url=payload.url,
+        images=[],
+        tables=[],
         meta=payload.meta or {},
     )
-    db.add(post)
-    db.commit()
-    db.refresh(post)
-    return post
+    apply_derivatives(post)
+    insert_with_unique_slug(db, post, make_slug(payload.title))
+    invalidate_post_caches(post.slug, post.id)
+    background_tasks.add_task(rebuild_static, post.slug)
+    obj = post.to_dict()
+    # get_db only closes the session after background tasks finish; free the connection now
+    db.close()
+    return obj
 
 
-@router.post("/posts/parse", response_model=ParsedBundle)
-async def parse_post(
-    file: Optional[UploadFile] = File(default=None),
-    refine_with_llm: bool = Form(default=True),
-    url: Optional[str] = Form(default=None),
-):
-    if (file is None or file.filename is None) and not url:
-        raise HTTPException(status_code=400, detail="Provide a file or url")
-    # Compute filename and bytes consistently
-    if file and file.filename:
-        filename = file.filename
-        data_bytes = await file.read()
-        if data_bytes is None or len(data_bytes) == 0:
-            raise HTTPException(status_code=400, detail="Empty upload")
-    elif url:
-        filename = (url.split("/")[-1] or "content")
-        try:
-            resp = requests.get(
-                url,
-                headers={
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0 Safari/537.36",
-                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-                },
-                timeout=30,
-            )
-            resp.raise_for_status()
-            data_bytes = resp.content
-            # Infer extension from content-type if missing
-            if "." not in filename or filename.endswith("/"):
-                ctype = resp.headers.get("Content-Type", "").split(";")[0].strip()
-                ext = {
-                    "text/html": ".html",
-                    "text/plain": ".txt",
-                    "text/markdown": ".md",
-                    "text/csv": ".csv",
-                    "application/json": ".json",
-                    "application/pdf": ".pdf",
-                    "application/vnd.ms-excel": ".xls",
-                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": ".xlsx",
-                    "image/png": ".png",
-                    "image/jpeg": ".jpg",
-                    "image/webp": ".webp",
-                    "image/tiff": ".tiff",
-                    "image/bmp": ".bmp",
-                    "image/gif": ".gif",
-                }.get(ctype)
-                if ext:
-                    filename = f"{filename}{ext}" if not filename.endswith(ext) else filename
-        except Exception as e:  # noqa: BLE001
-            raise HTTPException(status_code=400, detail=f"Failed to fetch URL: {e}")
-    else:
-        # Should not happen due to guard above
-        raise HTTPException(status_code=400, detail="Invalid request")
+def parse_cache_key(content_sha256: str, refine_with_llm: bool, filename: str, base_url: Optional[str] = None) -> str:
+    """Parse cache key: hash of content + refine flag (+ page URL for HTML)."""
+    key = f"parse:{content_sha256}:{int(refine_with_llm)}"
+    if base_url and is_html(filename):
+        # Relative links in a page resolve against its URL, so the same bytes can parse differently
+        import hashlib as _hashlib
+
+        key += ":" + _hashlib.sha256(base_url.encode()).hexdigest()[:16]
+    return key
 
-    # Cache key (hash of content + refine flag)
-    import hashlib as _hashlib
-    h = _hashlib.sha256(data_bytes).hexdigest()
-    cache_key = f"parse:{h}:{int(refine_with_llm)}"
-    cached = cache_json_get(cache_key)
-    if cached:
-        return cached
 
+def _run_parse_pipeline(filename: str, data_bytes: bytes, refine_with_llm: bool, base_url: Optional[str] = None) -> ParsedBundle:
+    """Parse graph plus fallbacks. Blocking (parsers, LLM calls): run it off the event loop."""
     state = {
         "filename": filename,
         "data": data_bytes,
+        "base_url": base_url,
         "options": {"refine_with_llm": refine_with_llm},
     }
     try:
-        result = parse_graph.invoke(state)
+        result = get_parse_graph().invoke(state)
     except Exception as e:  # noqa: BLE001
         logger.warning("parse_graph invocation failed, using fallback: %s", e)
         result = None
@@ -512,7 +546,7 @@ async def parse_post(
 
     if parsed is None:
         # Fallback-first: try lightweight parser, then Docling
-        parsed = parse_any(filename, data_bytes)
+        parsed = parse_any(filename, data_bytes, base_url)
         def _is_empty_bundle(p: ParsedBundle | None) -> bool:
             if p is None:
                 return True
@@ -526,7 +560,7 @@ async def parse_post(
     if aligned_text is None and (refine_with_llm or settings.llm_parse_mode == "require"):
         has_media = bool((parsed.images or []) or (parsed.tables or []))
         base_text = (parsed.text or parsed.html or "").strip()
-        if has_media:
+        if has_media and not media_in_text(parsed):
             if not base_text:
                 base_text = "(no extracted text; align media using image alts and manifest)"
             lines: list[str] = []
@@ -606,64 +640,264 @@ async def parse_post(
         meta["pipeline_errors"] = errors
         parsed.meta = meta
 
-    cache_json_set(cache_key, json.loads(parsed.model_dump_json()))
     return parsed
 
 
+@router.post("/posts/parse", response_model=ParsedBundle)
+async def parse_post(
+    file: Optional[UploadFile] = File(default=None),
+    refine_with_llm: bool = Form(default=True),
+    url: Optional[str] = Form(default=None),
+):
+    if (file is None or file.filename is None) and not url:
+        raise HTTPException(status_code=400, detail="Provide a file or url")
+    base_url: Optional[str] = None
+    fetched: Optional[FetchResult] = None
+    data_bytes = b""
+    # Compute filename and bytes consistently
+    if file and file.filename:
+        filename = file.filename
+        data_bytes = await file.read()
+        if data_bytes is None or len(data_bytes) == 0:
+            raise HTTPException(status_code=400, detail="Empty upload")
+    elif url:
+        try:
+            fetched = await fetch_url(url)
+        except FetchError as e:
+            raise HTTPException(status_code=e.status_code, detail=f"Failed to fetch URL: {e}")
+        filename = fetched.filename
+        base_url = fetched.final_url
+    else:
+        # Should not happen due to guard above
+        raise HTTPException(status_code=400, detail="Invalid request")
+
+    import hashlib as _hashlib
+    # A 304 from the origin yields the stored content hash without downloading the body
+    h = fetched.sha256 if fetched is not None else _hashlib.sha256(data_bytes).hexdigest()
+    cache_key = parse_cache_key(h, refine_with_llm, filename, base_url)
+    cached = await acache_json_get(cache_key)
+    if cached:
+        return cached
+
+    if fetched is not None:
+        try:
+            data_bytes = await load_body(fetched)
+        except FetchError as e:
+            raise HTTPException(status_code=e.status_code, detail=f"Failed to fetch URL: {e}")
+        if fetched.sha256 != h:
+            # The 304's body was gone and the refetch returned new content: key the result on that
+            filename, base_url = fetched.filename, fetched.final_url
+            cache_key = parse_cache_key(fetched.sha256, refine_with_llm, filename, base_url)
+            cached = await acache_json_get(cache_key)
+            if cached:
+                return cached
+    # Parsing and LLM calls block; keep them off the event loop
+    parsed = await run_in_threadpool(_run_parse_pipeline, filename, data_bytes, refine_with_llm, base_url)
+    await acache_json_set(cache_key, json.loads(parsed.model_dump_json()))
+    return parsed
+
+
+@router.post("/posts/import")
+async def import_posts(
+    file: Optional[UploadFile] = File(default=None),
+    urls: Optional[str] = Form(default=None),
+    sitemap_url: Optional[str] = Form(default=None),
+    refine_with_llm: bool = Form(default=False),
+    summarize: bool = Form(default=False),
+):
+    """Bulk import from a ZIP, newline-separated ``urls`` and/or a sitemap; streams NDJSON progress."""
+    if not ((file and file.filename) or (urls and urls.strip()) or sitemap_url):
+        raise HTTPException(status_code=400, detail="Provide a ZIP file, urls or sitemap_url")
+    items: list = []
+    try:
+        if file and file.filename:
+            items += await run_in_threadpool(items_from_zip, file.file)
+        if urls and urls.strip():
+            items += items_from_urls(urls.splitlines())
+        if sitemap_url:
+            items += await items_from_sitemap(sitemap_url)
+    except BulkImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(items) > settings.bulk_import_max_items:
+        raise HTTPException(status_code=400, detail=f"Too many items (limit {settings.bulk_import_max_items})")
+    for i, item in enumerate(items):
+        item.index = i
+    return StreamingResponse(run_import(items, refine_with_llm, summarize), media_type="application/x-ndjson")
+
+
 @router.post("/posts", response_model=PostOut, status_code=status.HTTP_201_CREATED)
-def create_post(payload: PostCreate, db: Session = Depends(get_db)):
-    # Ensure unique slug
-    base_slug = payload.slug or make_slug(payload.title or "Untitled")
-    slug = unique_slug(db, base_slug)
-    meta = payload.meta or {}
+def create_post(payload: PostCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    # Ensure unique slug (one prefix lookup, retried on a concurrent insert)
+    # Client slugs are slugified like titles: slugs become URL and static export path segments
+    base_slug = make_slug(payload.slug or payload.title or "Untitled")
+    meta = dict(payload.meta) if isinstance(payload.meta, dict) else {}
+    # Summaries are generated after the response is sent; clients poll summary_status
+    text_for_summary = payload.content_text or payload.content_html or ""
+    needs_summary = not meta.get("summary") and bool(text_for_summary.strip())
+    if needs_summary:
+        meta["summary_status"] = SUMMARY_PENDING
+    post_id = str(uuid.uuid4())
+    # Large table payloads are committed first so the slug retry loop never rolls them back
+    tables = offload_tables(db, post_id, [tbl.model_dump() for tbl in payload.tables])
+    blobs_committed = bool(db.new)
+    if blobs_committed:
+        db.commit()
     post = BlogPost(
+        id=post_id,
         title=payload.title or "Untitled",
-        slug=slug,
         content_text=payload.content_text,
         content_html=payload.content_html,
         images=[img.model_dump() for img in payload.images],
-        tables=[tbl.model_dump() for tbl in payload.tables],
+        tables=tables,
         source_type=payload.source_type,
         source_url=payload.source_url,
         meta=meta,
     )
-    db.add(post)
-    db.commit()
-    db.refresh(post)
-
-    # Generate summary and store in meta
+    apply_derivatives(post)
     try:
-        text_for_summary = (post.content_text or post.content_html or "")[:8000]
-        if text_for_summary:
-            res = summary_graph.invoke({"input_text": text_for_summary})
-            summary = res.get("summary") if isinstance(res, dict) else None
-            if summary:
-                post.meta = {**(post.meta or {}), "summary": summary}
-                db.add(post)
-                db.commit()
-                db.refresh(post)
-    except Exception as e:  # noqa: BLE001
-        logger.warning("summary generation failed: %s", e)
-
-    # Cache post and invalidate list cache
-    post_obj = {
-        "id": post.id,
-        "title": post.title,
-        "slug": post.slug,
-        "content_text": post.content_text,
-        "content_html": post.content_html,
-        "images": post.images or [],
-        "tables": post.tables or [],
-        "source_type": post.source_type,
-        "source_url": post.source_url,
-        "meta": post.meta or {},
-        "summary": (post.meta or {}).get("summary") if isinstance(post.meta, dict) else None,
-    }
-    cache_json_set(f"blog:slug:{post.slug}", post_obj)
-    cache_delete("blog:list")
+        insert_with_unique_slug(db, post, base_slug)
+    except Exception as e:
+        if blobs_committed:
+            discard_orphan_blobs(db, [post_id])
+        if not isinstance(e, IntegrityError):
+            raise
+        # Slug races are retried inside; anything else is a conflict with stored data
+        logger.warning("create_post integrity error: %s", e.orig)
+        raise HTTPException(status_code=409, detail="Post conflicts with existing data")
+    if needs_summary:
+        background_tasks.add_task(generate_post_summary, post.id, text_for_summary)
+
+    # Cache post and invalidate list/feed caches
+    return _after_post_change(post, db, background_tasks)
+
+
+def _after_post_change(post: BlogPost, db: Session, background_tasks: BackgroundTasks) -> dict:
+    """Refresh every cached view of a new or edited post and re-export its page."""
+    post_obj = post.to_dict()
+    # to_dict() reopened a transaction; release the connection before
+    # background tasks run (get_db closes the session only after them)
+    db.close()
+    invalidate_post_caches(post.slug, post.id)
+    cache_json_prime(f"blog:slug:{post.slug}", post_obj, tags=[post_tag(post.id)])
+    background_tasks.add_task(rebuild_static, post.slug)
     return post_obj
 
 
+@contextmanager
+def _revision_conflict(db: Session) -> Iterator[None]:
+    try:
+        yield
+    except IntegrityError:
+        # Another edit took the same revision number
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Post was modified concurrently; retry")
+
+
+def _commit_revision(db: Session) -> None:
+    with _revision_conflict(db):
+        db.commit()
+
+
+def _mark_summary_stale(post: BlogPost, old_body: Tuple[Optional[str], Optional[str]]) -> Optional[str]:
+    """Drop the summary of a post whose body changed; returns the text to re-summarize, if any."""
+    if (post.content_text, post.content_html) == old_body:
+        return None
+    meta = dict(post.meta or {}) if isinstance(post.meta, dict) else {}
+    for key in ("summary", "summary_source", "summary_status"):
+        meta.pop(key, None)
+    text = post.content_text or post.content_html or ""
+    if text.strip():
+        meta["summary_status"] = SUMMARY_PENDING
+    post.meta = meta
+    return text if text.strip() else None
+
+
+@router.put("/posts/{post_id}", response_model=PostOut)
+def update_post(post_id: str, payload: PostUpdate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """Change a post's title/content; each change is kept as a revision."""
+    post = db.get(BlogPost, post_id, options=[with_body()])
+    if not post:
+        raise HTTPException(status_code=404, detail="Not found")
+    with _revision_conflict(db):
+        ensure_baseline(db, post)
+    old_body = (post.content_text, post.content_html)
+    fields = payload.model_dump(exclude_unset=True)
+    if fields.get("title") is not None:
+        post.title = fields["title"].strip() or post.title
+    for name in ("content_text", "content_html"):
+        if name in fields:
+            setattr(post, name, fields[name])
+    if fields.get("images") is not None:
+        post.images = fields["images"]
+    if fields.get("tables") is not None:
+        post.tables = offload_tables(db, post.id, fields["tables"])
+    summary_text = _mark_summary_stale(post, old_body)
+    if "meta" in fields and isinstance(fields["meta"], dict):
+        meta = dict(post.meta or {}) if isinstance(post.meta, dict) else {}
+        meta.update(fields["meta"])
+        if summary_text is not None and fields["meta"].get("summary"):
+            # The client sent a summary for the new content
+            meta.pop("summary_status", None)
+            summary_text = None
+        post.meta = meta
+    apply_derivatives(post)
+    record_revision(db, post, "update")
+    _commit_revision(db)
+    if summary_text is not None:
+        background_tasks.add_task(generate_post_summary, post.id, summary_text)
+    return _after_post_change(post, db, background_tasks)
+
+
+@router.get("/posts/{post_id}/revisions", response_model=List[RevisionOut])
+def get_post_revisions(post_id: str, db: Session = Depends(get_db)):
+    if not db.get(BlogPost, post_id):
+        raise HTTPException(status_code=404, detail="Not found")
+    return list_revisions(db, post_id)
+
+
+@router.get("/posts/{post_id}/revisions/{number}", response_model=RevisionDetail)
+def get_post_revision(post_id: str, number: int, db: Session = Depends(get_db)):
+    try:
+        row, state = load_revision(db, post_id, number)
+    except RevisionNotFound:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return revision_detail(row, state)
+
+
+@router.get("/posts/{post_id}/revisions/{number}/diff", response_model=RevisionDiff)
+def get_post_revision_diff(post_id: str, number: int, against: Optional[int] = None, db: Session = Depends(get_db)):
+    """Unified diff from ``against`` (default: the previous revision) to ``number``."""
+    try:
+        return diff_revisions(db, post_id, against if against is not None else number - 1, number)
+    except RevisionNotFound as e:
+        raise HTTPException(status_code=404, detail=f"Revision {e.args[0]} not found")
+
+
+@router.post("/posts/{post_id}/revisions/{number}/restore", response_model=PostOut)
+def restore_post_revision(post_id: str, number: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """Make revision ``number`` the current content; recorded as a new revision."""
+    post = db.get(BlogPost, post_id, options=[with_body()])
+    if not post:
+        raise HTTPException(status_code=404, detail="Not found")
+    try:
+        row, state = load_revision(db, post_id, number)
+    except RevisionNotFound:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    old_body = (post.content_text, post.content_html)
+    post.title = row.title
+    for name, value in state.items():
+        setattr(post, name, value)
+    # Revisions saved before tables were offloaded may still hold full payloads
+    post.tables = offload_tables(db, post.id, post.tables)
+    summary_text = _mark_summary_stale(post, old_body)
+    apply_derivatives(post)
+    record_revision(db, post, "restore")
+    _commit_revision(db)
+    if summary_text is not None:
+        background_tasks.add_task(generate_post_summary, post.id, summary_text)
+    return _after_post_change(post, db, background_tasks)
+
+
 @router.post("/assets")
 async def upload_asset(file: UploadFile = File(...)):
     # Used by Excalidraw image export or manual image uploads
@@ -677,6 +911,8 @@ def refine_section(req: SectionRefineRequest):
     instructions = (req.instructions or "").strip()
     if not text:
         raise HTTPException(status_code=400, detail="text is required")
+    if req.incremental:
+        return refine_incremental(text, instructions)
 
     import hashlib as _hashlib
     h = _hashlib.sha256((text + "\n\n#instr:\n" + instructions).encode()).hexdigest()
@@ -686,7 +922,7 @@ def refine_section(req: SectionRefineRequest):
         return cached
 
     try:
-        res = refine_graph.invoke({"input_text": text, "instructions": instructions})
+        res = get_refine_graph().invoke({"input_text": text, "instructions": instructions})
         refined = res.get("refined") if isinstance(res, dict) else None
     except Exception as e:  # noqa: BLE001
         logger.warning("refine_graph failed, using direct LLM: %s", e)
@@ -711,26 +947,27 @@ def refine_section(req: SectionRefineRequest):
     return resp
 
 
-def _delete_post_by_id(db: Session, post_id: str):
+def _delete_post_by_id(db: Session, post_id: str, background_tasks: BackgroundTasks):
     row = db.get(BlogPost, post_id)
     if not row:
         raise HTTPException(status_code=404, detail="Not found")
     slug = row.slug
+    delete_revisions(db, post_id)
+    delete_table_blobs(db, post_id)
     db.delete(row)
     db.commit()
-    cache_delete("blog:list")
-    if slug:
-        cache_delete(f"blog:slug:{slug}")
+    invalidate_post_caches(slug, post_id)
+    background_tasks.add_task(rebuild_static, removed_slug=slug)
 
 
 @router.delete("/posts/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_post(post_id: str, db: Session = Depends(get_db)):
-    _delete_post_by_id(db, post_id)
+def delete_post(post_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    _delete_post_by_id(db, post_id, background_tasks)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.post("/posts/{post_id}/delete", status_code=status.HTTP_204_NO_CONTENT)
-def delete_post_post_method(post_id: str, db: Session = Depends(get_db)):
+def delete_post_post_method(post_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """Convenience endpoint for clients that prefer POST over DELETE."""
-    _delete_post_by_id(db, post_id)
+    _delete_post_by_id(db, post_id, background_tasks)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -10,9 +10,26 @@ class ImageRef(BaseModel):
     alt: Optional[str] = None
 
 
+class ColumnSummary(BaseModel):
+    name: str
+    type: str  # int|float|bool|date|text|mixed|empty
+    nulls: int = 0
+    min: Optional[Any] = None
+    max: Optional[Any] = None
+    max_length: Optional[int] = None
+
+
 class TableRef(BaseModel):
     html: Optional[str] = None
+    # For CSV/XLSX: header row plus the preview rows only; the full data is in ``attachment_url``
     data: Optional[Any] = None
+    name: Optional[str] = None
+    row_count: Optional[int] = None
+    truncated: bool = False
+    columns: List[ColumnSummary] = Field(default_factory=list)
+    attachment_url: Optional[str] = None
+    # Set on stored posts when html/data were moved out of line: GET /api/posts/{id}/tables/{blob}
+    blob: Optional[str] = None
 
 
 class ParsedBundle(BaseModel):
@@ -48,11 +65,72 @@ class PostOut(BaseModel):
     source_url: Optional[str] = None
     meta: Optional[Any] = None
     summary: Optional[str] = None
+    summary_status: Optional[str] = None  # pending|ready|failed|skipped
+    excerpt: Optional[str] = None
+    word_count: Optional[int] = None
+    reading_minutes: Optional[int] = None
+    first_image: Optional[str] = None
+    outline: List[OutlineEntry] = Field(default_factory=list)
 
     class Config:
         from_attributes = True
 
 
+class OutlineEntry(BaseModel):
+    level: int
+    text: str
+
+
+class PostListItem(BaseModel):
+    id: str
+    title: str
+    slug: str
+    source_type: str
+    source_url: Optional[str] = None
+    summary: Optional[str] = None
+    summary_status: Optional[str] = None
+    excerpt: Optional[str] = None
+    word_count: Optional[int] = None
+    reading_minutes: Optional[int] = None
+    first_image: Optional[str] = None
+    created_at: Optional[str] = None
+
+
+class PostUpdate(BaseModel):
+    """Fields to change; omitted fields keep their current value."""
+
+    title: Optional[str] = None
+    content_text: Optional[str] = None
+    content_html: Optional[str] = None
+    images: Optional[List[ImageRef]] = None
+    tables: Optional[List[TableRef]] = None
+    meta: Optional[Any] = None
+
+
+class RevisionOut(BaseModel):
+    number: int
+    kind: str  # snapshot|delta
+    source: str  # baseline|update|restore
+    title: str
+    stored_bytes: int
+    created_at: Optional[str] = None
+
+
+class RevisionDetail(RevisionOut):
+    content_text: Optional[str] = None
+    content_html: Optional[str] = None
+    images: List[ImageRef] = Field(default_factory=list)
+    tables: List[TableRef] = Field(default_factory=list)
+
+
+class RevisionDiff(BaseModel):
+    from_number: int
+    to_number: int
+    title: Optional[List[str]] = None  # [old, new] when the title changed
+    content_text: str = ""  # unified diffs
+    content_html: str = ""
+
+
 class ExternalLinkCreate(BaseModel):
     title: str
     url: str
@@ -67,7 +145,15 @@ class ParseOptions(BaseModel):
 class SectionRefineRequest(BaseModel):
     text: str
     instructions: str | None = None
+    # Refine only blocks whose cached result is missing (see agent/incremental.py)
+    incremental: bool = False
 
 
 class SectionRefineResponse(BaseModel):
     refined: str
+    # Incremental mode only: unified diff from the input to ``refined`` and block counts
+    patch: str | None = None
+    blocks_total: int | None = None
+    blocks_reused: int | None = None
+    blocks_refined: int | None = None
+    changed_blocks: List[int] | None = None
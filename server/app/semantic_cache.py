@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import cache_json_get, cache_json_set, get_redis
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# One-permutation MinHash: 64 bins, LSH over 8 bands of 8 rows. Two prompts
+# with Jaccard similarity 0.9 share a band with probability ~0.99, while
+# prompts below ~0.7 rarely collide, so only a handful of candidates are
+# compared per lookup regardless of how many entries are indexed.
+_BINS = 64
+_BANDS = 8
+_ROWS = _BINS // _BANDS
+_SHINGLE = 3
+_EMPTY = 0xFFFFFFFF
+
+_MD_NOISE = re.compile(r"[*_`#>~|]+|^\s*(?:[-+]|\d+\.)\s+", re.MULTILINE)
+_LINK = re.compile(r"!?\[([^\]]*)\]\(([^)]*)\)")
+_WS = re.compile(r"\s+")
+_WORD = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """Drop Markdown decoration and collapse whitespace; case is kept (it can be the edit)."""
+    s = _LINK.sub(r"\1 \2", text or "")
+    s = _MD_NOISE.sub(" ", s)
+    return _WS.sub(" ", s).strip()
+
+
+def _prompt_text(messages: List[Dict[str, str]]) -> str:
+    return "\n".join(f"{m.get('role', '')}: {normalize_text(m.get('content') or '')}" for m in messages)
+
+
+def _scope(payload: Dict[str, Any]) -> str:
+    # Only prompts generated with the same model/sampling settings may share answers
+    key = {k: payload.get(k) for k in ("model", "temperature", "max_tokens")}
+    key["roles"] = [m.get("role") for m in payload.get("messages") or []]
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def signature(text: str) -> array:
+    """One-permutation MinHash over word 3-shingles (with rotation densification)."""
+    words = _WORD.findall(text)
+    sig = array("I", [_EMPTY]) * _BINS
+    if not words:
+        return sig
+    n = max(1, len(words) - _SHINGLE + 1)
+    for i in range(n):
+        h = zlib.crc32(" ".join(words[i:i + _SHINGLE]).encode())
+        b = h & (_BINS - 1)
+        v = h >> 6
+        if v < sig[b]:
+            sig[b] = v
+    # Fill empty bins from the next non-empty bin so short texts still compare well
+    if _EMPTY in sig:
+        nxt = next(i for i in range(_BINS) if sig[i] != _EMPTY) + _BINS
+        for i in range(_BINS - 1, -1, -1):
+            if sig[i] != _EMPTY:
+                nxt = i
+            else:
+                sig[i] = (sig[nxt % _BINS] + (nxt - i) * 0x9E3779B1) & 0x03FFFFFF
+    return sig
+
+
+def _digest(scope: str, text: str) -> str:
+    return hashlib.sha256(f"{scope}\n{text}".encode()).hexdigest()[:32]
+
+
+def similarity(a: array, b: array) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / _BINS
+
+
+class SemanticCache:
+    """Second-tier LLM cache keyed on normalized prompt text.
+
+    Tier A: exact match on the normalized prompt (whitespace/Markdown
+    insensitive). Tier B: near-duplicate match via MinHash LSH above
+    ``threshold``. Completions live in Redis; the LSH index lives in
+    process memory (bounded LRU, roughly 1 KB per entry) and is shared
+    between workers through a capped Redis stream of signatures.
+    """
+
+    STREAM = "llm:sem:index"
+
+    def __init__(self, threshold: float = 0.9, max_entries: int = 100_000, ttl: Optional[int] = None) -> None:
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, array]]" = OrderedDict()
+        self._bands: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+        self._stream_id = "0-0"
+        self._last_sync = 0.0
+        self.stats = {"lookups": 0, "normalized_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0}
+        self._lookup_seconds = 0.0
+
+    def _count(self, name: str, seconds: float = 0.0) -> None:
+        with self._lock:
+            self.stats[name] += 1
+            self._lookup_seconds += seconds
+
+    @staticmethod
+    def _value_key(digest: str) -> str:
+        return f"llm:norm:{digest}"
+
+    @staticmethod
+    def _band_keys(scope: str, sig: array) -> List[int]:
+        scope_h = zlib.crc32(scope.encode())
+        return [
+            (zlib.crc32(sig[b * _ROWS:(b + 1) * _ROWS].tobytes(), scope_h) << 3) | b
+            for b in range(_BANDS)
+        ]
+
+    # Index maintenance ------------------------------------------------------
+    def _index(self, digest: str, scope: str, sig: array) -> None:
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                return
+            self._entries[digest] = (scope, sig)
+            for k in self._band_keys(scope, sig):
+                cur = self._bands.get(k)
+                if cur is None:
+                    self._bands[k] = digest
+                elif isinstance(cur, str):
+                    self._bands[k] = [cur, digest]
+                else:
+                    cur.append(digest)
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+
+    def _evict(self, digest: str) -> None:
+        scope, sig = self._entries.pop(digest)
+        for k in self._band_keys(scope, sig):
+            cur = self._bands.get(k)
+            if cur == digest:
+                del self._bands[k]
+            elif isinstance(cur, list):
+                if digest in cur:
+                    cur.remove(digest)
+                if len(cur) == 1:
+                    self._bands[k] = cur[0]
+
+    def _sync(self) -> None:
+        """Pull signatures written by other workers (at most once per second)."""
+        now = time.monotonic()
+        if now - self._last_sync < 1.0:
+            return
+        self._last_sync = now
+        try:
+            resp = get_redis().xread({self.STREAM: self._stream_id}, count=5000)
+        except Exception as e:  # noqa: BLE001
+            logger.debug("semantic cache sync failed: %s", e)
+            return
+        for _, items in resp or []:
+            for entry_id, fields in items:
+                self._stream_id = entry_id
+                try:
+                    self._index(fields["d"], fields["s"], array("I", bytes.fromhex(fields["g"])))
+                except Exception:  # noqa: BLE001
+                    continue
+
+    # Public API ---------------------------------------------------------------
+    def lookup(self, payload: Dict[str, Any]) -> Optional[str]:
+        start = time.perf_counter()
+        self._count("lookups")
+        text = _prompt_text(payload.get("messages") or [])
+        scope = _scope(payload)
+        digest = _digest(scope, text)
+        hit = cache_json_get(self._value_key(digest))
+        if hit:
+            self._count("normalized_hits", time.perf_counter() - start)
+            return hit
+
+        self._sync()
+        sig = signature(text)
+        best: Tuple[float, Optional[str]] = (0.0, None)
+        with self._lock:
+            seen = set()
+            for k in self._band_keys(scope, sig):
+                cur = self._bands.get(k)
+                for cand in ([cur] if isinstance(cur, str) else cur or []):
+                    if cand in seen:
+                        continue
+                    seen.add(cand)
+                    entry = self._entries.get(cand)
+                    if entry is None or entry[0] != scope:
+                        continue
+                    sim = similarity(sig, entry[1])
+                    if sim > best[0]:
+                        best = (sim, cand)
+        result: Optional[str] = None
+        if best[1] is not None and best[0] >= self.threshold:
+            result = cache_json_get(self._value_key(best[1]))
+            if result:
+                self._count("semantic_hits")
+            else:
+                # Completion expired from Redis; forget the signature too
+                with self._lock:
+                    if best[1] in self._entries:
+                        self._evict(best[1])
+        if not result:
+            self._count("misses")
+        with self._lock:
+            self._lookup_seconds += time.perf_counter() - start
+        return result
+
+    def store(self, payload: Dict[str, Any], content: str) -> None:
+        if not content:
+            return
+        text = _prompt_text(payload.get("messages") or [])
+        scope = _scope(payload)
+        digest = _digest(scope, text)
+        sig = signature(text)
+        cache_json_set(self._value_key(digest), content, self.ttl)
+        self._index(digest, scope, sig)
+        self._count("stores")
+        try:
+            get_redis().xadd(
+                self.STREAM,
+                {"d": digest, "s": scope, "g": sig.tobytes().hex()},
+                maxlen=self.max_entries,
+                approximate=True,
+            )
+        except Exception as e:  # noqa: BLE001
+            logger.debug("semantic cache publish failed: %s", e)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            seconds = self._lookup_seconds
+            indexed = len(self._entries)
+        lookups = stats["lookups"] or 1
+        hits = stats["normalized_hits"] + stats["semantic_hits"]
+        return {
+            **stats,
+            "hit_rate": round(hits / lookups, 4),
+            "avg_lookup_ms": round(seconds / lookups * 1000, 4),
+            "indexed_entries": indexed,
+            "threshold": self.threshold,
+        }
@@ -0,0 +1,82 @@
+"""Out-of-line storage for large table payloads.
+
+Spreadsheet and document tables can carry megabytes of ``html``/``data``.
+When a stored table's payload is larger than ``TABLE_INLINE_MAX_BYTES`` it
+is moved to ``post_table_blobs`` (zlib-compressed, keyed by post id and
+content hash), and the post's ``tables`` column keeps a stub with the
+metadata (name, row count, column stats, attachment URL) plus ``blob``.
+Post reads return the stubs; ``GET /api/posts/{id}/tables/{blob}`` fetches
+the payload on demand.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import zlib
+from typing import Any, Dict, List, Optional
+
+import orjson
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import BlogPost, PostTableBlob
+
+logger = logging.getLogger(__name__)
+
+
+def offload_tables(db: Session, post_id: str, tables: Optional[List[Any]]) -> List[Any]:
+    """Stubs to store inline for ``tables``; large payloads are added to the session (not committed)."""
+    limit = settings.table_inline_max_bytes
+    out: List[Any] = []
+    pending: Dict[str, bytes] = {}
+    for table in tables or []:
+        if limit <= 0 or not isinstance(table, dict) or (table.get("html") is None and table.get("data") is None):
+            out.append(table)
+            continue
+        payload = orjson.dumps({"html": table.get("html"), "data": table.get("data")})
+        if len(payload) <= limit:
+            out.append({**table, "blob": None})
+            continue
+        sha = hashlib.sha256(payload).hexdigest()
+        pending[sha] = payload
+        out.append({**table, "html": None, "data": None, "blob": sha})
+    if pending:
+        existing = {
+            r[0]
+            for r in db.query(PostTableBlob.sha256)
+            .filter(PostTableBlob.post_id == post_id, PostTableBlob.sha256.in_(list(pending)))
+        }
+        for sha, payload in pending.items():
+            if sha not in existing:
+                db.add(PostTableBlob(post_id=post_id, sha256=sha, data=zlib.compress(payload, 6)))
+    return out
+
+
+def load_table(db: Session, post_id: str, sha256: str) -> Optional[Dict[str, Any]]:
+    """``{"html": ..., "data": ...}`` of one offloaded table, or None."""
+    row = db.get(PostTableBlob, (post_id, sha256))
+    if row is None:
+        return None
+    return orjson.loads(zlib.decompress(row.data))
+
+
+def delete_table_blobs(db: Session, post_id: str) -> None:
+    db.query(PostTableBlob).filter(PostTableBlob.post_id == post_id).delete(synchronize_session=False)
+
+
+def discard_orphan_blobs(db: Session, post_ids: List[str]) -> None:
+    """Delete blobs of ``post_ids`` that have no post row.
+
+    Creators commit blobs ahead of the post insert; when that insert then
+    fails they call this so no blob is left without its post.
+    """
+    db.rollback()
+    try:
+        live = {r[0] for r in db.query(BlogPost.id).filter(BlogPost.id.in_(post_ids))}
+        orphans = [pid for pid in post_ids if pid not in live]
+        if orphans:
+            db.query(PostTableBlob).filter(PostTableBlob.post_id.in_(orphans)).delete(synchronize_session=False)
+        db.commit()
+    except Exception as e:  # noqa: BLE001  (the caller re-raises the insert error)
+        db.rollback()
+        logger.warning("could not remove orphan table blobs for %d post(s): %s", len(post_ids), e)
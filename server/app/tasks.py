@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Sequence
+
+from .cache import FEED_TAG, LIST_TAG, cache_invalidate, post_tag
+from .config import settings
+from .db import SessionLocal
+from .export import rebuild_static
+from .feeds import feed_keys
+from .models import BlogPost
+
+logger = logging.getLogger(__name__)
+
+
+SUMMARY_PENDING = "pending"
+SUMMARY_READY = "ready"
+SUMMARY_FAILED = "failed"
+SUMMARY_SKIPPED = "skipped"
+
+
+def invalidate_post_caches(slug: str | None, post_id: str | None = None, slugs: Sequence[str] = ()) -> None:
+    """Drop every cached view a post appears in, in a single Redis round-trip.
+
+    ``slugs`` adds further post pages, e.g. a bulk-import batch whose slugs may
+    still be negative-cached as 404s.
+    """
+    keys = ["blog:list", *feed_keys(post_id)]
+    tags = [LIST_TAG, FEED_TAG]
+    keys.extend(f"blog:slug:{s}" for s in (slug, *slugs) if s)
+    if post_id:
+        tags.append(post_tag(post_id))
+    cache_invalidate(keys, tags)
+
+
+def _store_summary(post_id: str, summary: str | None, status: str, source: str | None = None) -> None:
+    db = SessionLocal()
+    try:
+        post = db.get(BlogPost, post_id)
+        if post is None:
+            # Deleted while the summary was being generated
+            return
+        meta = dict(post.meta or {}) if isinstance(post.meta, dict) else {}
+        if summary:
+            meta["summary"] = summary
+            meta["summary_source"] = source or "llm"
+        meta["summary_status"] = status
+        post.meta = meta
+        db.commit()
+        slug = post.slug
+        invalidate_post_caches(slug, post.id)
+    finally:
+        db.close()
+    rebuild_static(slug)
+
+
+def generate_post_summary(post_id: str, text: str) -> None:
+    """Summarize a committed post and store the result in ``meta.summary``.
+
+    Runs after the create response has been sent. LLM failures are retried
+    with exponential backoff; the outcome is recorded in ``meta.summary_status``.
+    Without an LLM, or once every attempt failed, an extractive summary is
+    stored instead (``meta.summary_source = "extractive"``).
+    """
+    from .agent.graph import get_summary_graph
+    from .llm import llm_client
+
+    if not (text or "").strip():
+        _store_summary(post_id, None, SUMMARY_SKIPPED)
+        return
+    if not (llm_client.groq_api_key or llm_client.ollama_base):
+        _store_fallback_summary(post_id, text, SUMMARY_SKIPPED)
+        return
+    full_text, text = text, text[:8000]
+
+    attempts = max(1, settings.summary_max_attempts)
+    for attempt in range(1, attempts + 1):
+        try:
+            res = get_summary_graph().invoke({"input_text": text})
+            summary = res.get("summary") if isinstance(res, dict) else None
+            if summary and summary.strip():
+                _store_summary(post_id, summary.strip(), SUMMARY_READY)
+                return
+            logger.warning("summary attempt %d/%d for %s returned nothing", attempt, attempts, post_id)
+        except Exception as e:  # noqa: BLE001
+            logger.warning("summary attempt %d/%d for %s failed: %s", attempt, attempts, post_id, e)
+        if attempt < attempts:
+            time.sleep(settings.summary_retry_backoff_seconds * (2 ** (attempt - 1)))
+    _store_fallback_summary(post_id, full_text, SUMMARY_FAILED)
+
+
+def _store_fallback_summary(post_id: str, text: str, status_without: str) -> None:
+    """Extractive summary when the LLM path produced none; ``status_without`` if that is disabled or empty."""
+    summary = None
+    if settings.summary_extractive_fallback:
+        from .derivatives import extractive_summary
+
+        # The text is Markdown (content_text) or HTML (content_html fallback in create_post)
+        is_html = text.lstrip().startswith("<")
+        summary = extractive_summary(None if is_html else text, text if is_html else None)
+    if summary:
+        _store_summary(post_id, summary, SUMMARY_READY, source="extractive")
+    else:
+        _store_summary(post_id, None, status_without)
@@ -0,0 +1,392 @@
+"""Offline benchmarks for the parsing, rendering and caching hot paths.
+
+Generates deterministic synthetic inputs (large PDF, DOCX with many images,
+wide CSV/XLSX, big HTML, long Markdown) and times::
+
+    parse.<format>       parse_any per format
+    markdown_table       _markdown_table on a wide table
+    pdf.render           _render_pdf_from_md on long Markdown
+    feed.items / feed.*  feed fragment rendering and RSS/Atom/JSON splicing
+    export.html          static-export Markdown -> HTML
+    codec.encode/decode  cache value codec on a blog:list sized payload
+    graph.parse          the parse graph end to end against tools.mock_llm
+
+Redis is pointed at an unused port by default, so nothing is cached between
+runs (pass ``--redis-url`` to include it). Usage::
+
+    python -m server.app.tools.bench                       # full run
+    python -m server.app.tools.bench --quick --only parse
+    python -m server.app.tools.bench --save-baseline bench.json
+    python -m server.app.tools.bench --compare bench.json  # exit 1 on regressions
+
+Each case reports min/median/p95 wall time, throughput and tracemalloc peak
+memory. Memory comes from a separate run so that tracing does not skew the
+timings.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_WORDS = (
+    "latency cache parser graph token stream vector index budget queue shard replica "
+    "schema render table image section outline summary refine export feed codec"
+).split()
+
+
+def _sentence(rng: random.Random, n: int = 12) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n)).capitalize() + "."
+
+
+# Corpora -----------------------------------------------------------------------
+def make_markdown(rng: random.Random, sections: int) -> str:
+    parts: List[str] = []
+    for i in range(sections):
+        parts.append(f"## Section {i}\n")
+        parts.append(" ".join(_sentence(rng) for _ in range(6)) + " **bold** and *italic* with [a link](https://example.com/" + str(i) + ").\n")
+        parts.append("\n".join(f"- {_sentence(rng, 6)}" for _ in range(4)) + "\n")
+        if i % 5 == 0:
+            parts.append("```python\nfor i in range(10):\n    print(i)\n```\n")
+        if i % 7 == 0:
+            parts.append("| a | b | c |\n| --- | --- | --- |\n" + "\n".join(f"| {j} | {j * 2} | {rng.choice(_WORDS)} |" for j in range(8)) + "\n")
+    return "\n".join(parts)
+
+
+def make_csv(rng: random.Random, rows: int, cols: int) -> bytes:
+    out = io.StringIO()
+    out.write(",".join(f"col_{c}" for c in range(cols)) + "\n")
+    for r in range(rows):
+        out.write(",".join(str(rng.randint(0, 10_000)) if c % 3 else rng.choice(_WORDS) for c in range(cols)) + "\n")
+    return out.getvalue().encode()
+
+
+def make_xlsx(rng: random.Random, rows: int, cols: int) -> bytes:
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("data")
+    ws.append([f"col_{c}" for c in range(cols)])
+    for _ in range(rows):
+        ws.append([rng.randint(0, 10_000) if c % 3 else rng.choice(_WORDS) for c in range(cols)])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def make_html(rng: random.Random, paragraphs: int) -> bytes:
+    body: List[str] = ["<html><head><title>Bench</title><script>var x = 1;</script></head><body>",
+                       "<nav><a href='/'>Home</a> <a href='/about'>About</a></nav><article>"]
+    for i in range(paragraphs):
+        body.append(f"<h2>Heading {i}</h2><p>{' '.join(_sentence(rng) for _ in range(4))}</p>")
+        if i % 10 == 0:
+            body.append(f"<img src='https://example.com/img/{i}.png' alt='figure {i}'>")
+        if i % 25 == 0:
+            body.append("<table>" + "".join(f"<tr><td>{j}</td><td>{rng.choice(_WORDS)}</td></tr>" for j in range(10)) + "</table>")
+    body.append("</article><footer>Copyright</footer></body></html>")
+    return "".join(body).encode()
+
+
+def make_pdf(rng: random.Random, pages: int) -> bytes:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=letter)
+    for p in range(pages):
+        y = 750
+        c.drawString(72, y, f"Page {p + 1}")
+        for _ in range(45):
+            y -= 15
+            c.drawString(72, y, _sentence(rng, 10))
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def _png(rng: random.Random, size: int = 64) -> bytes:
+    from PIL import Image
+
+    im = Image.new("RGB", (size, size), (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+    buf = io.BytesIO()
+    im.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def make_docx(rng: random.Random, paragraphs: int, images: int) -> bytes:
+    from docx import Document
+    from docx.shared import Inches
+
+    doc = Document()
+    every = max(1, paragraphs // max(1, images))
+    added = 0
+    for i in range(paragraphs):
+        doc.add_paragraph(" ".join(_sentence(rng) for _ in range(3)))
+        if i % every == 0 and added < images:
+            doc.add_picture(io.BytesIO(_png(rng)), width=Inches(0.5))
+            added += 1
+    table = doc.add_table(rows=20, cols=6)
+    for row in table.rows:
+        for cell in row.cells:
+            cell.text = rng.choice(_WORDS)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+# Measurement ---------------------------------------------------------------------
+Case = Tuple[str, Callable[[], Any], int, str]  # name, fn, units per call, unit
+
+
+def _measure(fn: Callable[[], Any], repeat: int, min_time: float) -> List[float]:
+    fn()  # warm caches, imports and lazily built graphs
+    times: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(times) < repeat or (time.perf_counter() < deadline and len(times) < repeat * 10):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _peak_memory(fn: Callable[[], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(name: str, fn: Callable[[], Any], units: int, unit: str, repeat: int, min_time: float) -> Dict[str, Any]:
+    times = sorted(_measure(fn, repeat, min_time))
+    median = statistics.median(times)
+    return {
+        "name": name,
+        "runs": len(times),
+        "min_s": round(times[0], 6),
+        "median_s": round(median, 6),
+        "p95_s": round(times[min(len(times) - 1, int(0.95 * len(times)))], 6),
+        "throughput": round(units / median, 2) if median > 0 else None,
+        "unit": f"{unit}/s",
+        "peak_mem_bytes": _peak_memory(fn),
+    }
+
+
+# Cases -------------------------------------------------------------------------
+def build_cases(scale: float, seed: int, with_graph: bool) -> List[Case]:
+    from ..parsing.parser import _markdown_table, parse_any
+
+    rng = random.Random(seed)
+
+    def n(base: int) -> int:
+        return max(1, int(base * scale))
+
+    md = make_markdown(rng, n(400))
+    corpora = {
+        "md": ("post.md", md.encode()),
+        "csv": ("wide.csv", make_csv(rng, n(5000), 40)),
+        "xlsx": ("wide.xlsx", make_xlsx(rng, n(2000), 40)),
+        "html": ("page.html", make_html(rng, n(2000))),
+        "pdf": ("large.pdf", make_pdf(rng, n(60))),
+        "docx": ("images.docx", make_docx(rng, n(400), n(80))),
+    }
+    cases: List[Case] = []
+    for fmt, (filename, data) in corpora.items():
+        cases.append((f"parse.{fmt}", lambda f=filename, d=data: parse_any(f, d), len(data), "bytes"))
+
+    headers = [f"col_{c}" for c in range(40)]
+    rows = [[str(rng.randint(0, 9999)) for _ in range(40)] for _ in range(n(10000))]
+    cases.append(("markdown_table", lambda: _markdown_table(headers, rows), len(rows), "rows"))
+
+    from ..routers.posts import _render_pdf_from_md
+
+    pdf_md = make_markdown(rng, n(120))
+    cases.append(("pdf.render", lambda: _render_pdf_from_md(pdf_md), len(pdf_md), "chars"))
+
+    from ..export import markdown_to_html
+
+    cases.append(("export.html", lambda: markdown_to_html(md), len(md), "chars"))
+
+    cases.extend(_feed_cases(rng, n(50)))
+    cases.extend(_codec_cases(rng, n(100)))
+    if with_graph:
+        cases.append(_graph_case(md))
+    return cases
+
+
+def _feed_cases(rng: random.Random, count: int) -> List[Case]:
+    import datetime as dt
+
+    from ..feeds import _splice, render_item_fragments
+    from ..models import BlogPost
+
+    now = dt.datetime(2024, 1, 1)
+    rows = [
+        BlogPost(
+            id=f"id-{i}", title=f"Post {i}", slug=f"post-{i}",
+            content_text=" ".join(_sentence(rng) for _ in range(60)),
+            meta={"summary": _sentence(rng, 30)},
+            created_at=now + dt.timedelta(hours=i), updated_at=now + dt.timedelta(hours=i),
+        )
+        for i in range(count)
+    ]
+    fragments = [render_item_fragments(r) for r in rows]
+    cases: List[Case] = [("feed.items", lambda: [render_item_fragments(r) for r in rows], len(rows), "items")]
+    for kind in ("rss", "atom", "json"):
+        cases.append((f"feed.{kind}", lambda k=kind: _splice(k, fragments), len(fragments), "items"))
+    return cases
+
+
+def _codec_cases(rng: random.Random, count: int) -> List[Case]:
+    from ..cache import decode_value, encode_value
+
+    # Roughly what blog:list holds: 100 full posts
+    payload = [
+        {
+            "id": f"id-{i}", "title": f"Post {i}", "slug": f"post-{i}",
+            "content_text": " ".join(_sentence(rng) for _ in range(120)),
+            "content_html": None, "images": [{"url": f"/static-redis/image:{i}.png", "alt": None}],
+            "tables": [], "source_type": "text", "source_url": None, "meta": {"summary": _sentence(rng, 30)},
+        }
+        for i in range(count)
+    ]
+    blob = encode_value(payload)
+    size = len(json.dumps(payload))
+    return [
+        ("codec.encode", lambda: encode_value(payload), size, "bytes"),
+        ("codec.decode", lambda: decode_value(blob), size, "bytes"),
+    ]
+
+
+def _graph_case(md: str) -> Case:
+    from ..agent.graph import get_parse_graph
+
+    counter = {"i": 0}
+
+    def _run() -> Any:
+        # A fresh nonce per call so the LLM caches cannot answer (they are off by default anyway)
+        counter["i"] += 1
+        data = (md[:8000] + f"\n\nrun {counter['i']}").encode()
+        return get_parse_graph().invoke({"filename": "post.md", "data": data, "options": {"refine_with_llm": True}})
+
+    return ("graph.parse", _run, 1, "docs")
+
+
+# Baselines -------------------------------------------------------------------------
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return human-readable regressions (median time or peak memory beyond ``tolerance``)."""
+    base = {r["name"]: r for r in baseline.get("results", [])}
+    regressions: List[str] = []
+    for r in results:
+        b = base.get(r["name"])
+        if not b:
+            continue
+        if b["median_s"] > 0 and r["median_s"] > b["median_s"] * (1 + tolerance):
+            regressions.append(f"{r['name']}: median {r['median_s']:.4f}s vs {b['median_s']:.4f}s (+{r['median_s'] / b['median_s'] - 1:.0%})")
+        if b.get("peak_mem_bytes") and r["peak_mem_bytes"] > b["peak_mem_bytes"] * (1 + tolerance):
+            regressions.append(f"{r['name']}: peak memory {r['peak_mem_bytes']} vs {b['peak_mem_bytes']} bytes")
+    return regressions
+
+
+def _print_table(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Any]]) -> None:
+    base = {r["name"]: r for r in (baseline or {}).get("results", [])}
+    print(f"{'case':<16} {'runs':>5} {'min ms':>10} {'median ms':>10} {'p95 ms':>10} {'throughput':>18} {'peak MB':>8} {'vs base':>8}")
+    for r in results:
+        delta = ""
+        if r["name"] in base and base[r["name"]]["median_s"]:
+            delta = f"{r['median_s'] / base[r['name']]['median_s'] - 1:+.0%}"
+        tput = f"{r['throughput']:.0f} {r['unit']}" if r["throughput"] is not None else "-"
+        print(
+            f"{r['name']:<16} {r['runs']:>5} {r['min_s'] * 1000:>10.2f} {r['median_s'] * 1000:>10.2f} "
+            f"{r['p95_s'] * 1000:>10.2f} {tput:>18} {r['peak_mem_bytes'] / 1e6:>8.2f} {delta:>8}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for parsing, rendering and caching")
+    parser.add_argument("--only", action="append", default=[], help="run cases whose name contains this (repeatable)")
+    parser.add_argument("--scale", type=float, default=1.0, help="corpus size multiplier")
+    parser.add_argument("--quick", action="store_true", help="shorthand for --scale 0.2 --repeat 3")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.5, help="keep sampling each case at least this long (s)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--no-graph", action="store_true", help="skip the parse graph / mock LLM case")
+    parser.add_argument("--mock-latency", type=float, default=0.0, help="seconds per mock LLM call")
+    parser.add_argument("--redis-url", default="redis://127.0.0.1:1/0", help="Redis for caches (default: unreachable)")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown before --compare fails")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.scale, args.repeat, args.min_time = min(args.scale, 0.2), 3, 0.0
+
+    mock = None
+    with_graph = not args.no_graph
+    # Settings are read at import time, so the environment is prepared before importing the app
+    os.environ["REDIS_URL"] = args.redis_url
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    os.environ["LLM_SEMANTIC_CACHE_ENABLED"] = "false"
+    if with_graph:
+        from .mock_llm import MockConfig, start_mock_llm
+
+        mock, url = start_mock_llm(config=MockConfig(latency=args.mock_latency))
+        os.environ.update({"GROQ_API_KEY": "", "OLLAMA_BASE_URL": url, "LLM_PARSE_MODE": "prefer",
+                           "LLM_OLLAMA_RPM": "0", "LLM_OLLAMA_TPM": "0"})
+
+    try:
+        cases = build_cases(args.scale, args.seed, with_graph)
+        if args.only:
+            cases = [c for c in cases if any(o in c[0] for o in args.only)]
+        results = []
+        for name, fn, units, unit in cases:
+            results.append(run_case(name, fn, units, unit, args.repeat, args.min_time))
+            if not args.json:
+                print(f"  done {name}", file=sys.stderr)
+    finally:
+        if mock is not None:
+            mock.shutdown()
+
+    report = {
+        "created": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scale": args.scale,
+        "seed": args.seed,
+        "results": results,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_table(results, baseline)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if baseline is not None:
+        if baseline.get("scale") != args.scale:
+            print(f"warning: baseline scale {baseline.get('scale')} != {args.scale}", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Import-time report for the API process (cold start budget).
+
+Runs ``python -X importtime -c "import <module>"`` in fresh interpreters and
+summarises the output per module and per top-level package::
+
+    python -m server.app.tools.importtime                 # server.app.main, best of 3
+    python -m server.app.tools.importtime --top 15 --json
+    python -m server.app.tools.importtime --budget 1.5    # exit 1 when slower (CI)
+
+Times are the minimum over ``--repeat`` runs, which filters out disk cache
+and scheduler noise better than the mean.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+
+def _run_once(module: str) -> Dict[str, Tuple[int, int, int]]:
+    """Return ``{module: (self_us, cumulative_us, depth)}`` for one cold import."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+    out: Dict[str, Tuple[int, int, int]] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # "import time:      1528 |    1104626 |   app.main" (two spaces per nesting level)
+        try:
+            head, cum_us, name = line.split("|", 2)
+            self_us = int(head.split(":", 1)[1])
+            cumulative = int(cum_us)
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        out[name.strip()] = (self_us, cumulative, depth)
+    return out
+
+
+def measure(module: str, repeat: int = 3) -> Dict[str, Tuple[int, int, int]]:
+    best: Dict[str, Tuple[int, int, int]] = {}
+    for _ in range(max(1, repeat)):
+        for name, (self_us, cum_us, depth) in _run_once(module).items():
+            prev = best.get(name)
+            if prev is None or cum_us < prev[1]:
+                best[name] = (self_us, cum_us, depth)
+    return best
+
+
+def summarize(module: str, rows: Dict[str, Tuple[int, int, int]], top: int) -> Dict[str, object]:
+    packages: Dict[str, int] = {}
+    for name, (self_us, _, _) in rows.items():
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+    by_cum = sorted(rows.items(), key=lambda kv: kv[1][1], reverse=True)
+    by_self = sorted(rows.items(), key=lambda kv: kv[1][0], reverse=True)
+    total_us = rows.get(module, (0, sum(r[0] for r in rows.values()), 0))[1]
+    return {
+        "module": module,
+        "total_s": round(total_us / 1e6, 4),
+        "modules_imported": len(rows),
+        "top_cumulative": [{"module": n, "cumulative_ms": round(c / 1000, 1), "depth": d} for n, (_, c, d) in by_cum[:top]],
+        "top_self": [{"module": n, "self_ms": round(s / 1000, 1)} for n, (s, _, _) in by_self[:top]],
+        "packages": [
+            {"package": p, "self_ms": round(us / 1000, 1)}
+            for p, us in sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:top]
+        ],
+    }
+
+
+def _print_report(report: Dict[str, object]) -> None:
+    print(f"{report['module']}: {report['total_s']:.3f}s cold import, {report['modules_imported']} modules")
+    print("\nslowest (cumulative):")
+    for r in report["top_cumulative"]:  # type: ignore[union-attr]
+        print(f"  {r['cumulative_ms']:9.1f} ms  {'  ' * r['depth']}{r['module']}")
+    print("\nslowest (self):")
+    for r in report["top_self"]:  # type: ignore[union-attr]
+        print(f"  {r['self_ms']:9.1f} ms  {r['module']}")
+    print("\nby package (self time):")
+    for r in report["packages"]:  # type: ignore[union-attr]
+        print(f"  {r['self_ms']:9.1f} ms  {r['package']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Per-module import cost of the API process")
+    parser.add_argument("--module", default="server.app.main")
+    parser.add_argument("--repeat", type=int, default=3, help="cold runs; the minimum per module is reported")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--budget", type=float, default=None, help="exit 1 when the import takes longer (seconds)")
+    args = parser.parse_args(argv)
+
+    report = summarize(args.module, measure(args.module, args.repeat), args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+    if args.budget is not None and report["total_s"] > args.budget:  # type: ignore[operator]
+        print(f"\nover budget: {report['total_s']}s > {args.budget}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
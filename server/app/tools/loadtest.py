@@ -0,0 +1,436 @@
+"""Load-test harness: drive the API at realistic concurrency without paying for LLM calls.
+
+Starts two local stand-ins:
+
+- the mock LLM (``tools.mock_llm``), with ``--llm-latency`` and
+  ``--llm-tokens-per-second``.
+- a fake origin that serves synthetic HTML articles, Markdown, CSV and a
+  sitemap for ``url=`` fetches. It sends ETag/Last-Modified headers and
+  answers conditional requests with 304.
+
+It then runs a scenario with ``--concurrency`` closed-loop users for
+``--duration`` seconds and reports p50/p95/p99, throughput and error rate per
+operation::
+
+    python -m server.app.tools.loadtest --scenario read-heavy --concurrency 32
+    python -m server.app.tools.loadtest --scenario mixed-editing --spawn --workers 2
+    python -m server.app.tools.loadtest --scenario bulk-import --target http://localhost:8000
+
+With ``--spawn``, uvicorn is started as a subprocess wired to the mocks,
+using a throwaway SQLite database. With ``--target``, the API is assumed to
+be already running. Point its ``GROQ_BASE_URL``/``OLLAMA_BASE_URL`` at the
+printed mock URL and fix ``--llm-port``/``--origin-port`` so the URLs stay
+stable.
+
+Scenarios are plain functions ``(client, rng, ctx) -> None`` registered in
+``SCENARIOS``; each ``client.call`` is timed under its operation name.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from .mock_llm import MockConfig, start_mock_llm
+
+_WORDS = "latency cache parser graph token stream index budget queue replica schema render table image section".split()
+
+
+# Fake origin ---------------------------------------------------------------------------
+def _article(n: int, paragraphs: int) -> str:
+    rng = random.Random(n)
+    body = [f"<h1>Article {n}</h1>"]
+    for i in range(paragraphs):
+        words = " ".join(rng.choice(_WORDS) for _ in range(60))
+        body.append(f"<h2>Part {i}</h2><p>{words}.</p>")
+        if i % 4 == 0:
+            body.append(f"<img src='/img/{n}-{i}.png' alt='figure {i}'>")
+    return (
+        "<html><head><title>Article %d</title></head><body><nav><a href='/'>Home</a></nav>"
+        "<article>%s</article><footer>footer links</footer></body></html>" % (n, "".join(body))
+    )
+
+
+class _OriginHandler(BaseHTTPRequestHandler):
+    server_version = "fake-origin/1"
+    latency = 0.0
+    paragraphs = 20
+    pages = 200
+    boot = formatdate(time.time() - 3600, usegmt=True)
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        pass
+
+    def _body(self, path: str) -> Tuple[Optional[bytes], str]:
+        name = path.rsplit("/", 1)[-1]
+        stem = name.split(".")[0]
+        n = int(stem) if stem.isdigit() else 0
+        if path == "/sitemap.xml":
+            base = f"http://{self.headers.get('Host')}"
+            urls = "".join(f"<url><loc>{base}/page/{i}.html</loc></url>" for i in range(self.pages))
+            return (f"<?xml version='1.0'?><urlset xmlns='http://www.sitemaps.org/schemas/sitemap/0.9'>{urls}</urlset>").encode(), "application/xml"
+        if path.startswith("/page/"):
+            return _article(n, self.paragraphs).encode(), "text/html; charset=utf-8"
+        if path.startswith("/doc/"):
+            rng = random.Random(n)
+            md = "\n\n".join(f"## Section {i}\n\n" + " ".join(rng.choice(_WORDS) for _ in range(80)) for i in range(self.paragraphs))
+            return f"# Doc {n}\n\n{md}\n".encode(), "text/markdown"
+        if path.startswith("/data/"):
+            rng = random.Random(n)
+            rows = "\n".join(",".join(str(rng.randint(0, 999)) for _ in range(12)) for _ in range(500))
+            return (",".join(f"c{i}" for i in range(12)) + "\n" + rows).encode(), "text/csv"
+        if path.startswith("/img/"):
+            return b"\x89PNG\r\n\x1a\n" + bytes(64), "image/png"
+        return None, ""
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.latency:
+            time.sleep(self.latency)
+        body, ctype = self._body(self.path.split("?")[0])
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = '"%x"' % (hash(body) & 0xFFFFFFFF)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.boot)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_origin(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, paragraphs: int = 20) -> Tuple[ThreadingHTTPServer, str]:
+    handler = type("OriginHandler", (_OriginHandler,), {"latency": latency, "paragraphs": paragraphs})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-origin", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# Client + stats ----------------------------------------------------------------------------
+@dataclass
+class OpStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[int, int] = field(default_factory=dict)
+
+
+class Client:
+    """Thin timed wrapper over a requests.Session shared by one virtual user."""
+
+    def __init__(self, base_url: str, stats: Dict[str, OpStats], lock: threading.Lock, timeout: float) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        self.stats = stats
+        self.lock = lock
+        self.timeout = timeout
+
+    def call(self, op: str, method: str, path: str, ok: Tuple[int, ...] = (200, 201, 204), **kwargs: Any) -> Optional[requests.Response]:
+        start = time.perf_counter()
+        resp: Optional[requests.Response] = None
+        try:
+            resp = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            status = resp.status_code
+        except requests.RequestException:
+            status = 0
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            st = self.stats.setdefault(op, OpStats())
+            st.latencies.append(elapsed)
+            st.statuses[status] = st.statuses.get(status, 0) + 1
+            if status not in ok:
+                st.errors += 1
+        return resp if resp is not None and resp.status_code in ok else None
+
+
+@dataclass
+class Context:
+    origin: str
+    posts: List[Dict[str, Any]] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def pick_post(self, rng: random.Random) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return rng.choice(self.posts) if self.posts else None
+
+    def add_post(self, post: Dict[str, Any]) -> None:
+        with self.lock:
+            self.posts.append(post)
+
+
+def _markdown(rng: random.Random, sections: int = 6) -> str:
+    return "\n\n".join(f"## Part {i}\n\n" + " ".join(rng.choice(_WORDS) for _ in range(50)) for i in range(sections))
+
+
+# Scenarios -----------------------------------------------------------------------------------
+def read_heavy(c: Client, rng: random.Random, ctx: Context) -> None:
+    r = rng.random()
+    post = ctx.pick_post(rng)
+    if r < 0.55 or post is None:
+        c.call("list", "GET", "/api/posts")
+    elif r < 0.85:
+        c.call("get_by_slug", "GET", f"/api/posts/slug/{post['slug']}")
+    elif r < 0.97:
+        c.call("feed", "GET", f"/api/feed/{rng.choice(['rss.xml', 'atom.xml', 'feed.json'])}")
+    else:
+        c.call("pdf", "GET", f"/api/posts/{post['id']}/pdf")
+
+
+_EXTENSIONS = {"page": "html", "doc": "md", "data": "csv"}
+
+
+def bulk_import(c: Client, rng: random.Random, ctx: Context) -> None:
+    n = rng.randrange(1000)
+    kind = rng.choice(("page", "page", "doc", "data"))
+    url = f"{ctx.origin}/{kind}/{n}.{_EXTENSIONS[kind]}"
+    resp = c.call("parse_url", "POST", "/api/posts/parse", data={"url": url, "refine_with_llm": "true"})
+    if resp is None:
+        return
+    bundle = resp.json()
+    created = c.call("create", "POST", "/api/posts", json={
+        "title": f"Imported {n}", "content_text": bundle.get("text") or "", "images": bundle.get("images") or [],
+        "tables": bundle.get("tables") or [], "source_type": "url", "source_url": url,
+    })
+    if created is not None:
+        ctx.add_post(created.json())
+
+
+def mixed_editing(c: Client, rng: random.Random, ctx: Context) -> None:
+    r = rng.random()
+    if r < 0.25:
+        md = _markdown(rng).encode()
+        c.call("parse_upload", "POST", "/api/posts/parse", files={"file": ("draft.md", md)}, data={"refine_with_llm": "true"})
+    elif r < 0.55:
+        c.call("refine_section", "POST", "/api/refine/section", json={"text": _markdown(rng, 2), "instructions": "tighten"})
+    elif r < 0.75:
+        created = c.call("create", "POST", "/api/posts", json={"title": f"Draft {rng.randrange(10**6)}", "content_text": _markdown(rng), "source_type": "text"})
+        if created is not None:
+            ctx.add_post(created.json())
+    elif r < 0.95:
+        post = ctx.pick_post(rng)
+        if post is not None:
+            c.call("get_by_slug", "GET", f"/api/posts/slug/{post['slug']}")
+        c.call("list", "GET", "/api/posts")
+    else:
+        with ctx.lock:
+            post = ctx.posts.pop(rng.randrange(len(ctx.posts))) if len(ctx.posts) > 20 else None
+        if post is not None:
+            c.call("delete", "DELETE", f"/api/posts/{post['id']}")
+
+
+SCENARIOS: Dict[str, Callable[[Client, random.Random, Context], None]] = {
+    "read-heavy": read_heavy,
+    "bulk-import": bulk_import,
+    "mixed-editing": mixed_editing,
+}
+
+
+# Runner ----------------------------------------------------------------------------------------
+def _pct(sorted_vals: List[float], q: float) -> Optional[float]:
+    if not sorted_vals:
+        return None
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+
+def summarize(stats: Dict[str, OpStats], elapsed: float) -> Dict[str, Any]:
+    ops: Dict[str, Any] = {}
+    all_lat: List[float] = []
+    total_err = 0
+    for name, st in sorted(stats.items()):
+        lat = sorted(st.latencies)
+        all_lat.extend(lat)
+        total_err += st.errors
+        ops[name] = {
+            "requests": len(lat),
+            "errors": st.errors,
+            "error_rate": round(st.errors / len(lat), 4) if lat else 0.0,
+            "throughput_rps": round(len(lat) / elapsed, 2),
+            "p50_ms": round((_pct(lat, 0.50) or 0) * 1000, 1),
+            "p95_ms": round((_pct(lat, 0.95) or 0) * 1000, 1),
+            "p99_ms": round((_pct(lat, 0.99) or 0) * 1000, 1),
+            "max_ms": round(lat[-1] * 1000, 1) if lat else 0.0,
+            "statuses": {str(k): v for k, v in sorted(st.statuses.items())},
+        }
+    all_lat.sort()
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "requests": len(all_lat),
+        "errors": total_err,
+        "error_rate": round(total_err / len(all_lat), 4) if all_lat else 0.0,
+        "throughput_rps": round(len(all_lat) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round((_pct(all_lat, 0.50) or 0) * 1000, 1),
+        "p95_ms": round((_pct(all_lat, 0.95) or 0) * 1000, 1),
+        "p99_ms": round((_pct(all_lat, 0.99) or 0) * 1000, 1),
+        "operations": ops,
+    }
+
+
+def run(base_url: str, scenario: str, concurrency: int, duration: float, seed: int, ctx: Context,
+        think: float = 0.0, timeout: float = 120.0) -> Dict[str, Any]:
+    fn = SCENARIOS[scenario]
+    stats: Dict[str, OpStats] = {}
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def _user(i: int) -> None:
+        rng = random.Random(seed * 1000 + i)
+        client = Client(base_url, stats, lock, timeout)
+        while time.monotonic() < stop:
+            fn(client, rng, ctx)
+            if think:
+                time.sleep(rng.expovariate(1 / think))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=_user, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(stats, time.perf_counter() - start)
+
+
+def seed_posts(base_url: str, count: int, seed: int, ctx: Context) -> None:
+    rng = random.Random(seed)
+    s = requests.Session()
+    for i in range(count):
+        resp = s.post(f"{base_url}/api/posts", json={"title": f"Seed post {i}", "content_text": _markdown(rng), "source_type": "text"}, timeout=60)
+        if resp.status_code == 201:
+            ctx.add_post(resp.json())
+    existing = s.get(f"{base_url}/api/posts", timeout=60)
+    if existing.ok:
+        for post in existing.json():
+            if all(p["id"] != post["id"] for p in ctx.posts):
+                ctx.add_post(post)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_api(llm_url: str, workers: int, extra_env: Dict[str, str]) -> Tuple[subprocess.Popen, str, str]:
+    port = _free_port()
+    db = os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "load.db")
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{db}",
+        "GROQ_API_KEY": "mock",
+        "GROQ_BASE_URL": llm_url,
+        "OLLAMA_BASE_URL": llm_url,
+        "WARMUP_ON_STARTUP": "true",
+        # Client-side provider budgets would throttle the run; pass --env to test them
+        "LLM_GROQ_RPM": "0",
+        "LLM_GROQ_TPM": "0",
+        **extra_env,
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server.app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("API process exited during startup")
+        try:
+            if requests.get(f"{base}/api/health", timeout=1).ok:
+                return proc, base, db
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("API did not become healthy within 60s")
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{report['scenario']}: {report['requests']} requests in {report['elapsed_s']}s, "
+          f"{report['throughput_rps']} req/s, error rate {report['error_rate']:.2%}, "
+          f"p50 {report['p50_ms']}ms p95 {report['p95_ms']}ms p99 {report['p99_ms']}ms")
+    print(f"{'operation':<16} {'reqs':>7} {'rps':>8} {'err%':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  statuses")
+    for name, op in report["operations"].items():
+        print(f"{name:<16} {op['requests']:>7} {op['throughput_rps']:>8} {op['error_rate']:>7.2%} {op['p50_ms']:>9} "
+              f"{op['p95_ms']:>9} {op['p99_ms']:>9} {op['max_ms']:>9}  {op['statuses']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the API against local mock LLM and origin servers")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="read-heavy")
+    parser.add_argument("--target", help="base URL of a running API (default: --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="start uvicorn wired to the mocks")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --spawn")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--think", type=float, default=0.0, help="mean think time between user actions (s)")
+    parser.add_argument("--seed-posts", type=int, default=50, help="posts created before the run")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--llm-port", type=int, default=0)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--llm-fail-rate", type=float, default=0.0)
+    parser.add_argument("--origin-port", type=int, default=0)
+    parser.add_argument("--origin-latency", type=float, default=0.05)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra env for --spawn")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    llm, llm_url = start_mock_llm(port=args.llm_port, config=MockConfig(
+        latency=args.llm_latency, tokens_per_second=args.llm_tokens_per_second, fail_rate=args.llm_fail_rate))
+    origin, origin_url = start_origin(port=args.origin_port, latency=args.origin_latency)
+    print(f"mock LLM {llm_url}  fake origin {origin_url}", file=sys.stderr)
+
+    proc = None
+    try:
+        if args.target:
+            base = args.target.rstrip("/")
+        else:
+            extra = dict(kv.split("=", 1) for kv in args.env)
+            proc, base, db = spawn_api(llm_url, args.workers, extra)
+            print(f"API {base} (db {db})", file=sys.stderr)
+        ctx = Context(origin=origin_url)
+        seed_posts(base, args.seed_posts, args.seed, ctx)
+        report = run(base, args.scenario, args.concurrency, args.duration, args.seed, ctx, args.think, args.timeout)
+        report.update({"scenario": args.scenario, "concurrency": args.concurrency, "target": base,
+                       "mock_llm_requests": dict(llm.RequestHandlerClass.stats)})
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        llm.shutdown()
+        origin.shutdown()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Local stand-in for the Groq (OpenAI-compatible) and Ollama chat APIs.
+
+Point ``GROQ_BASE_URL`` and/or ``OLLAMA_BASE_URL`` at it to exercise routing,
+benchmarks and load tests without paying for completions::
+
+    python -m server.app.tools.mock_llm --port 11500 --latency 0.3 --fail-rate 0.1
+
+Replies echo the last user message (so refine/align steps are content
+preserving) after ``latency`` seconds plus ``len(reply) / tokens_per_second``
+worth of simulated generation time.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+OPENAI_PATHS = {"/chat/completions", "/v1/chat/completions", "/openai/v1/chat/completions"}
+OLLAMA_PATHS = {"/api/chat"}
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.0
+    jitter: float = 0.0
+    tokens_per_second: float = 0.0  # 0 = instant generation
+    fail_rate: float = 0.0
+    fail_status: int = 503
+    max_reply_chars: int = 20000
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _reply_for(messages: List[Dict[str, Any]], cfg: MockConfig) -> str:
+    user = [m.get("content") or "" for m in messages if m.get("role") == "user"]
+    return (user[-1] if user else "ok")[: cfg.max_reply_chars]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "mock-llm/1"
+    config: MockConfig = MockConfig()
+    stats: Dict[str, int] = {}
+    stats_lock = threading.Lock()
+
+    def log_message(self, fmt: str, *args: Any) -> None:  # quiet by default
+        pass
+
+    def _count(self, key: str) -> None:
+        with self.stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _send(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path in {"/health", "/api/tags"}:
+            self._send(200, {"status": "ok", "stats": dict(self.stats), "models": []})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self) -> None:  # noqa: N802
+        path = self.path.split("?")[0]
+        if path not in OPENAI_PATHS and path not in OLLAMA_PATHS:
+            self._send(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            req = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send(400, {"error": "invalid json"})
+            return
+        cfg = self.config
+        self._count("requests")
+        reply = _reply_for(req.get("messages") or [], cfg)
+        delay = cfg.latency + (random.uniform(0, cfg.jitter) if cfg.jitter else 0.0)
+        if cfg.tokens_per_second > 0:
+            delay += _estimate_tokens(reply) / cfg.tokens_per_second
+        time.sleep(delay)
+        if cfg.fail_rate and random.random() < cfg.fail_rate:
+            self._count("failures")
+            self._send(cfg.fail_status, {"error": {"message": "mock failure", "type": "server_error"}})
+            return
+        model = req.get("model") or "mock"
+        prompt_tokens = sum(_estimate_tokens(m.get("content") or "") for m in req.get("messages") or [])
+        if path in OLLAMA_PATHS:
+            self._send(200, {
+                "model": model,
+                "message": {"role": "assistant", "content": reply},
+                "done": True,
+                "prompt_eval_count": prompt_tokens,
+                "eval_count": _estimate_tokens(reply),
+            })
+            return
+        self._send(200, {
+            "id": f"chatcmpl-mock-{random.getrandbits(32):x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": _estimate_tokens(reply),
+                "total_tokens": prompt_tokens + _estimate_tokens(reply),
+            },
+        })
+
+
+def start_mock_llm(host: str = "127.0.0.1", port: int = 0, config: Optional[MockConfig] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the server on a daemon thread; returns ``(server, base_url)``. Call ``server.shutdown()`` to stop."""
+    handler = type("MockLLMHandler", (_Handler,), {"config": config or MockConfig(), "stats": {}})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Mock OpenAI/Ollama-compatible chat server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, default=0.0, help="base seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform random seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="simulated generation speed")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with --fail-status")
+    parser.add_argument("--fail-status", type=int, default=503)
+    args = parser.parse_args(argv)
+    cfg = MockConfig(args.latency, args.jitter, args.tokens_per_second, args.fail_rate, args.fail_status)
+    server, url = start_mock_llm(args.host, args.port, cfg)
+    print(f"mock LLM listening on {url}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
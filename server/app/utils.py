@@ -40,21 +40,113 @@ def save_image_bytes(content: bytes, original_name: str) -> str:
     return f"/static-redis/{key}"
 
 
+def save_table_attachment(content: bytes, name: str) -> str:
+    """Store a gzip CSV table export; served as a download from /static-redis/."""
+    key = f"table:{slugify(name) or 'table'}-{secrets.token_hex(4)}.csv.gz"
+    cache_bytes_set(key, content)
+    return f"/static-redis/{key}"
+
+
 def make_slug(title: str) -> str:
     s = slugify(title)
     return s or f"post-{secrets.token_hex(3)}"
 
 
-def unique_slug(db, base: str) -> str:
-    """Ensure slug is unique by appending a numeric suffix if needed."""
-    slug = base
+def _escape_like(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def next_free_slug(base: str, taken) -> str:
+    """Pick ``base`` or the lowest free ``base-N`` (N >= 2) not in ``taken``."""
+    taken = set(taken)
+    if base not in taken:
+        return base
+    suffixes = set()
+    prefix = f"{base}-"
+    for s in taken:
+        tail = s[len(prefix):] if s.startswith(prefix) else ""
+        if tail.isdigit():
+            suffixes.add(int(tail))
     i = 2
-    from .models import BlogPost  # local import to avoid cycles
-    exists = lambda s: db.query(BlogPost).filter(BlogPost.slug == s).first() is not None
-    while exists(slug):
-        slug = f"{base}-{i}"
+    while i in suffixes:
         i += 1
-        if i > 1000:
-            slug = f"{base}-{secrets.token_hex(3)}"
-            break
-    return slug
+    return f"{base}-{i}"
+
+
+def unique_slug(db, base: str) -> str:
+    """Ensure slug is unique by appending a numeric suffix if needed.
+
+    Fetches every existing ``base`` / ``base-*`` slug with a single prefix query
+    on the slug index instead of probing candidates one by one.
+    """
+    from .models import BlogPost  # local import to avoid cycles
+    rows = (
+        db.query(BlogPost.slug)
+        .filter((BlogPost.slug == base) | BlogPost.slug.like(f"{_escape_like(base)}-%", escape="\\"))
+        .all()
+    )
+    return next_free_slug(base, (r[0] for r in rows))
+
+
+def unique_slugs(db, bases) -> list:
+    """Unique slugs for a batch of ``bases`` with one query for the whole batch.
+
+    Slugs handed out earlier in the batch count as taken, so repeated titles
+    get ``-2``, ``-3``... like sequential inserts would.
+    """
+    from sqlalchemy import or_
+
+    from .models import BlogPost  # local import to avoid cycles
+    bases = list(bases)
+    if not bases:
+        return []
+    conds = []
+    for base in set(bases):
+        conds.append(BlogPost.slug == base)
+        conds.append(BlogPost.slug.like(f"{_escape_like(base)}-%", escape="\\"))
+    taken = {r[0] for r in db.query(BlogPost.slug).filter(or_(*conds)).all()}
+    out = []
+    for base in bases:
+        slug = next_free_slug(base, taken)
+        taken.add(slug)
+        out.append(slug)
+    return out
+
+
+_SLUG_INDEX = "ix_blog_posts_slug"
+
+
+def is_slug_conflict(exc: Exception) -> bool:
+    """True when an IntegrityError comes from the unique index on ``blog_posts.slug``."""
+    orig = getattr(exc, "orig", None)
+    # psycopg/psycopg2 name the constraint; SQLite and MySQL only mention it in the message
+    name = getattr(getattr(orig, "diag", None), "constraint_name", None)
+    if name:
+        return name == _SLUG_INDEX
+    msg = str(orig if orig is not None else exc)
+    return _SLUG_INDEX in msg or "blog_posts.slug" in msg
+
+
+def insert_with_unique_slug(db, post, base: str, attempts: int = 5):
+    """Insert ``post`` with a unique slug derived from ``base``.
+
+    Concurrent creators may pick the same slug between the lookup and the
+    insert; the unique index on ``blog_posts.slug`` rejects the loser, which
+    rolls back and retries with a fresh lookup. Any other integrity error is
+    re-raised.
+    """
+    from sqlalchemy.exc import IntegrityError
+
+    for attempt in range(attempts):
+        post.slug = unique_slug(db, base) if attempt < attempts - 1 else f"{base}-{secrets.token_hex(3)}"
+        db.add(post)
+        try:
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            if not is_slug_conflict(e):
+                raise
+            continue
+        db.refresh(post)
+        return post
+    raise RuntimeError(f"could not allocate a unique slug for {base!r}")